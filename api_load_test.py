@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+import numpy as np
+
+
+class ApiClient:
+    # Minimal keep-alive HTTP/1.1 client, so the test measures the server
+    # rather than connection setup
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.token = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        headers = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+        if self.token:
+            headers += f"Authorization: Bearer {self.token}\r\n"
+        self.writer.write((headers + "\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        length = 0
+        for line in head.decode("latin-1").split("\r\n")[1:]:
+            if line.lower().startswith("content-length:"):
+                length = int(line.split(":", 1)[1])
+        data = json.loads(await self.reader.readexactly(length)) if length else None
+        return status, data
+
+    async def close(self):
+        self.writer.close()
+
+
+async def run_client(host, port, client_id, requests, write_ratio, latencies, errors):
+    client = ApiClient(host, port)
+    await client.connect()
+    email = f"loadtest{client_id}@example.com"
+    status, data = await client.request("POST", "/login", {"email": email, "password": "secret",
+                                                           "name": f"Load Test {client_id}"})
+    client.token = data["token"]
+    rng = random.Random(client_id)
+    for i in range(requests):
+        if rng.random() < write_ratio:
+            request = ("POST", "/tasks", {"task_name": f"Load task {client_id}-{i}-{time.time_ns()}",
+                                          "task_start_date": "2025-01-05", "task_start_time": "09:00",
+                                          "task_end_date": "2025-01-05", "task_end_time": "11:00"})
+        else:
+            request = ("GET", "/tasks", None)
+        started = time.perf_counter()
+        status, _ = await client.request(*request)
+        latencies.append(time.perf_counter() - started)
+        if status >= 400:
+            errors.append(status)
+    await client.close()
+
+
+async def load_test(host, port, clients, requests, write_ratio):
+    latencies = []
+    errors = []
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(host, port, client_id, requests, write_ratio, latencies, errors)
+                           for client_id in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies = np.array(latencies) * 1000
+    print(f"{len(latencies)} requests from {clients} clients in {elapsed:.2f}s")
+    print(f"Throughput: {len(latencies) / elapsed:.0f} requests/s")
+    print(f"Latency: p50 {np.percentile(latencies, 50):.1f}ms, p99 {np.percentile(latencies, 99):.1f}ms, "
+          f"max {latencies.max():.1f}ms")
+    if errors:
+        print(f"{len(errors)} requests failed")
+    return 1 if errors else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test a running task_api_server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--clients", type=int, default=50, help="concurrent connections")
+    parser.add_argument("--requests", type=int, default=200, help="requests per client")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="share of requests that add a task")
+    args = parser.parse_args(argv)
+    return asyncio.run(load_test(args.host, args.port, args.clients, args.requests, args.write_ratio))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from refresh_statuses import synthetic_tasks
+from repository import open_repositories
+from task_query import TaskQuery
+from task_renderer import render_email, task_rows
+from task_schema import format_tasks
+from task_views import TaskViewCache
+from user_registry import USER_COLUMNS
+
+# Timed calls per operation; each is measured separately for the percentiles
+REPEAT = 200
+
+
+def synthetic_users(users):
+    return pd.DataFrame({
+        "user_email": [f"user{i}@example.com" for i in range(users)],
+        "user_password": [f"password{i}" for i in range(users)],
+        "user_name": [f"User {i}" for i in range(users)]
+    }, columns=USER_COLUMNS)
+
+
+def write_dataset(data_dir, rows, users, seed=0, backend="csv"):
+    # users.csv and task_manager.csv as the app would find them; the tasks
+    # reuse the refresh_statuses generator, spread over a week around now
+    synthetic_users(users).to_csv(os.path.join(data_dir, "users.csv"), index=False)
+    format_tasks(synthetic_tasks(rows, users, seed)).to_csv(os.path.join(data_dir, "task_manager.csv"), index=False)
+    if backend == "sqlite":
+        from sqlite_repository import SqliteDatabase, import_csv
+        database = SqliteDatabase(os.path.join(data_dir, "task_manager.db"))
+        import_csv(database, os.path.join(data_dir, "users.csv"), os.path.join(data_dir, "task_manager.csv"))
+        database.close()
+
+
+def summarize(name, rows, latencies, peak=None):
+    latencies = np.array(latencies)
+    return {"operation": name, "rows": rows, "calls": len(latencies),
+            "ops_per_s": len(latencies) / latencies.sum() if latencies.sum() > 0 else float("inf"),
+            "p50_ms": np.percentile(latencies, 50) * 1000, "p95_ms": np.percentile(latencies, 95) * 1000,
+            "p99_ms": np.percentile(latencies, 99) * 1000, "max_ms": latencies.max() * 1000,
+            "peak_mb": None if peak is None else peak / 2 ** 20}
+
+
+def timed(fn, args_list):
+    latencies = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def peak_memory(fn, args):
+    # One extra call under tracemalloc, which is too slow to leave on while timing
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def first_page_rows(task_query, user_email):
+    # The formatted first page of the dashboard's task list, its sort keys
+    # and the next page's cursor
+    from taskmanager_gui import TREE_PAGE_SIZE
+    keys, next_cursor = task_query.page_keys(user_email, limit=TREE_PAGE_SIZE)
+    return task_rows(task_query.tasks(user_email, keys)), keys, next_cursor
+
+
+def gui_view(root, task_query, user_email):
+    # Builds the task list the way the dashboard does and waits until every
+    # batch of rows has been inserted; returns the number of widgets created
+    from taskmanager_gui import TaskListView
+    view = TaskListView(root, root, lambda *args: first_page_rows(task_query, user_email), task_query.key)
+    view.first_page()
+    while len(view.tree.get_children()) < len(view.rows):
+        root.update()
+    root.update()
+    widgets = count_widgets(view.frame)
+    view.frame.destroy()
+    return widgets
+
+
+def count_widgets(widget):
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+def open_display():
+    # A real (or Xvfb) display when there is one; otherwise the GUI benchmark
+    # falls back to timing the row formatting that dominates view construction
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        return None
+    root.withdraw()
+    return root
+
+
+def run_benchmarks(data_dir, rows, users, backend, repeat, memory, seed=0):
+    rng = np.random.default_rng(seed)
+    results = []
+
+    def record(name, fn, args_list, memory_args=None):
+        peak = peak_memory(fn, memory_args or args_list[0]) if memory else None
+        results.append(summarize(name, rows, timed(fn, args_list), peak))
+
+    def load():
+        user_registry, task_store = open_repositories(backend, data_dir)
+        task_store.close()
+        user_registry.close()
+
+    # Loading is timed a few times only: at 10M rows each load takes minutes
+    record("load", load, [()] * min(repeat, 5))
+
+    user_registry, task_store = open_repositories(backend, data_dir, autoflush=True)
+    user_ids = rng.integers(0, users, repeat)
+    sample = [(f"user{i}@example.com",) for i in user_ids]
+
+    def login(user_email, user_password):
+        if user_email in user_registry:
+            user_registry.authenticate(user_email, user_password)
+    record("login lookup", login, [(f"user{i}@example.com", f"password{i}") for i in user_ids])
+    record("list user tasks", task_store.user_tasks, sample)
+
+    names = [(user_email, f"Benchmark task {i}") for i, (user_email,) in enumerate(sample)]
+
+    def add(user_email, task_name):
+        task_store.add_task({"user_email": user_email, "task_name": task_name,
+                             "task_start_date": "2025-01-05", "task_start_time": "09:00",
+                             "task_end_date": "2025-01-05", "task_end_time": "11:00", "task_status": "Upcoming"})
+
+    def modify(user_email, task_name):
+        task_store.modify_task(user_email, task_name, "task_status", "Completed")
+
+    # Each write is journaled to disk before it returns. The memory runs use
+    # their own task so the timed calls still find theirs
+    extra = (sample[0][0], "Benchmark memory")
+    record("add", add, names, extra)
+    record("modify", modify, names)
+    record("delete", task_store.delete_task, names, extra)
+
+    user_frames = [(task_store.user_tasks(user_email),) for (user_email,) in sample]
+    record("render email", lambda user_tasks: render_email("Benchmark User", user_tasks), user_frames)
+
+    # The same users again through the view cache; the first read of each
+    # user is a miss, the rest are hits until their tasks change
+    task_views = TaskViewCache(task_store)
+    record("render email (view cache)", lambda user_email: task_views.email(user_email, "Benchmark User"), sample)
+    task_views.close()
+
+    # Sorted pages come from orders kept per user, so only a user's first
+    # query sorts their tasks
+    task_query = TaskQuery(task_store)
+    record("first page by end date", lambda user_email: task_query.page(user_email, "end"), sample)
+
+    root = open_display()
+    if root is not None:
+        widgets = []
+        record("gui task view", lambda user_email: widgets.append(gui_view(root, task_query, user_email)), sample)
+        results[-1]["widgets"] = max(widgets)
+        root.destroy()
+    else:
+        record("gui task view (proxy: row formatting, no display)",
+               lambda user_email: first_page_rows(task_query, user_email), sample)
+    task_query.close()
+
+    task_store.close()
+    user_registry.close()
+    return results
+
+
+def print_results(results):
+    print(f"{'operation':<52}{'rows':>10}{'ops/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'peak MB':>10}")
+    for result in results:
+        peak = "" if result["peak_mb"] is None else f"{result['peak_mb']:.1f}"
+        print(f"{result['operation']:<52}{result['rows']:>10}{result['ops_per_s']:>12.1f}{result['p50_ms']:>10.3f}"
+              f"{result['p95_ms']:>10.3f}{result['p99_ms']:>10.3f}{result['max_ms']:>10.3f}{peak:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the task manager's hot paths on synthetic data")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000], help="task table sizes to run")
+    parser.add_argument("--users", type=int, help="number of users (default: one per 100 tasks)")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed calls per operation")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak memory runs")
+    parser.add_argument("--json", help="also write the results to this file, to compare runs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    results = []
+    for rows in args.rows:
+        users = args.users or max(rows // 100, 1)
+        with tempfile.TemporaryDirectory() as data_dir:
+            write_dataset(data_dir, rows, users, args.seed, args.backend)
+            results.extend(run_benchmarks(data_dir, rows, users, args.backend, args.repeat,
+                                          not args.no_memory, args.seed))
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
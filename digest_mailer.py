@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from mail_transport import MailTransport
+from repository import open_repositories
+from task_renderer import render_email
+
+
+def build_digests(user_registry, df_tasks):
+    # One pass over the table: group once, render each user's digest
+    digests = []
+    for user_email, user_tasks in df_tasks.groupby('user_email', observed=True, sort=False):
+        user = user_registry.get_user(user_email)
+        user_name = user["user_name"] if user is not None else user_email
+        digests.append((user_email, render_email(user_name, user_tasks)))
+    return digests
+
+
+async def send_digests(digests, concurrency=4):
+    # Each of the `concurrency` SMTP sessions is used by one send at a time;
+    # the blocking smtplib calls run on a matching thread pool
+    transports = asyncio.Queue()
+    for _ in range(concurrency):
+        transports.put_nowait(MailTransport())
+    loop = asyncio.get_running_loop()
+    failures = {}
+
+    async def deliver(user_email, message):
+        transport = await transports.get()
+        try:
+            await loop.run_in_executor(executor, transport.send, user_email, message)
+        except Exception as e:
+            failures[user_email] = e
+        finally:
+            transports.put_nowait(transport)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        await asyncio.gather(*(deliver(user_email, message) for user_email, message in digests))
+        while not transports.empty():
+            executor.submit(transports.get_nowait().close)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Email every user a digest of their tasks")
+    parser.add_argument("--concurrency", type=int, default=4, help="number of SMTP sessions used in parallel")
+    parser.add_argument("--dry-run", action="store_true", help="print the digests instead of sending them")
+    parser.add_argument("--backend", choices=["csv", "sqlite", "arrow"], help="storage backend (default: TASK_MANAGER_BACKEND)")
+    args = parser.parse_args(argv)
+
+    user_registry, task_store = open_repositories(args.backend)
+    digests = build_digests(user_registry, task_store.all_tasks())
+    task_store.close()
+
+    if args.dry_run:
+        for user_email, message in digests:
+            print(f"To: {user_email}\n{message}")
+        return 0
+
+    failures = asyncio.run(send_digests(digests, args.concurrency))
+    print(f"Sent {len(digests) - len(failures)} of {len(digests)} digests")
+    for user_email, error in failures.items():
+        print(f"Failed to send to {user_email}: {error}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
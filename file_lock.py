@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    # Advisory lock on a separate lock file, shared by every process that
+    # opens the same data files. By default it is re-entrant within a
+    # process, so code holding it can call other locked methods. A
+    # non-reentrant lock may be released by a different thread than the one
+    # that acquired it
+    def __init__(self, path, reentrant=True):
+        self.path = path
+        self._file = None
+        self._depth = 0
+        self._thread_lock = threading.RLock() if reentrant else threading.Lock()
+
+    def acquire(self, blocking=True):
+        if not self._thread_lock.acquire(blocking):
+            return False
+        if self._depth > 0:
+            self._depth += 1
+            return True
+        f = open(self.path, "a+b")
+        try:
+            if not self._lock_file(f, blocking):
+                f.close()
+                self._thread_lock.release()
+                return False
+        except BaseException:
+            f.close()
+            self._thread_lock.release()
+            raise
+        self._file = f
+        self._depth = 1
+        return True
+
+    def _lock_file(self, f, blocking):
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            return True
+        # msvcrt locks the first byte of the file; poll until it is free
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.05)
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def file_identity(path):
+    # (inode, size, mtime) of a file, or None if it does not exist. A change
+    # means another process has written to or replaced it
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
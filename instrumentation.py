@@ -0,0 +1,275 @@
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+import pandas as pd
+
+# Everything here is opt-in: TASK_MANAGER_INSTRUMENT=1 (or --instrument on
+# the command line) wraps the task store and GUI views with timers and
+# counters; TASK_MANAGER_PROFILE=<path> (or --profile) also runs cProfile
+# and tracemalloc for the whole session. When neither is set nothing is
+# wrapped and there is no overhead
+SNAPSHOT_PATH = os.environ.get("TASK_MANAGER_METRICS_FILE", "task_manager_metrics.json")
+SNAPSHOT_INTERVAL = float(os.environ.get("TASK_MANAGER_METRICS_INTERVAL", 60))
+
+STORE_OPERATIONS = ["has_task", "get_task", "task_names", "user_tasks", "all_tasks", "add_task", "delete_task",
+                    "modify_task", "refresh_statuses", "refresh", "flush", "compact", "unload_user", "close"]
+
+# Operations that read every row of the table rather than one user's
+FULL_SCANS = {"all_tasks", "refresh_statuses"}
+
+# SQLite operations that write to the database
+SQLITE_WRITES = {"add_task", "delete_task", "modify_task", "refresh_statuses"}
+
+VIEW_OPERATIONS = ["show_task_dashboard", "show_view_tasks", "show_add_task", "show_delete_task",
+                   "show_modify_task", "show_calendar", "load_calendar_month", "filter_task_listbox",
+                   "fetch_task_page"]
+
+_enabled = os.environ.get("TASK_MANAGER_INSTRUMENT", "0") == "1"
+
+
+def enabled():
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+class Metrics:
+    # Per-operation call counts, times and counters. Counters are added to
+    # every operation in progress on the calling thread, so an operation's
+    # figures include the work of the operations it calls
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.operations = {}
+        self.totals = {}
+        self.started = time.time()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def timer(self, name):
+        stack = self._stack()
+        counters = {}
+        stack.append(counters)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            stack.pop()
+            with self._lock:
+                operation = self.operations.get(name)
+                if operation is None:
+                    operation = self.operations[name] = {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "counters": {}}
+                operation["calls"] += 1
+                operation["seconds"] += elapsed
+                operation["max_seconds"] = max(operation["max_seconds"], elapsed)
+                for counter, value in counters.items():
+                    operation["counters"][counter] = operation["counters"].get(counter, 0) + value
+
+    def count(self, counter, value=1):
+        for counters in self._stack():
+            counters[counter] = counters.get(counter, 0) + value
+        with self._lock:
+            self.totals[counter] = self.totals.get(counter, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            operations = {name: dict(operation, counters=dict(operation["counters"]),
+                                     mean_ms=operation["seconds"] / operation["calls"] * 1000)
+                          for name, operation in self.operations.items()}
+            return {"time": time.time(), "uptime_s": time.time() - self.started,
+                    "operations": operations, "totals": dict(self.totals)}
+
+    def write_snapshot(self, path=SNAPSHOT_PATH):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def report(self, file=sys.stderr):
+        snapshot = self.snapshot()
+        print(f"{'operation':<34}{'calls':>8}{'total ms':>12}{'mean ms':>10}{'max ms':>10}  counters", file=file)
+        for name, operation in sorted(snapshot["operations"].items(), key=lambda item: -item[1]["seconds"]):
+            counters = ", ".join(f"{counter}={value}" for counter, value in sorted(operation["counters"].items()))
+            print(f"{name:<34}{operation['calls']:>8}{operation['seconds'] * 1000:>12.1f}{operation['mean_ms']:>10.3f}"
+                  f"{operation['max_seconds'] * 1000:>10.3f}  {counters}", file=file)
+
+
+METRICS = Metrics()
+
+
+def timed(name, fn, after=None):
+    # fn wrapped in a timer; after(result) may add counters for the call
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with METRICS.timer(name):
+            result = fn(*args, **kwargs)
+            if after is not None:
+                after(result)
+            return result
+    return wrapper
+
+
+def frame_rows(result):
+    # Rows in a returned DataFrame, i.e. rows the call had to touch
+    if isinstance(result, pd.DataFrame):
+        METRICS.count("rows_scanned", len(result))
+
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def growth(path, method):
+    # Bytes a call adds to an append-only file
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        before = file_size(path)
+        result = method(*args, **kwargs)
+        METRICS.count("bytes_written", max(file_size(path) - before, 0))
+        return result
+    return wrapper
+
+
+def row_changes(database, method):
+    # SQLite reuses pages and preallocates its log, so file sizes say little
+    # about a small write; count the rows it changed instead
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        before = database.conn.total_changes
+        result = method(*args, **kwargs)
+        METRICS.count("rows_written", database.conn.total_changes - before)
+        return result
+    return wrapper
+
+
+def instrument_store(task_store):
+    # Wraps the store's public operations on this instance only
+    database = getattr(task_store, "db", None)
+    for name in STORE_OPERATIONS:
+        method = getattr(task_store, name, None)
+        if method is None:
+            continue
+        if database is not None and name in SQLITE_WRITES:
+            method = row_changes(database, method)
+        if name in FULL_SCANS and hasattr(task_store, "_df"):
+            after = lambda result, task_store=task_store: METRICS.count("rows_scanned", len(task_store._df))
+        else:
+            after = frame_rows
+        setattr(task_store, name, timed(f"store.{name}", method, after))
+
+    journal = getattr(task_store, "journal", None)
+    if journal is not None:
+        # Journal appends and snapshot rewrites are the CSV backend's only writes
+        journal.flush = timed("store.journal_flush", growth(journal.path, journal.flush))
+        for name in ("_write_snapshot", "_write_grouped_snapshot"):
+            write = getattr(task_store, name)
+            setattr(task_store, name, timed("store.write_snapshot", write,
+                                            lambda result: METRICS.count("bytes_written", file_size(task_store.path))))
+    return task_store
+
+
+def count_widgets(widget):
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+def instrument_gui(app):
+    # Times the dashboard's views and counts the widgets each one leaves
+    # behind, on this instance only
+    for name in VIEW_OPERATIONS:
+        method = getattr(app, name)
+
+        def view(*args, method=method, **kwargs):
+            before = count_widgets(app.root)
+            result = method(*args, **kwargs)
+            METRICS.count("widgets_created", max(count_widgets(app.root) - before, 0))
+            return result
+        setattr(app, name, timed(f"view.{name}", view))
+    return app
+
+
+def instrument_task_list(view):
+    # Times a task list's loads and batches and counts the rows they insert.
+    # The list schedules its next batch through self, so it gets the wrapper
+    insert_batch = view.insert_batch
+
+    def insert_rows(names, start):
+        before = len(view.tree.get_children()) if view.tree.winfo_exists() else 0
+        insert_batch(names, start)
+        if view.tree.winfo_exists():
+            METRICS.count("tree_rows_inserted", len(view.tree.get_children()) - before)
+    view.insert_batch = timed("view.insert_batch", insert_rows)
+    view.load = timed("view.task_list_load", view.load)
+    return view
+
+
+class ProfileSession:
+    # cProfile and tracemalloc for one run. The profile is written to `path`
+    # (open it with pstats or snakeviz) and the largest allocation sites to
+    # path.memory.txt. cProfile only sees the thread that started it
+    def __init__(self, path):
+        self.path = path
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        tracemalloc.start()
+        self.profiler.enable()
+        return self
+
+    def stop(self):
+        self.profiler.disable()
+        self.profiler.dump_stats(self.path)
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics("lineno")[:25]
+        tracemalloc.stop()
+        with open(self.path + ".memory.txt", "w", encoding="utf-8") as f:
+            f.write(f"Peak traced memory: {peak / 2 ** 20:.1f} MB, at exit: {current / 2 ** 20:.1f} MB\n\n")
+            for stat in top:
+                f.write(f"{stat}\n")
+
+
+def _snapshot_loop(stop_event, path, interval):
+    while not stop_event.wait(interval):
+        METRICS.write_snapshot(path)
+
+
+@contextmanager
+def session(instrument=False, profile_path=None):
+    # Wraps a program run: periodic metrics snapshots while it runs, and a
+    # final snapshot plus a report on stderr at the end
+    if instrument:
+        enable()
+    profile_path = profile_path or os.environ.get("TASK_MANAGER_PROFILE")
+    profile = ProfileSession(profile_path).start() if profile_path else None
+    stop_event = None
+    if _enabled:
+        stop_event = threading.Event()
+        threading.Thread(target=_snapshot_loop, args=(stop_event, SNAPSHOT_PATH, SNAPSHOT_INTERVAL),
+                         name="metrics-snapshot", daemon=True).start()
+    try:
+        yield METRICS
+    finally:
+        if profile is not None:
+            profile.stop()
+        if stop_event is not None:
+            stop_event.set()
+            METRICS.write_snapshot()
+            METRICS.report()
+
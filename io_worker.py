@@ -0,0 +1,65 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class IOWorker:
+    # Runs disk and network work on background threads. Callbacks are queued
+    # and run on the Tk thread by polling with root.after, because Tk widgets
+    # must only be touched from the thread running mainloop
+    def __init__(self, root, max_workers=2, poll_interval=50):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="io-worker")
+        self.results = queue.Queue()
+        self._coalesced = {}
+        self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def submit(self, fn, *args, on_done=None, on_error=None, on_progress=None):
+        # fn(*args) runs on a worker thread; with on_progress it is also given
+        # a progress(value) function it can call while running
+        return self.executor.submit(self._run, fn, args, on_done, on_error, on_progress)
+
+    def _run(self, fn, args, on_done, on_error, on_progress):
+        try:
+            if on_progress is not None:
+                result = fn(*args, progress=lambda value: self.results.put((on_progress, value)))
+            else:
+                result = fn(*args)
+        except Exception as e:
+            if on_error is not None:
+                self.results.put((on_error, e))
+            return
+        if on_done is not None:
+            self.results.put((on_done, result))
+
+    def coalesce(self, key, fn, *args, delay=500, on_done=None, on_error=None):
+        # Calls with the same key within `delay` ms collapse into one run,
+        # so a burst of edits is flushed once
+        pending = self._coalesced.pop(key, None)
+        if pending is not None:
+            self.root.after_cancel(pending[0])
+        after_id = self.root.after(delay, self._submit_coalesced, key, fn, args, on_done, on_error)
+        self._coalesced[key] = (after_id, fn, args)
+
+    def _submit_coalesced(self, key, fn, args, on_done, on_error):
+        self._coalesced.pop(key, None)
+        self.submit(fn, *args, on_done=on_done, on_error=on_error)
+
+    def _poll(self):
+        while True:
+            try:
+                callback, value = self.results.get_nowait()
+            except queue.Empty:
+                break
+            callback(value)
+        self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def shutdown(self):
+        # Wait for running work, then run coalesced jobs that were still
+        # waiting for their delay so nothing is lost on exit
+        self.root.after_cancel(self._poll_id)
+        self.executor.shutdown(wait=True)
+        for after_id, fn, args in self._coalesced.values():
+            self.root.after_cancel(after_id)
+            fn(*args)
+        self._coalesced = {}
@@ -0,0 +1,94 @@
+import os
+import smtplib
+import threading
+import time
+
+
+class MailTransport:
+    # Keeps one authenticated SMTP session open and reuses it across sends.
+    # Settings come from TASK_MANAGER_SMTP_* environment variables, so tests
+    # can point it at a local stand-in such as aiosmtpd:
+    #   TASK_MANAGER_SMTP_HOST=localhost TASK_MANAGER_SMTP_PORT=8025
+    #   TASK_MANAGER_SMTP_STARTTLS=0 TASK_MANAGER_SMTP_USER=
+    def __init__(self, host=None, port=None, username=None, password=None, starttls=None,
+                 sender=None, timeout=30, health_check_interval=30):
+        self.host = host or os.environ.get("TASK_MANAGER_SMTP_HOST", "smtp.gmail.com")
+        self.port = int(port or os.environ.get("TASK_MANAGER_SMTP_PORT", 587))
+        self.username = username if username is not None else os.environ.get("TASK_MANAGER_SMTP_USER", "gmail id")
+        self.password = password if password is not None else os.environ.get("TASK_MANAGER_SMTP_PASSWORD", "password")
+        if starttls is None:
+            starttls = os.environ.get("TASK_MANAGER_SMTP_STARTTLS", "1") == "1"
+        self.starttls = starttls
+        self.sender = sender or os.environ.get("TASK_MANAGER_SMTP_SENDER") or self.username
+        self.timeout = timeout
+        # A NOOP is only sent when the session has been idle this many seconds
+        self.health_check_interval = health_check_interval
+        self._conn = None
+        self._last_used = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            conn.starttls()
+        if self.username:
+            conn.login(self.username, self.password)
+        return conn
+
+    def _disconnect(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.quit()
+        except (smtplib.SMTPException, OSError):
+            self._conn.close()
+        self._conn = None
+
+    def _is_alive(self):
+        try:
+            return self._conn.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _connection(self):
+        if self._conn is not None and time.monotonic() - self._last_used > self.health_check_interval:
+            if not self._is_alive():
+                self._disconnect()
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def _send(self, to_addr, message):
+        try:
+            self._connection().sendmail(self.sender, to_addr, message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # The server dropped an idle session; reconnect once and retry
+            self._disconnect()
+            self._connection().sendmail(self.sender, to_addr, message)
+        self._last_used = time.monotonic()
+
+    def send(self, to_addr, message):
+        with self._lock:
+            self._send(to_addr, message)
+
+    def send_many(self, messages):
+        # Delivers (to_addr, message) pairs over one session and returns the
+        # failures as {to_addr: error} instead of stopping at the first one
+        failures = {}
+        with self._lock:
+            for to_addr, message in messages:
+                try:
+                    self._send(to_addr, message)
+                except (smtplib.SMTPException, OSError) as e:
+                    failures[to_addr] = e
+        return failures
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
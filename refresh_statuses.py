@@ -0,0 +1,92 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from repository import open_repositories
+from task_schema import STATUS_DTYPE, format_tasks
+from task_store import TaskStore
+
+
+def synthetic_tasks(rows, users=10000, seed=0):
+    # Tasks spread over a week either side of now, all still Upcoming
+    rng = np.random.default_rng(seed)
+    now = pd.Timestamp(datetime.now()).floor("min")
+    start = now + pd.to_timedelta(rng.integers(-7 * 24 * 60, 7 * 24 * 60, rows), unit="min")
+    end = start + pd.to_timedelta(rng.integers(30, 3 * 24 * 60, rows), unit="min")
+    user_ids = rng.integers(0, users, rows)
+    return pd.DataFrame({
+        "user_email": pd.Categorical([f"user{i}@example.com" for i in user_ids]),
+        "task_name": [f"Task {i}" for i in range(rows)],
+        "task_start": start,
+        "task_end": end,
+        "task_status": pd.Categorical(["Upcoming"] * rows, dtype=STATUS_DTYPE)
+    })
+
+
+def benchmark(rows, sample):
+    with tempfile.TemporaryDirectory() as data_dir:
+        source_path = os.path.join(data_dir, "synthetic.csv")
+        path = os.path.join(data_dir, "task_manager.csv")
+        format_tasks(synthetic_tasks(rows)).to_csv(source_path, index=False)
+        shutil.copy(source_path, path)
+        now = datetime.now()
+
+        task_store = TaskStore(path)
+        started = time.perf_counter()
+        changed = task_store.refresh_statuses(now)
+        task_store.compact(wait=True)
+        task_store.close()
+        vectorized = time.perf_counter() - started
+        print(f"Vectorized: {changed} of {rows} tasks changed in {vectorized:.2f}s (including the write)")
+
+        # The row-by-row path is timed on a sample and scaled up, since a
+        # million individual modify_task calls would take far too long
+        shutil.copy(source_path, path)
+        task_store = TaskStore(path)
+        df_tasks = task_store.all_tasks()
+        started = time.perf_counter()
+        done = 0
+        for user_email, task_name, task_start, task_end in zip(df_tasks['user_email'], df_tasks['task_name'],
+                                                                df_tasks['task_start'], df_tasks['task_end']):
+            if task_start > now:
+                continue
+            status = "Overdue" if task_end <= now else "Ongoing"
+            task_store.modify_task(user_email, task_name, 'task_status', status)
+            done += 1
+            if done == sample:
+                break
+        task_store.compact(wait=True)
+        task_store.close()
+        per_task = (time.perf_counter() - started) / max(done, 1)
+        print(f"Row by row: {per_task * 1e6:.0f}us per task, about {per_task * changed:.0f}s "
+              f"for {changed} tasks (measured on {done})")
+        print(f"Speedup: {per_task * changed / vectorized:.0f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Set every task's status from its start and end times")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], help="storage backend (default: TASK_MANAGER_BACKEND)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="compare the batch update with row-by-row updates on a synthetic table")
+    parser.add_argument("--rows", type=int, default=1000000, help="rows in the benchmark table")
+    parser.add_argument("--sample", type=int, default=10000, help="row-by-row updates actually timed")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark(args.rows, args.sample)
+        return 0
+
+    user_registry, task_store = open_repositories(args.backend)
+    changed = task_store.refresh_statuses()
+    task_store.close()
+    user_registry.close()
+    print(f"Updated the status of {changed} tasks")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,130 @@
+import os
+
+
+class ConflictError(ValueError):
+    # Another program changed the task since it was read
+    pass
+
+
+class TaskRepository:
+    # Operations every task storage backend provides
+    def __init__(self):
+        self.listeners = []
+
+    def subscribe(self, listener):
+        # listener(op, user_email, task_name, task) is called after every change.
+        # op is "add", "update" or "delete"; task_name is the name before the
+        # change and task is the task's new typed row, or None when deleted.
+        # op "reload" (user_email, task_name and task all None) means the
+        # store was reloaded from disk and cached views must be rebuilt
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def notify(self, op, user_email, task_name, task=None):
+        for listener in list(self.listeners):
+            listener(op, user_email, task_name, task)
+
+    def has_task(self, user_email, task_name):
+        raise NotImplementedError
+
+    def get_task(self, user_email, task_name):
+        raise NotImplementedError
+
+    def task_names(self, user_email):
+        raise NotImplementedError
+
+    def user_tasks(self, user_email):
+        raise NotImplementedError
+
+    def all_tasks(self):
+        raise NotImplementedError
+
+    def add_task(self, task_dict):
+        raise NotImplementedError
+
+    def task_version(self, user_email, task_name):
+        # Opaque number that changes whenever the task does. Passing it back as
+        # `version` to modify_task/delete_task raises ConflictError if another
+        # program changed the task in between
+        raise NotImplementedError
+
+    def delete_task(self, user_email, task_name, version=None):
+        raise NotImplementedError
+
+    def modify_task(self, user_email, task_name, field, value, version=None):
+        raise NotImplementedError
+
+    def refresh_statuses(self, now=None):
+        # Sets every task's status from its start/end times at `now` in one
+        # batch and returns how many tasks changed
+        raise NotImplementedError
+
+    def unload_user(self, user_email):
+        # Backends that cache a user's tasks in memory can release them here
+        pass
+
+    def refresh(self):
+        # Picks up changes made by other programs sharing the same files and
+        # tells the listeners about them
+        pass
+
+    def flush(self):
+        # Persists writes buffered by a backend opened with autoflush=False
+        pass
+
+    def close(self):
+        pass
+
+
+class UserRepository:
+    # Operations every user storage backend provides
+    def __contains__(self, user_email):
+        raise NotImplementedError
+
+    def get_user(self, user_email):
+        raise NotImplementedError
+
+    def register(self, user_email, user_password, user_name):
+        raise NotImplementedError
+
+    def authenticate(self, user_email, user_password):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def open_repositories(backend=None, data_dir=".", autoflush=True):
+    # Returns (users, tasks) for the backend named by TASK_MANAGER_BACKEND.
+    # With autoflush=False task writes are buffered until tasks.flush()
+    import instrumentation
+    if not instrumentation.enabled():
+        return _open_repositories(backend, data_dir, autoflush)
+    with instrumentation.METRICS.timer("store.open"):
+        user_registry, task_store = _open_repositories(backend, data_dir, autoflush)
+    return user_registry, instrumentation.instrument_store(task_store)
+
+
+def _open_repositories(backend, data_dir, autoflush):
+    backend = backend or os.environ.get("TASK_MANAGER_BACKEND", "csv")
+    if backend == "csv":
+        from task_store import TaskStore
+        from user_registry import UserRegistry
+        # TASK_MANAGER_LAZY_LOAD=1 reads each user's tasks only after login
+        lazy = os.environ.get("TASK_MANAGER_LAZY_LOAD", "0") == "1"
+        return (UserRegistry(os.path.join(data_dir, "users.csv")),
+                TaskStore(os.path.join(data_dir, "task_manager.csv"), lazy=lazy, autoflush=autoflush))
+    if backend == "sqlite":
+        from sqlite_repository import SqliteDatabase, SqliteTaskRepository, SqliteUserRepository
+        database = SqliteDatabase(os.path.join(data_dir, "task_manager.db"), autocommit=autoflush)
+        return SqliteUserRepository(database), SqliteTaskRepository(database)
+    if backend == "arrow":
+        from task_arrow import ArrowTaskStore
+        from user_registry import UserRegistry
+        # Read-only tasks from an export made with `python task_arrow.py export task_manager.arrow`
+        return (UserRegistry(os.path.join(data_dir, "users.csv")),
+                ArrowTaskStore(os.path.join(data_dir, "task_manager.arrow")))
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,292 @@
+import argparse
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from repository import ConflictError, TaskRepository, UserRepository
+from task_schema import TASK_COLUMNS, due_statuses, format_tasks, parse_tasks, stored_task, stored_value
+from task_store import TaskStore, journal_path
+from user_registry import USER_COLUMNS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_email TEXT PRIMARY KEY,
+    user_password TEXT NOT NULL,
+    user_name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id INTEGER PRIMARY KEY,
+    user_email TEXT NOT NULL,
+    task_name TEXT NOT NULL,
+    task_start_date TEXT,
+    task_start_time TEXT,
+    task_end_date TEXT,
+    task_end_time TEXT,
+    task_status TEXT,
+    version INTEGER NOT NULL DEFAULT 0
+);
+-- user_email leads this index, so it also serves the per-user listings
+CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_user_task ON tasks (user_email, task_name);
+"""
+
+# Statements are kept constant so sqlite3's statement cache reuses the
+# compiled form on every call
+SELECT_USER = "SELECT user_password, user_name FROM users WHERE user_email = ?"
+INSERT_USER = "INSERT INTO users (user_email, user_password, user_name) VALUES (?, ?, ?)"
+SELECT_USER_TASKS = ("SELECT " + ", ".join(TASK_COLUMNS) +
+                     " FROM tasks WHERE user_email = ? ORDER BY task_id")
+SELECT_ALL_TASKS = "SELECT " + ", ".join(TASK_COLUMNS) + " FROM tasks ORDER BY task_id"
+SELECT_TASK_NAMES = "SELECT task_name FROM tasks WHERE user_email = ? ORDER BY task_id"
+SELECT_TASK = "SELECT 1 FROM tasks WHERE user_email = ? AND task_name = ?"
+SELECT_TASK_ROW = ("SELECT " + ", ".join(TASK_COLUMNS) +
+                   " FROM tasks WHERE user_email = ? AND task_name = ?")
+INSERT_TASK = ("INSERT INTO tasks (" + ", ".join(TASK_COLUMNS) + ") VALUES (" +
+               ", ".join("?" for _ in TASK_COLUMNS) + ")")
+# Imports update existing tasks in place, keeping their task_id and bumping
+# their version so writers holding the old one see a conflict
+UPSERT_TASK = (INSERT_TASK + " ON CONFLICT (user_email, task_name) DO UPDATE SET " +
+               ", ".join(f"{field} = excluded.{field}" for field in TASK_COLUMNS[2:]) + ", version = version + 1")
+SELECT_TASK_VERSION = "SELECT version FROM tasks WHERE user_email = ? AND task_name = ?"
+# Writes take an expected version; NULL skips the check
+DELETE_TASK = "DELETE FROM tasks WHERE user_email = ? AND task_name = ? AND (? IS NULL OR version = ?)"
+# Column names cannot be bound as parameters, so there is one statement per field
+UPDATE_TASK = {field: f"UPDATE tasks SET {field} = ?, version = version + 1 "
+                      "WHERE user_email = ? AND task_name = ? AND (? IS NULL OR version = ?)"
+               for field in TASK_COLUMNS if field != "user_email"}
+
+
+def to_text(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return str(value)
+
+
+class SqliteDatabase:
+    def __init__(self, path="./task_manager.db", autocommit=True):
+        self.path = path
+        # Without autocommit writes stay in an open transaction until flush()
+        self.autocommit = autocommit
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(tasks)")]
+        if "version" not in columns:
+            # Databases created before tasks were versioned
+            self.conn.execute("ALTER TABLE tasks ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        # The UI and background threads share one connection
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def write(self):
+        # Each write runs in a savepoint, so a failed write is undone without
+        # discarding earlier writes that are waiting for a deferred commit
+        with self.lock:
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN")
+            self.conn.execute("SAVEPOINT task_write")
+            try:
+                yield self.conn
+            except Exception:
+                self.conn.execute("ROLLBACK TO task_write")
+                self.conn.execute("RELEASE task_write")
+                raise
+            self.conn.execute("RELEASE task_write")
+            if self.autocommit:
+                self.conn.commit()
+
+    def flush(self):
+        with self.lock:
+            self.conn.commit()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+class SqliteUserRepository(UserRepository):
+    def __init__(self, database):
+        self.db = database
+
+    def __contains__(self, user_email):
+        return self.get_user(user_email) is not None
+
+    def get_user(self, user_email):
+        with self.db.lock:
+            row = self.db.conn.execute(SELECT_USER, (user_email,)).fetchone()
+        if row is None:
+            return None
+        return {"user_password": row[0], "user_name": row[1]}
+
+    def register(self, user_email, user_password, user_name):
+        try:
+            with self.db.write():
+                self.db.conn.execute(INSERT_USER, (user_email, user_password, user_name))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"User {user_email} is already registered")
+        # Registrations are committed at once, even when task writes are deferred
+        self.db.flush()
+
+    def authenticate(self, user_email, user_password):
+        user = self.get_user(user_email)
+        if user is None or user["user_password"] != user_password:
+            return None
+        return user["user_name"]
+
+
+class SqliteTaskRepository(TaskRepository):
+    def __init__(self, database):
+        super().__init__()
+        self.db = database
+        # Changes when another connection commits, see refresh()
+        self._data_version = self._read_data_version()
+
+    def _read_data_version(self):
+        with self.db.lock:
+            return self.db.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def refresh(self):
+        # SQLite keeps other processes' writes consistent on its own; this only
+        # tells listeners that their cached views may be stale
+        data_version = self._read_data_version()
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self.notify("reload", None, None)
+
+    def task_version(self, user_email, task_name):
+        with self.db.lock:
+            row = self.db.conn.execute(SELECT_TASK_VERSION, (user_email, task_name)).fetchone()
+        return None if row is None else row[0]
+
+    def has_task(self, user_email, task_name):
+        with self.db.lock:
+            return self.db.conn.execute(SELECT_TASK, (user_email, task_name)).fetchone() is not None
+
+    def get_task(self, user_email, task_name):
+        with self.db.lock:
+            rows = pd.read_sql_query(SELECT_TASK_ROW, self.db.conn, params=(user_email, task_name))
+        rows = parse_tasks(rows)
+        if len(rows) == 0:
+            return None
+        return rows.iloc[0].to_dict()
+
+    def task_names(self, user_email):
+        with self.db.lock:
+            return [row[0] for row in self.db.conn.execute(SELECT_TASK_NAMES, (user_email,))]
+
+    def user_tasks(self, user_email):
+        with self.db.lock:
+            rows = pd.read_sql_query(SELECT_USER_TASKS, self.db.conn, params=(user_email,))
+        return parse_tasks(rows)
+
+    def all_tasks(self):
+        with self.db.lock:
+            rows = pd.read_sql_query(SELECT_ALL_TASKS, self.db.conn)
+        return parse_tasks(rows)
+
+    def add_task(self, task_dict):
+        task = stored_task(task_dict)
+        try:
+            with self.db.write():
+                self.db.conn.execute(INSERT_TASK, [to_text(task[field]) for field in TASK_COLUMNS])
+        except sqlite3.IntegrityError:
+            raise ValueError(f"A task named '{task_dict['task_name']}' already exists")
+        self.notify("add", task["user_email"], task["task_name"], self.get_task(task["user_email"], task["task_name"]))
+
+    def _check_written(self, rowcount, user_email, task_name, version):
+        # A versioned write that matched nothing hit a stale version if the task still exists
+        if rowcount == 0 and version is not None and \
+                self.db.conn.execute(SELECT_TASK, (user_email, task_name)).fetchone() is not None:
+            raise ConflictError(f"'{task_name}' was changed by someone else; reload it and try again")
+
+    def delete_task(self, user_email, task_name, version=None):
+        with self.db.write():
+            deleted = self.db.conn.execute(DELETE_TASK, (user_email, task_name, version, version)).rowcount
+            self._check_written(deleted, user_email, task_name, version)
+        if deleted:
+            self.notify("delete", user_email, task_name)
+
+    def modify_task(self, user_email, task_name, field, value, version=None):
+        if field not in UPDATE_TASK:
+            raise ValueError(f"Unknown task field: {field}")
+        try:
+            with self.db.write():
+                updated = self.db.conn.execute(UPDATE_TASK[field], (to_text(stored_value(field, value)),
+                                                                    user_email, task_name, version, version)).rowcount
+                self._check_written(updated, user_email, task_name, version)
+        except sqlite3.IntegrityError:
+            raise ValueError(f"A task named '{value}' already exists")
+        if updated:
+            new_name = value if field == "task_name" else task_name
+            self.notify("update", user_email, task_name, self.get_task(user_email, new_name))
+
+    def refresh_statuses(self, now=None):
+        # Statuses are computed for the whole table at once in pandas and the
+        # changed rows are written in one transaction
+        now = now or datetime.now()
+        with self.db.write():
+            df_tasks = parse_tasks(pd.read_sql_query(SELECT_ALL_TASKS, self.db.conn))
+            statuses = due_statuses(df_tasks, now)
+            changed = statuses.codes != df_tasks['task_status'].cat.codes.to_numpy()
+            updates = list(zip(np.asarray(statuses)[changed], df_tasks['user_email'].to_numpy()[changed],
+                               df_tasks['task_name'].to_numpy()[changed], [None] * int(changed.sum()),
+                               [None] * int(changed.sum())))
+            self.db.conn.executemany(UPDATE_TASK["task_status"], updates)
+        if self.listeners:
+            for _, user_email, task_name, _, _ in updates:
+                self.notify("update", user_email, task_name, self.get_task(user_email, task_name))
+        return len(updates)
+
+    def flush(self):
+        self.db.flush()
+
+    def close(self):
+        self.db.close()
+
+
+def import_csv(database, users_path="./users.csv", tasks_path="./task_manager.csv", chunksize=50000):
+    # Load the CSV files in one transaction, streaming tasks in chunks
+    if os.path.exists(journal_path(tasks_path)):
+        # Fold pending journal records into the CSV so the import sees them
+        task_store = TaskStore(tasks_path)
+        task_store.compact(wait=True)
+        task_store.close()
+    with database.lock, database.conn:
+        df_users = pd.read_csv(users_path, dtype=object).dropna(subset=["user_email"])
+        database.conn.executemany(
+            "INSERT OR REPLACE INTO users (user_email, user_password, user_name) VALUES (?, ?, ?)",
+            df_users[USER_COLUMNS].itertuples(index=False, name=None))
+        for chunk in pd.read_csv(tasks_path, dtype=object, chunksize=chunksize):
+            chunk = format_tasks(parse_tasks(chunk.dropna(subset=["user_email", "task_name"])))
+            database.conn.executemany(
+                UPSERT_TASK,
+                ([to_text(value) for value in row] for row in chunk[TASK_COLUMNS].itertuples(index=False, name=None)))
+
+
+def export_csv(database, users_path="./users.csv", tasks_path="./task_manager.csv", chunksize=50000):
+    pd.read_sql_query("SELECT " + ", ".join(USER_COLUMNS) + " FROM users", database.conn).to_csv(users_path, index=False)
+    header = True
+    for chunk in pd.read_sql_query(SELECT_ALL_TASKS, database.conn, chunksize=chunksize):
+        chunk.to_csv(tasks_path, index=False, header=header, mode="w" if header else "a")
+        header = False
+    if header:
+        pd.DataFrame(columns=TASK_COLUMNS).to_csv(tasks_path, index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy task manager data between the CSV files and SQLite")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("--db", default="./task_manager.db")
+    parser.add_argument("--users", default="./users.csv")
+    parser.add_argument("--tasks", default="./task_manager.csv")
+    args = parser.parse_args()
+
+    database = SqliteDatabase(args.db)
+    if args.action == "import":
+        import_csv(database, args.users, args.tasks)
+    else:
+        export_csv(database, args.users, args.tasks)
+    database.close()
@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import json
+import re
+import secrets
+import pandas as pd
+import instrumentation
+from urllib.parse import unquote, urlsplit
+from mail_transport import MailTransport
+from repository import open_repositories
+from task_schema import TASK_STATUSES, format_date, format_time, read_date, read_time
+from task_views import TaskViewCache
+
+EMAIL_REGEX = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,7}\b'
+
+TASK_FIELDS = ["task_name", "task_start_date", "task_start_time", "task_end_date", "task_end_time", "task_status"]
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+MAX_BODY = 1024 * 1024
+
+# Reads pick up other programs' writes at most this many seconds late;
+# writes always catch up first
+REFRESH_SECONDS = 0.05
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def check_fields(data):
+    for field, value in data.items():
+        if field not in TASK_FIELDS:
+            raise HttpError(400, f"Unknown field: {field}")
+        if not isinstance(value, str):
+            raise HttpError(400, f"{field} must be a string")
+        if field.endswith("_date") and read_date(value) is None:
+            raise HttpError(400, f"{field} must be a valid date in YYYY-MM-DD format")
+        if field.endswith("_time") and read_time(value) is None:
+            raise HttpError(400, f"{field} must be a valid time in HH:MM format")
+        if field == "task_status" and value not in TASK_STATUSES:
+            raise HttpError(400, f"Task status must be one of {', '.join(TASK_STATUSES)}")
+        if field == "task_name" and not value.strip():
+            raise HttpError(400, "Task name cannot be empty")
+
+
+def pop_version(data):
+    # Optional version from an earlier GET; a write fails with 409 if the task
+    # has changed since
+    version = data.pop("version", None)
+    if version is not None and (not isinstance(version, int) or isinstance(version, bool)):
+        raise HttpError(400, "version must be an integer")
+    return version
+
+
+def task_json(df_tasks):
+    # Per-row formatting beats building a formatted frame for the few dozen
+    # tasks a user typically has
+    return [{"user_email": user_email, "task_name": task_name,
+             "task_start_date": format_date(task_start), "task_start_time": format_time(task_start),
+             "task_end_date": format_date(task_end), "task_end_time": format_time(task_end),
+             "task_status": "" if pd.isna(task_status) else task_status}
+            for user_email, task_name, task_start, task_end, task_status in zip(
+                df_tasks['user_email'], df_tasks['task_name'], df_tasks['task_start'],
+                df_tasks['task_end'], df_tasks['task_status'])]
+
+
+class TaskApiServer:
+    # One in-memory store shared by every client. Handlers run on the event
+    # loop, so reads never wait for each other. Writes are applied one at a
+    # time under write_lock and then wait for a flush on a worker thread;
+    # writes that arrive while a flush is running are saved by the next one
+    def __init__(self, user_registry, task_store, mail_transport=None):
+        self.user_registry = user_registry
+        self.task_store = task_store
+        self.mail_transport = mail_transport or MailTransport()
+        self.sessions = {}
+        # Task lists and email bodies are reused until the user's tasks change
+        self.task_views = TaskViewCache(task_store)
+        self.write_lock = asyncio.Lock()
+        self.flush_lock = asyncio.Lock()
+        self._flush_waiter = None
+        self._refreshed_at = None
+        self._refreshing = None
+        self.routes = {
+            ("POST", "login"): self.login,
+            ("POST", "logout"): self.logout,
+            ("GET", "tasks"): self.list_tasks,
+            ("POST", "tasks"): self.add_task,
+            ("GET", "task"): self.get_task,
+            ("PATCH", "task"): self.modify_task,
+            ("DELETE", "task"): self.delete_task,
+            ("POST", "email"): self.email_tasks
+        }
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                length = headers.get("content-length", "0")
+                if not (length.isascii() and length.isdigit()):
+                    # The body cannot be found, so the connection cannot be reused
+                    await self.respond(writer, 400, {"error": "Invalid Content-Length"}, keep_alive=False)
+                    break
+                length = int(length)
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {"error": "Request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, payload = await self.dispatch(request_line, headers, body)
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive=True):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+
+    async def dispatch(self, request_line, headers, body):
+        try:
+            method, target, _ = request_line.split(" ", 2)
+            parts = [unquote(part) for part in urlsplit(target).path.strip("/").split("/")]
+            if parts == ["tasks"]:
+                resource, args = "tasks", ()
+            elif len(parts) == 2 and parts[0] == "tasks":
+                resource, args = "task", (parts[1],)
+            elif len(parts) == 1 and parts[0] in ("login", "logout", "email"):
+                resource, args = parts[0], ()
+            else:
+                raise HttpError(404, "Not found")
+            handler = self.routes.get((method, resource))
+            if handler is None:
+                raise HttpError(405, f"{method} is not allowed here")
+            try:
+                data = json.loads(body) if body else {}
+            except ValueError:
+                raise HttpError(400, "Request body is not valid JSON")
+            if not isinstance(data, dict):
+                raise HttpError(400, "Request body must be a JSON object")
+            await self.refresh()
+            if resource == "login":
+                return await handler(data)
+            return await handler(self.session_user(headers), data, *args)
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except ValueError as e:
+            return 409, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+    def session_user(self, headers):
+        token = headers.get("authorization", "").removeprefix("Bearer ").strip()
+        user_email = self.sessions.get(token)
+        if user_email is None:
+            raise HttpError(401, "Log in first and send the token as 'Authorization: Bearer <token>'")
+        return user_email, token
+
+    async def refresh(self):
+        # Other processes may share the data files. Catching up takes the file
+        # lock, which a flush or another program can hold for a while, so it
+        # runs on a worker thread and requests arriving meanwhile share it
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if self._refreshing is None and (self._refreshed_at is None or now - self._refreshed_at >= REFRESH_SECONDS):
+            self._refreshed_at = now
+            self._refreshing = loop.run_in_executor(None, self.task_store.refresh)
+        if self._refreshing is not None:
+            refreshing = self._refreshing
+            try:
+                await refreshing
+            finally:
+                if self._refreshing is refreshing:
+                    self._refreshing = None
+
+    async def commit(self):
+        # Group commit: wait until a flush that started after this write is done
+        if self._flush_waiter is None:
+            self._flush_waiter = asyncio.get_running_loop().create_future()
+            asyncio.ensure_future(self._flush())
+        await asyncio.shield(self._flush_waiter)
+
+    async def _flush(self):
+        async with self.flush_lock:
+            waiter, self._flush_waiter = self._flush_waiter, None
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.task_store.flush)
+            except Exception as e:
+                waiter.set_exception(e)
+            else:
+                waiter.set_result(None)
+
+    async def login(self, data):
+        user_email = str(data.get("email", "")).strip()
+        user_password = str(data.get("password", ""))
+        if re.match(EMAIL_REGEX, user_email) is None:
+            raise HttpError(400, "Invalid email format")
+        if user_email not in self.user_registry:
+            user_name = str(data.get("name", "")).strip()
+            if not user_name:
+                raise HttpError(401, "New user: send a name to register")
+            async with self.write_lock:
+                self.user_registry.register(user_email, user_password, user_name)
+        else:
+            user_name = self.user_registry.authenticate(user_email, user_password)
+            if user_name is None:
+                raise HttpError(401, "Incorrect password")
+        token = secrets.token_urlsafe(24)
+        self.sessions[token] = user_email
+        return 200, {"token": token, "user_name": user_name}
+
+    async def logout(self, session, data):
+        user_email, token = session
+        del self.sessions[token]
+        if user_email not in self.sessions.values():
+            self.task_store.unload_user(user_email)
+            self.task_views.forget(user_email)
+        return 200, {}
+
+    async def list_tasks(self, session, data):
+        return 200, self.task_views.get(session[0], "json", lambda: task_json(self.task_store.user_tasks(session[0])))
+
+    async def get_task(self, session, data, task_name):
+        df_tasks = self.task_store.user_tasks(session[0])
+        df_tasks = df_tasks[df_tasks['task_name'] == task_name]
+        if len(df_tasks) == 0:
+            raise HttpError(404, f"No task named '{task_name}'")
+        task = task_json(df_tasks)[0]
+        task["version"] = self.task_store.task_version(session[0], task_name)
+        return 200, task
+
+    async def add_task(self, session, data):
+        missing = [field for field in TASK_FIELDS[:-1] if field not in data]
+        if missing:
+            raise HttpError(400, f"Missing fields: {', '.join(missing)}")
+        check_fields(data)
+        task_dict = {"user_email": session[0], "task_status": "Upcoming"}
+        task_dict.update(data)
+        async with self.write_lock:
+            self.task_store.add_task(task_dict)
+            version = self.task_store.task_version(session[0], task_dict["task_name"])
+        await self.commit()
+        return 201, {"task_name": task_dict["task_name"], "version": version}
+
+    async def modify_task(self, session, data, task_name):
+        version = pop_version(data)
+        check_fields(data)
+        async with self.write_lock:
+            if not self.task_store.has_task(session[0], task_name):
+                raise HttpError(404, f"No task named '{task_name}'")
+            new_name = data.get("task_name", task_name)
+            if new_name != task_name and self.task_store.has_task(session[0], new_name):
+                raise HttpError(409, f"A task named '{new_name}' already exists")
+            # The name is changed last so the other fields still find the task
+            # The version is checked by the first write; the rest build on it
+            for field in sorted(data, key=lambda field: field == "task_name"):
+                self.task_store.modify_task(session[0], task_name, field, data[field], version)
+                version = None
+            version = self.task_store.task_version(session[0], new_name)
+        await self.commit()
+        return 200, {"task_name": new_name, "version": version}
+
+    async def delete_task(self, session, data, task_name):
+        version = pop_version(data)
+        async with self.write_lock:
+            if not self.task_store.has_task(session[0], task_name):
+                raise HttpError(404, f"No task named '{task_name}'")
+            self.task_store.delete_task(session[0], task_name, version)
+        await self.commit()
+        return 200, {}
+
+    async def email_tasks(self, session, data):
+        user_email = session[0]
+        if len(self.task_store.task_names(user_email)) == 0:
+            raise HttpError(404, "You don't have any tasks to email")
+        user_name = self.user_registry.get_user(user_email)["user_name"]
+        message = self.task_views.email(user_email, user_name)
+        await asyncio.get_running_loop().run_in_executor(None, self.mail_transport.send, user_email, message)
+        return 200, {}
+
+    def close(self):
+        self.mail_transport.close()
+        self.task_store.close()
+        self.user_registry.close()
+
+
+async def serve(host, port, backend=None):
+    user_registry, task_store = open_repositories(backend, autoflush=False)
+    api = TaskApiServer(user_registry, task_store)
+    server = await asyncio.start_server(api.handle_connection, host, port)
+    print(f"Serving the task API on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        api.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the task store over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--backend", choices=["csv", "sqlite"], help="storage backend (default: TASK_MANAGER_BACKEND)")
+    parser.add_argument("--instrument", action="store_true", help="time every store operation (or TASK_MANAGER_INSTRUMENT=1)")
+    parser.add_argument("--profile", metavar="PATH", help="write a cProfile profile and tracemalloc summary to PATH")
+    args = parser.parse_args(argv)
+    with instrumentation.session(args.instrument, args.profile):
+        try:
+            asyncio.run(serve(args.host, args.port, args.backend))
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,157 @@
+import argparse
+import os
+from repository import TaskRepository, open_repositories
+from task_schema import STATUS_DTYPE, TASK_COLUMNS, TYPED_COLUMNS, empty_tasks, format_tasks
+from task_store import TaskStore
+
+FORMATS = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+
+# Rows per record batch in Arrow files and per upsert in SQLite
+CHUNK_SIZE = 50000
+
+
+def require_pyarrow():
+    # pyarrow is optional; only Parquet/Arrow import and export need it
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet and Arrow support needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def file_format(path, fmt=None):
+    fmt = fmt or FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt not in ("parquet", "arrow"):
+        raise ValueError(f"Cannot tell the format of {path}; pass parquet or arrow")
+    return fmt
+
+
+def to_table(df):
+    # Dates stay timestamps and email/status stay dictionary encoded, so
+    # nothing has to be parsed when the file is read back
+    pa = require_pyarrow()
+    return pa.Table.from_pandas(df[TYPED_COLUMNS], preserve_index=False)
+
+
+def from_table(table):
+    if table.num_rows == 0:
+        return empty_tasks()
+    df = table.to_pandas()
+    return df.astype({"user_email": "category", "task_name": object, "task_start": "datetime64[ns]",
+                      "task_end": "datetime64[ns]", "task_status": STATUS_DTYPE})
+
+
+def write_tasks(df, path, fmt=None):
+    pa = require_pyarrow()
+    table = to_table(df)
+    if file_format(path, fmt) == "parquet":
+        pa.parquet.write_table(table, path)
+    else:
+        # Written uncompressed so the file can be memory-mapped and read in place
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=CHUNK_SIZE)
+
+
+def read_tasks(path, fmt=None):
+    pa = require_pyarrow()
+    if file_format(path, fmt) == "parquet":
+        return from_table(pa.parquet.read_table(path))
+    with pa.memory_map(path, "r") as source:
+        return from_table(pa.ipc.open_file(source).read_all())
+
+
+def import_tasks(df, backend=None, data_dir="."):
+    # Merges the tasks into the configured backend; a task that already
+    # exists (same user and name) is replaced
+    backend = backend or os.environ.get("TASK_MANAGER_BACKEND", "csv")
+    if backend == "csv":
+        task_store = TaskStore(os.path.join(data_dir, "task_manager.csv"))
+        task_store.import_tasks(df)
+        task_store.close()
+    elif backend == "sqlite":
+        from sqlite_repository import UPSERT_TASK, SqliteDatabase, to_text
+        database = SqliteDatabase(os.path.join(data_dir, "task_manager.db"))
+        with database.lock, database.conn:
+            for start in range(0, len(df), CHUNK_SIZE):
+                chunk = format_tasks(df.iloc[start:start + CHUNK_SIZE])
+                database.conn.executemany(
+                    UPSERT_TASK,
+                    ([to_text(value) for value in row] for row in chunk[TASK_COLUMNS].itertuples(index=False, name=None)))
+        database.close()
+    else:
+        raise ValueError(f"Cannot import into the {backend} backend")
+
+
+class ArrowTaskStore(TaskRepository):
+    # Read-only task store over an Arrow IPC file for reporting jobs. The file
+    # is memory-mapped and its columns are used in place, so opening it does
+    # not read or parse millions of rows up front
+    def __init__(self, path="./task_manager.arrow"):
+        super().__init__()
+        pa = require_pyarrow()
+        self.path = path
+        self._source = pa.memory_map(path, "r")
+        self.table = pa.ipc.open_file(self._source).read_all()
+
+    def _filter(self, user_email, task_name=None):
+        pc = require_pyarrow().compute
+        mask = pc.equal(self.table['user_email'], user_email)
+        if task_name is not None:
+            mask = pc.and_(mask, pc.equal(self.table['task_name'], task_name))
+        return self.table.filter(mask)
+
+    def has_task(self, user_email, task_name):
+        return self._filter(user_email, task_name).num_rows > 0
+
+    def get_task(self, user_email, task_name):
+        rows = from_table(self._filter(user_email, task_name))
+        if len(rows) == 0:
+            return None
+        return rows.iloc[0].to_dict()
+
+    def task_names(self, user_email):
+        return self._filter(user_email)['task_name'].to_pylist()
+
+    def user_tasks(self, user_email):
+        return from_table(self._filter(user_email))
+
+    def all_tasks(self):
+        return from_table(self.table)
+
+    def _read_only(self, *args, **kwargs):
+        raise ValueError(f"{self.path} is opened read-only")
+
+    add_task = delete_task = modify_task = refresh_statuses = _read_only
+
+    def close(self):
+        self.table = None
+        self._source.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copy tasks between the task store and Parquet or Arrow files")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("path", help="a .parquet or .arrow file")
+    parser.add_argument("--format", choices=["parquet", "arrow"], help="file format (default: from the extension)")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], help="storage backend (default: TASK_MANAGER_BACKEND)")
+    args = parser.parse_args(argv)
+
+    if args.action == "import":
+        df_tasks = read_tasks(args.path, args.format)
+        import_tasks(df_tasks, args.backend)
+        print(f"Imported {len(df_tasks)} tasks")
+    else:
+        user_registry, task_store = open_repositories(args.backend)
+        df_tasks = task_store.all_tasks()
+        write_tasks(df_tasks, args.path, args.format)
+        task_store.close()
+        user_registry.close()
+        print(f"Exported {len(df_tasks)} tasks")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+# Zero-length tasks are stretched to this, so they still occupy their instant
+MIN_DURATION = np.int64(1)
+
+
+def to_ns(instant):
+    return pd.Timestamp(instant).value
+
+
+class UserIntervals:
+    # Sorted-array interval index over one user's tasks. Tasks are sorted by
+    # start; running_end[i] is the latest end among the first i+1 tasks, so
+    # it never decreases. For a query [lo, hi) everything from the first task
+    # whose running_end passes lo up to the last task starting before hi is a
+    # candidate, found with two binary searches, and the candidates' own ends
+    # are checked in one vectorized comparison. Tasks without a start or an
+    # end cannot be placed and are left out
+    def __init__(self, user_tasks):
+        user_tasks = user_tasks[user_tasks['task_start'].notna() & user_tasks['task_end'].notna()]
+        order = np.argsort(user_tasks['task_start'].to_numpy(), kind="stable")
+        self.tasks = user_tasks.iloc[order].reset_index(drop=True)
+        # Frames parsed from CSV may hold microsecond datetimes; compare in ns
+        self.starts = self.tasks['task_start'].to_numpy().astype("datetime64[ns]").astype(np.int64)
+        self.ends = np.maximum(self.tasks['task_end'].to_numpy().astype("datetime64[ns]").astype(np.int64),
+                               self.starts + MIN_DURATION)
+        self.running_end = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+    def overlapping_positions(self, lo, hi):
+        first = np.searchsorted(self.running_end, lo, side="right")
+        last = np.searchsorted(self.starts, hi, side="left")
+        if first >= last:
+            return np.empty(0, dtype=np.intp)
+        positions = np.arange(first, last)
+        return positions[self.ends[first:last] > lo]
+
+    def overlapping(self, start, end):
+        # Tasks that are running at some point in [start, end), by start time
+        return self.tasks.iloc[self.overlapping_positions(to_ns(start), to_ns(end))]
+
+
+class TaskIntervalIndex:
+    # Per-user interval indexes over task start/end. A user's index is built
+    # on their first query and dropped from the change feed whenever one of
+    # their tasks changes, so it is rebuilt (one sort) only after an edit
+    def __init__(self, task_store):
+        self.task_store = task_store
+        self.users = {}
+        task_store.subscribe(self.on_task_change)
+
+    def user_index(self, user_email):
+        index = self.users.get(user_email)
+        if index is None:
+            index = self.users[user_email] = UserIntervals(self.task_store.user_tasks(user_email))
+        return index
+
+    def overlapping(self, user_email, start, end):
+        return self.user_index(user_email).overlapping(start, end)
+
+    def running_at(self, user_email, instant):
+        # Tasks that have started and not yet ended at `instant`
+        instant = to_ns(instant)
+        index = self.user_index(user_email)
+        return index.tasks.iloc[index.overlapping_positions(instant, instant + 1)]
+
+    def conflicts(self, user_email, start, end, task_name=None):
+        # Tasks that would clash with a task running from start to end; pass
+        # the task's own name to leave it out
+        df_tasks = self.overlapping(user_email, start, end)
+        if task_name is not None:
+            df_tasks = df_tasks[df_tasks['task_name'] != task_name]
+        return df_tasks
+
+    def task_conflicts(self, user_email, task_name):
+        task = self.task_store.get_task(user_email, task_name)
+        if task is None or pd.isna(task['task_start']) or pd.isna(task['task_end']):
+            return self.user_index(user_email).tasks.iloc[0:0]
+        end = max(task['task_end'], task['task_start'] + pd.Timedelta(MIN_DURATION))
+        return self.conflicts(user_email, task['task_start'], end, task_name)
+
+    def tasks_by_day(self, user_email, first_day, last_day):
+        # {date: [task names]} for every day from first_day to last_day that
+        # has a task running; a task spanning several days is listed on each
+        start = datetime.combine(first_day, datetime.min.time())
+        end = datetime.combine(last_day, datetime.min.time()) + timedelta(days=1)
+        days = {}
+        df_tasks = self.overlapping(user_email, start, end)
+        for task_name, task_start, task_end in zip(df_tasks['task_name'], df_tasks['task_start'], df_tasks['task_end']):
+            day = max(task_start, pd.Timestamp(start)).date()
+            # A task ending exactly at midnight does not occupy the next day
+            last = min(max(task_end - pd.Timedelta(MIN_DURATION), task_start), pd.Timestamp(end) - pd.Timedelta(1)).date()
+            while day <= last:
+                days.setdefault(day, []).append(task_name)
+                day += timedelta(days=1)
+        return days
+
+    def on_task_change(self, op, user_email, task_name, task):
+        if op == "reload":
+            self.users = {}
+        else:
+            self.users.pop(user_email, None)
+
+    def forget(self, user_email):
+        self.users.pop(user_email, None)
+
+    def close(self):
+        self.task_store.unsubscribe(self.on_task_change)
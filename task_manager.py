@@ -1,54 +1,55 @@
+import argparse
 import pandas as pd
 import re
-from datetime import datetime
-import smtplib
+import shlex
+import sys
+from datetime import timedelta
+import instrumentation
+from mail_transport import MailTransport
+from repository import open_repositories
+from task_renderer import iter_csv, iter_html, iter_text, render_text
+from task_intervals import TaskIntervalIndex
+from task_query import SORT_KEYS, TaskQuery
+from task_schema import TASK_STATUSES, parse_tasks, read_date, read_time
+from task_search import TaskNameIndex
+from task_views import TaskViewCache
 
-df_users = pd.read_csv("./users.csv")
-df_task_manager = pd.read_csv("./task_manager.csv")
+MODIFY_FIELDS = ["task_name", "task_start_date", "task_start_time", "task_end_date", "task_end_time", "task_status"]
 
+# Tasks per page of "View my tasks"
+VIEW_PAGE_SIZE = 20
 
-def user_login(df_users, df_task_manager):
+# Subcommands that may appear as lines of a batch
+BATCH_COMMANDS = ["add", "modify", "delete"]
+
+
+def user_login(user_registry, task_store, mail_transport):
     print("Welcome to Task manager! To get started please enter your email ID")
     user_email = input("Email ID : ").strip()
     email_regex = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,7}\b'
     while re.match(email_regex, user_email) == None:
         print("Sorry the email ID is incorrect. Please try again")
         user_email = input("Email ID : ").strip()
-    if len(df_users.index) == 0:
-        user_name = input("Enter your name :").strip()
-        user_name_stored = user_name
-        user_password = input("Enter your password : ").strip()
-        user_dict = {
-            "user_email" : user_email,
-            "user_password" : user_password,
-            "user_name" : user_name 
-        }
-        df_users = pd.concat([df_users, pd.DataFrame([user_dict])], ignore_index=True)
-        df_users.to_csv("./users.csv", index=False)
-        print("You are now a registered user")
-    elif len(df_users.index) != 0 and user_email not in list(df_users['user_email']):
+    if user_email not in user_registry:
         user_name = input("Enter your name : ").strip()
         user_name_stored = user_name
         user_password = input("Enter your password : ").strip()
-        user_dict = {
-            "user_email" : user_email,
-            "user_password" : user_password,
-            "user_name" : user_name 
-        }
-        df_users = pd.concat([df_users, pd.DataFrame([user_dict])], ignore_index=True)
-        df_users.to_csv("./users.csv", index=False)
+        user_registry.register(user_email, user_password, user_name)
         print("You are now a registered user")
     else:
-        user_password_stored = df_users.loc[df_users['user_email'] == user_email, 'user_password'].iloc[0]
-        user_name_stored = df_users.loc[df_users['user_email'] == user_email, 'user_name'].iloc[0]
         user_password = input("Enter your password to authenticate : ").strip()
-        while user_password != user_password_stored:
+        user_name_stored = user_registry.authenticate(user_email, user_password)
+        while user_name_stored is None:
             print("Sorry this is not the right password. Please try again.")
             user_password = input("Enter your password to authenticate : ").strip()
+            user_name_stored = user_registry.authenticate(user_email, user_password)
         print("Hello {0}. Welcome back to task manager".format(user_name_stored))
-    task_manager(df_users, df_task_manager, user_email, user_name_stored)
+    task_manager(user_registry, task_store, mail_transport, user_email, user_name_stored)
         
-def task_manager(df_users, df_task_manager, user_email, user_name):
+def task_manager(user_registry, task_store, mail_transport, user_email, user_name):
+    # Viewing or emailing again without changes reuses the formatted text
+    task_views = TaskViewCache(task_store)
+    task_query = TaskQuery(task_store)
     while True:
         print("""Select an option from the below list and type the number against it as an input.
         1 - Add a task
@@ -80,23 +81,24 @@ def task_manager(df_users, df_task_manager, user_email, user_name):
                 "task_end_time" : task_end_time,
                 "task_status" : task_status
             }
-            df_task_manager = pd.concat([df_task_manager, pd.DataFrame([task_dict])], ignore_index=True)
-            df_task_manager.to_csv("./task_manager.csv", index=False)
-            print("Task added successfully")
+            try:
+                task_store.add_task(task_dict)
+                print("Task added successfully")
+            except ValueError as e:
+                print(e)
         elif user_input == 2:
-            if len(df_task_manager.loc[df_task_manager['user_email'] == user_email, 'task_name']) > 0:
+            if len(task_store.task_names(user_email)) > 0:
                 print("Here is the list of your tasks. Please type the task name as input to delete it")
-                print(df_task_manager.loc[df_task_manager['user_email'] == user_email, 'task_name'])
+                print(task_store.user_tasks(user_email)['task_name'])
                 task_to_be_deleted = input("Enter the task name to be deleted from the list above : ")
-                df_task_manager = df_task_manager[df_task_manager['task_name'] != task_to_be_deleted]
-                df_task_manager.to_csv("./task_manager.csv", index=False)
+                task_store.delete_task(user_email, task_to_be_deleted)
                 print("Task deleted successfully")
             else:
                 print("You do not have any tasks to be deleted")
         elif user_input == 3:
-            if len(df_task_manager.loc[df_task_manager['user_email'] == user_email, 'task_name']) > 0:
+            if len(task_store.task_names(user_email)) > 0:
                 print("Here is the list of your tasks. Please type the task name as input to modify it")
-                print(df_task_manager.loc[df_task_manager['user_email'] == user_email, 'task_name'])
+                print(task_store.user_tasks(user_email)['task_name'])
                 task_to_be_modified = input("Enter the task name to be modified from the list above : ")
                 print("""Which of the following needs to be modified?
                 1 - Task name
@@ -109,29 +111,39 @@ def task_manager(df_users, df_task_manager, user_email, user_name):
                 user_modification_input = int(input("Select an option from the above list and type the number against it as an input : ").strip())
                 if user_modification_input == 1:
                     new_task_name = input("Enter new task name : ").strip()
-                    df_task_manager.loc[df_task_manager.task_name == task_to_be_modified, 'task_name'] = new_task_name
-                    df_task_manager.to_csv("./task_manager.csv", index=False)
-                    print("Task name modified successfully")
+                    try:
+                        task_store.modify_task(user_email, task_to_be_modified, 'task_name', new_task_name)
+                        print("Task name modified successfully")
+                    except ValueError as e:
+                        print(e)
                 elif user_modification_input == 2:
-                    new_start_date = input("Enter new task start date in YYYY-MM-DD format : ").strip()
-                    df_task_manager.loc[df_task_manager.task_name == task_to_be_modified, 'task_start_date'] = new_start_date
-                    df_task_manager.to_csv("./task_manager.csv", index=False)
-                    print("Task start date modified successfully")
+                    new_start_date = validate_date_and_time("new task start date")
+                    try:
+                        task_store.modify_task(user_email, task_to_be_modified, 'task_start_date', new_start_date)
+                        print("Task start date modified successfully")
+                    except ValueError as e:
+                        print(e)
                 elif user_modification_input == 3:
-                    new_start_time = input("Enter new task start time in HH:MM format : ").strip()
-                    df_task_manager.loc[df_task_manager.task_name == task_to_be_modified, 'task_start_time'] = new_start_time
-                    df_task_manager.to_csv("./task_manager.csv", index=False)
-                    print("Task start time modified successfully")
+                    new_start_time = validate_date_and_time("new task start time")
+                    try:
+                        task_store.modify_task(user_email, task_to_be_modified, 'task_start_time', new_start_time)
+                        print("Task start time modified successfully")
+                    except ValueError as e:
+                        print(e)
                 elif user_modification_input == 4:
-                    new_end_date = input("Enter new task end date in YYYY-MM-DD format : ").strip()
-                    df_task_manager.loc[df_task_manager.task_name == task_to_be_modified, 'task_end_date'] = new_end_date
-                    df_task_manager.to_csv("./task_manager.csv", index=False)
-                    print("Task end date modified successfully")
+                    new_end_date = validate_date_and_time("new task end date")
+                    try:
+                        task_store.modify_task(user_email, task_to_be_modified, 'task_end_date', new_end_date)
+                        print("Task end date modified successfully")
+                    except ValueError as e:
+                        print(e)
                 elif user_modification_input == 5:
-                    new_end_time = input("Enter new task end time in HH:MM format : ").strip()
-                    df_task_manager.loc[df_task_manager.task_name == task_to_be_modified, 'task_end_time'] = new_end_time
-                    df_task_manager.to_csv("./task_manager.csv", index=False)
-                    print("Task end time modified successfully")
+                    new_end_time = validate_date_and_time("new task end time")
+                    try:
+                        task_store.modify_task(user_email, task_to_be_modified, 'task_end_time', new_end_time)
+                        print("Task end time modified successfully")
+                    except ValueError as e:
+                        print(e)
                 elif user_modification_input == 6:
                     print("""What should be the new status of the task?
                     1 - Ongoing
@@ -139,12 +151,10 @@ def task_manager(df_users, df_task_manager, user_email, user_name):
                     """)
                     new_task_status = int(input("Select an option from the above list and type the number against it as an input : ").strip())
                     if new_task_status == 1:
-                        df_task_manager.loc[df_task_manager.task_name == task_to_be_modified, 'task_status'] = "Ongoing"
-                        df_task_manager.to_csv("./task_manager.csv", index=False)
+                        task_store.modify_task(user_email, task_to_be_modified, 'task_status', "Ongoing")
                         print("Task status modified successfully")
                     elif new_task_status == 2:
-                        df_task_manager.loc[df_task_manager.task_name == task_to_be_modified, 'task_status'] = "Completed"
-                        df_task_manager.to_csv("./task_manager.csv", index=False)
+                        task_store.modify_task(user_email, task_to_be_modified, 'task_status', "Completed")
                         print("Task status modified successfully")
                     else:
                         print("You have made a wrong choice. Redirecting you to the main menu")
@@ -154,65 +164,292 @@ def task_manager(df_users, df_task_manager, user_email, user_name):
                 print("You do not have any tasks to be modified")
         elif user_input == 4:
             print("Here are all your tasks : ")
-            for index in range(0, len(df_task_manager)):
-                if df_task_manager['user_email'][index] == user_email:
-                    print("------------------------------------------------------------------------------")
-                    print(f"""
-Task Name : {df_task_manager['task_name'][index]}
-Task Start Date : {str(df_task_manager['task_start_date'][index]).split(" ")[0]}
-Task Start Time : {str(df_task_manager['task_start_time'][index]).split(" ")[1]}
-Task End Date : {str(df_task_manager['task_end_date'][index]).split(" ")[0]}
-Task End Time : {str(df_task_manager['task_end_time'][index]).split(" ")[1]}
-Task Status : {df_task_manager['task_status'][index]}
-""")
+            view_task_pages(task_query, task_views, user_email)
         elif user_input == 5:
-            task_manager_email = "gmail id"
-            task_manager_password = "password"
-            s = smtplib.SMTP('smtp.gmail.com', 587)
-            s.starttls()
-            s.login(task_manager_email, task_manager_password)
-            message = f"""Subject : Task reminder\n\n
-Dear {user_name},\n
-Please find below the list of tasks created by you\n"""
-            for index in range(0, len(df_task_manager)):
-                if df_task_manager['user_email'][index] == user_email:
-                    message += "------------------------------------------------------------------------------\n"
-                    message += f"""
-Task Name : {df_task_manager['task_name'][index]}
-Task Start Date : {str(df_task_manager['task_start_date'][index]).split(" ")[0]}
-Task Start Time : {str(df_task_manager['task_start_time'][index]).split(" ")[1]}
-Task End Date : {str(df_task_manager['task_end_date'][index]).split(" ")[0]}
-Task End Time : {str(df_task_manager['task_end_time'][index]).split(" ")[1]}
-Task Status : {df_task_manager['task_status'][index]}
-\n\n"""
-            s.sendmail(task_manager_email, user_email, message)
-            
-            s.quit()
+            message = task_views.email(user_email, user_name)
+            # The SMTP session stays open for later emails in this session
+            mail_transport.send(user_email, message)
             print("Tasks successfully mailed to user")
             
         elif user_input == 6:
+            task_store.close()
+            mail_transport.close()
             print("Thank you for using task manager. Have a good day!")
-            exit()
+            return
         else:
             print("You have made a wrong choice, please try again.")
 
+def view_task_pages(task_query, task_views, user_email):
+    # Earliest start first, a page at a time
+    cursor = None
+    while True:
+        def build(cursor=cursor):
+            df_tasks, next_cursor = task_query.page(user_email, "start", cursor=cursor, limit=VIEW_PAGE_SIZE)
+            return render_text(df_tasks), next_cursor
+        text, cursor = task_views.get(user_email, ("page", cursor), build)
+        sys.stdout.write(text)
+        if cursor is None:
+            return
+        if input("Press Enter to see more tasks, or type q to go back : ").strip().lower() == "q":
+            return
+
+
 def validate_date_and_time(req):
-    date_regex = r'^(\d{4})-(0[1-9]|1[0-2]|[1-9])-([1-9]|0[1-9]|[1-2]\d|3[0-1])$'
-    time_regex = r'^([0-9]|0[0-9]|1[0-9]|2[0-3]):[0-5][0-9]$'
     if req.find("date") != -1:
         req_date = input(f"Enter the {req} in YYYY-MM-DD format : ").strip()
-        while re.match(date_regex, req_date) == None:
+        while read_date(req_date) is None:
             print("Sorry the date is not in the required format or it is not a valid date. Please provide a valid input in YYYY-MM-DD format")
             req_date = input(f"Enter the {req} in YYYY-MM-DD format : ").strip()
-        return datetime.strptime(req_date, '%Y-%m-%d')
+        return read_date(req_date)
     else:
         req_time = input(f"Enter the {req} in HH:MM format : ").strip()
-        while re.match(time_regex, req_time) == None:
+        while read_time(req_time) is None:
             print("Sorry the time is not in the required format or it is not a valid time. Please provide a valid input in HH:MM format")
             req_time = input(f"Enter the {req} in HH:MM format : ").strip()
-        return datetime.strptime(req_time, '%H:%M')
-        
+        return read_time(req_time)
+
+
+def date_arg(value):
+    parsed = read_date(value)
+    if parsed is None:
+        raise argparse.ArgumentTypeError(f"{value} is not a valid date in YYYY-MM-DD format")
+    return parsed
+
+
+def time_arg(value):
+    parsed = read_time(value)
+    if parsed is None:
+        raise argparse.ArgumentTypeError(f"{value} is not a valid time in HH:MM format")
+    return parsed
+
+
+class BatchParser(argparse.ArgumentParser):
+    # A bad line in a batch is reported and skipped instead of exiting
+    def error(self, message):
+        raise ValueError(message)
+
+
+def build_parser(parser_class=argparse.ArgumentParser):
+    parser = parser_class(description="Manage tasks without the interactive menu. Run without arguments for the menu.")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], help="storage backend (default: TASK_MANAGER_BACKEND)")
+    parser.add_argument("--instrument", action="store_true",
+                        help="time every store operation and print a report to stderr (or TASK_MANAGER_INSTRUMENT=1)")
+    parser.add_argument("--profile", metavar="PATH", help="write a cProfile profile and tracemalloc summary to PATH")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add a task")
+    add.add_argument("user_email")
+    add.add_argument("task_name")
+    add.add_argument("--start-date", type=date_arg, required=True, help="YYYY-MM-DD")
+    add.add_argument("--start-time", type=time_arg, required=True, help="HH:MM")
+    add.add_argument("--end-date", type=date_arg, required=True, help="YYYY-MM-DD")
+    add.add_argument("--end-time", type=time_arg, required=True, help="HH:MM")
+    add.add_argument("--status", choices=TASK_STATUSES, default="Upcoming")
+
+    modify = commands.add_parser("modify", help="change one field of a task")
+    modify.add_argument("user_email")
+    modify.add_argument("task_name")
+    modify.add_argument("field", choices=MODIFY_FIELDS)
+    modify.add_argument("value")
+
+    delete = commands.add_parser("delete", help="delete a task")
+    delete.add_argument("user_email")
+    delete.add_argument("task_name")
+
+    show = commands.add_parser("list", help="print tasks")
+    show.add_argument("user_email", nargs="?", help="only this user's tasks (default: everyone's)")
+    show.add_argument("--format", choices=["text", "csv", "html"], default="text")
+    show.add_argument("--from", dest="start", type=date_arg, help="only tasks running on or after this day (YYYY-MM-DD)")
+    show.add_argument("--to", dest="end", type=date_arg, help="only tasks running on or before this day (YYYY-MM-DD)")
+    show.add_argument("--conflicts", metavar="TASK_NAME", help="only tasks whose times overlap this task")
+    show.add_argument("--sort", choices=SORT_KEYS, help="order by this field (default: start when paging)")
+    show.add_argument("--desc", action="store_true", help="latest, last or highest first")
+    show.add_argument("--status", action="append", choices=TASK_STATUSES,
+                      help="only tasks with this status; may be given more than once")
+    show.add_argument("--limit", type=int, help="print one page of at most this many tasks")
+    show.add_argument("--cursor", help="continue after the page that printed this cursor")
+
+    search = commands.add_parser("search", help="print a user's tasks whose names have words starting with the query")
+    search.add_argument("user_email")
+    search.add_argument("query", nargs="+")
+    search.add_argument("--limit", type=int, help="print at most this many tasks")
+    search.add_argument("--format", choices=["text", "csv", "html"], default="text")
+
+    batch = commands.add_parser("batch", help="apply add/modify/delete lines from a file, or stdin with -")
+    batch.add_argument("file", nargs="?", default="-")
+
+    load = commands.add_parser("import", help="merge tasks from a .csv, .parquet or .arrow file")
+    load.add_argument("file")
+
+    commands.add_parser("refresh", help="update every task's status from its start and end times")
+    return parser
+
+
+def modify_value(field, value):
+    if field in ("task_start_date", "task_end_date"):
+        return date_arg(value)
+    if field in ("task_start_time", "task_end_time"):
+        return time_arg(value)
+    if field == "task_status" and value not in TASK_STATUSES:
+        raise ValueError(f"Task status must be one of {', '.join(TASK_STATUSES)}")
+    return value
+
+
+def run_command(args, task_store):
+    if args.command == "add":
+        task_store.add_task({
+            "user_email" : args.user_email,
+            "task_name" : args.task_name,
+            "task_start_date" : args.start_date,
+            "task_start_time" : args.start_time,
+            "task_end_date" : args.end_date,
+            "task_end_time" : args.end_time,
+            "task_status" : args.status
+        })
+        return
+    if not task_store.has_task(args.user_email, args.task_name):
+        raise ValueError(f"{args.user_email} has no task named '{args.task_name}'")
+    if args.command == "modify":
+        try:
+            value = modify_value(args.field, args.value)
+        except argparse.ArgumentTypeError as e:
+            raise ValueError(str(e))
+        task_store.modify_task(args.user_email, args.task_name, args.field, value)
+    else:
+        task_store.delete_task(args.user_email, args.task_name)
+
+
+def run_batch(lines, task_store):
+    # Every line goes through the same store, which is only saved once at
+    # the end, so thousands of operations cost one load and one write
+    parser = build_parser(BatchParser)
+    applied = 0
+    failures = 0
+    for number, line in enumerate(lines, 1):
+        try:
+            words = shlex.split(line, comments=True)
+            if not words:
+                continue
+            args = parser.parse_args(words)
+            if args.command not in BATCH_COMMANDS:
+                raise ValueError(f"{args.command} cannot be used in a batch")
+            run_command(args, task_store)
+            applied += 1
+        except ValueError as e:
+            failures += 1
+            print(f"line {number}: {e}", file=sys.stderr)
+    return applied, failures
+
+
+def paged(args):
+    return bool(args.sort or args.desc or args.status or args.limit or args.cursor)
+
+
+def list_tasks(args, task_store):
+    next_cursor = None
+    if args.conflicts:
+        df_tasks = TaskIntervalIndex(task_store).task_conflicts(args.user_email, args.conflicts)
+    elif paged(args):
+        end = args.end + timedelta(days=1) if args.end else None
+        # Without --limit the whole list is one page
+        limit = args.limit or max(len(task_store.task_names(args.user_email)), 1)
+        try:
+            df_tasks, next_cursor = TaskQuery(task_store).page(args.user_email, args.sort or "start", args.desc,
+                                                               args.status, args.start, end, args.cursor, limit)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+    elif args.start or args.end:
+        start = args.start or pd.Timestamp.min
+        end = args.end + timedelta(days=1) if args.end else pd.Timestamp.max
+        df_tasks = TaskIntervalIndex(task_store).overlapping(args.user_email, start, end)
+    elif args.user_email:
+        df_tasks = task_store.user_tasks(args.user_email)
+    else:
+        df_tasks = task_store.all_tasks()
+    render = {"text": iter_text, "csv": iter_csv, "html": iter_html}[args.format]
+    for text in render(df_tasks):
+        sys.stdout.write(text)
+    if next_cursor is not None:
+        # On stderr so the listing itself can be piped
+        print(f"More tasks follow; continue with --cursor {next_cursor}", file=sys.stderr)
+    return 0
+
+
+def search_tasks(args, task_store):
+    names = TaskNameIndex(task_store).search(args.user_email, " ".join(args.query), args.limit)
+    df_tasks = task_store.user_tasks(args.user_email).set_index('task_name', drop=False).loc[names]
+    render = {"text": iter_text, "csv": iter_csv, "html": iter_html}[args.format]
+    for text in render(df_tasks):
+        sys.stdout.write(text)
+    return 0 if names else 1
+
+
+def import_file(path, backend):
+    # The file is merged straight into storage, so no store is kept open
+    from task_arrow import import_tasks, read_tasks
+    if path.lower().endswith(".csv"):
+        df_tasks = parse_tasks(pd.read_csv(path, dtype=object))
+    else:
+        df_tasks = read_tasks(path)
+    import_tasks(df_tasks, backend)
+    return len(df_tasks)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        with instrumentation.session():
+            user_registry, task_store = open_repositories()
+            mail_transport = MailTransport()
+            user_login(user_registry, task_store, mail_transport)
+            user_registry.close()
+        return 0
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "list" and not args.user_email and (args.start or args.end or args.conflicts or paged(args)):
+        parser.error("--from, --to, --conflicts, --sort, --desc, --status, --limit and --cursor need a user_email")
+    if args.command == "list" and args.conflicts and paged(args):
+        parser.error("--conflicts cannot be sorted or paged")
+    if args.command == "list" and args.limit is not None and args.limit < 1:
+        parser.error("--limit must be at least 1")
+    with instrumentation.session(args.instrument, args.profile):
+        return run_subcommand(args)
+
+
+def run_subcommand(args):
+    if args.command == "import":
+        print(f"Imported {import_file(args.file, args.backend)} tasks")
+        return 0
+
+    user_registry, task_store = open_repositories(args.backend, autoflush=False)
+    try:
+        if args.command == "list":
+            return list_tasks(args, task_store)
+        elif args.command == "search":
+            return search_tasks(args, task_store)
+        elif args.command == "refresh":
+            print(f"Updated the status of {task_store.refresh_statuses()} tasks")
+        elif args.command == "batch":
+            if args.file == "-":
+                applied, failures = run_batch(sys.stdin, task_store)
+            else:
+                with open(args.file, encoding="utf-8") as f:
+                    applied, failures = run_batch(f, task_store)
+            print(f"Applied {applied} operations, {failures} failed")
+            return 1 if failures else 0
+        else:
+            try:
+                run_command(args, task_store)
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                return 1
+    finally:
+        task_store.close()
+        user_registry.close()
+    return 0
+
 
-user_login(df_users, df_task_manager)
-    
-    
\ No newline at end of file
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+import os
+import pandas as pd
+
+
+def first_field(record):
+    if record.startswith(b'"'):
+        return next(csv.reader([record.decode("utf-8")]))[0].strip()
+    return record.split(b",", 1)[0].decode("utf-8").strip()
+
+
+class TaskOffsetIndex:
+    # Byte ranges of each user's rows in task_manager.csv, saved next to the
+    # CSV and rebuilt whenever the CSV's size or mtime no longer match
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.path = os.path.splitext(csv_path)[0] + ".idx"
+        self.header = b""
+        self.users = {}
+
+    def load_or_build(self):
+        stat = os.stat(self.csv_path)
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data["size"] == stat.st_size and data["mtime_ns"] == stat.st_mtime_ns:
+                self.header = data["header"].encode("utf-8")
+                self.users = data["users"]
+                return self
+        self.build()
+        self.save()
+        return self
+
+    def build(self):
+        self.users = {}
+        with open(self.csv_path, "rb") as f:
+            self.header = f.readline()
+            offset = len(self.header)
+            record = b""
+            record_start = offset
+            for line in f:
+                if not record:
+                    record_start = offset
+                record += line
+                offset += len(line)
+                # An odd number of quotes means a quoted field spans lines
+                if record.count(b'"') % 2:
+                    continue
+                self.add_range(first_field(record), record_start, offset)
+                record = b""
+            if record:
+                self.add_range(first_field(record), record_start, offset)
+
+    def add_range(self, user_email, start, end):
+        if not user_email:
+            return
+        ranges = self.users.setdefault(user_email, [])
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+
+    def save(self):
+        stat = os.stat(self.csv_path)
+        data = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "header": self.header.decode("utf-8"),
+            "users": self.users
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def read_bytes(self, f, user_email):
+        chunks = []
+        for start, end in self.users.get(user_email, []):
+            f.seek(start)
+            chunk = f.read(end - start)
+            if not chunk.endswith(b"\n"):
+                chunk += b"\n"
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def read_user(self, user_email):
+        if user_email not in self.users:
+            return None
+        with open(self.csv_path, "rb") as f:
+            data = self.read_bytes(f, user_email)
+        return pd.read_csv(io.BytesIO(self.header + data), dtype=object)
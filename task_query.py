@@ -0,0 +1,222 @@
+import base64
+import json
+from bisect import bisect_left, bisect_right, insort
+import numpy as np
+import pandas as pd
+from task_schema import TASK_STATUSES, TYPED_COLUMNS, tasks_frame
+
+SORT_KEYS = ["start", "end", "status", "name"]
+
+# Tasks per page when no limit is given
+PAGE_SIZE = 50
+
+
+def to_us(value):
+    # Microseconds since the epoch, the unit the task columns are parsed in
+    return int(pd.Timestamp(value).as_unit("us").asm8.view("i8"))
+
+
+def task_times(task):
+    # (start, end) in microseconds, None where the task has no time
+    return tuple(None if pd.isna(task[field]) else to_us(task[field]) for field in ("task_start", "task_end"))
+
+
+def column_times(values):
+    # The same for a whole datetime column at once
+    values = values.to_numpy().astype("datetime64[us]")
+    return [None if missing else value for missing, value in zip(np.isnat(values).tolist(),
+                                                                  values.astype(np.int64).tolist())]
+
+
+def time_key(value):
+    # Tasks without the time sort after every task with one
+    if value is None:
+        return (1, 0)
+    return (0, value)
+
+
+def sort_key(sort, task, times):
+    # Every key ends with the task name, which is unique per user, so keys
+    # never tie and a key pins down one position in its order
+    name = str(task['task_name'])
+    tie = (name.lower(), name)
+    if sort == "name":
+        return tie
+    if sort == "start":
+        return time_key(times[0]) + tie
+    if sort == "end":
+        return time_key(times[1]) + tie
+    if sort == "status":
+        status = task['task_status']
+        rank = TASK_STATUSES.index(status) if status in TASK_STATUSES else len(TASK_STATUSES)
+        return (rank,) + time_key(times[0]) + tie
+    raise ValueError(f"Cannot sort by {sort}; use one of {', '.join(SORT_KEYS)}")
+
+
+def encode_cursor(sort, descending, key):
+    # The last key of a page. Resuming after it stays correct however the
+    # tasks change in between
+    data = json.dumps([sort, descending, list(key)]).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, sort, descending):
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, cursor_descending, key = json.loads(data)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or cursor_descending != descending:
+        raise ValueError("The cursor belongs to a listing with a different sort order")
+    return tuple(key)
+
+
+class UserTaskOrders:
+    # One user's tasks by name, plus a sorted list of keys per sort order. An
+    # order is built on first use and then kept sorted with bisect as tasks
+    # change, so a page is a binary search and a walk of about one page.
+    # Start and end are kept in microseconds as well, converted a column at
+    # a time, since converting timestamps one by one dominates building
+    def __init__(self, user_tasks):
+        # Microsecond datetimes list as plain datetimes (None for NaT), much
+        # faster than boxing each value as a Timestamp
+        columns = [user_tasks[column].to_numpy().astype("datetime64[us]").tolist()
+                   if column in ("task_start", "task_end") else user_tasks[column].tolist()
+                   for column in TYPED_COLUMNS]
+        self.tasks = {}
+        for values in zip(*columns):
+            task = dict(zip(TYPED_COLUMNS, values))
+            self.tasks[task['task_name']] = task
+        self.times = dict(zip(columns[TYPED_COLUMNS.index("task_name")],
+                              zip(column_times(user_tasks['task_start']), column_times(user_tasks['task_end']))))
+        self.orders = {}
+
+    def order(self, sort):
+        keys = self.orders.get(sort)
+        if keys is None:
+            keys = self.orders[sort] = sorted(sort_key(sort, task, self.times[task_name])
+                                              for task_name, task in self.tasks.items())
+        return keys
+
+    def add(self, task):
+        self.tasks[task['task_name']] = task
+        times = self.times[task['task_name']] = task_times(task)
+        for sort, keys in self.orders.items():
+            insort(keys, sort_key(sort, task, times))
+
+    def remove(self, task_name):
+        task = self.tasks.pop(task_name, None)
+        if task is None:
+            return
+        times = self.times.pop(task_name)
+        for sort, keys in self.orders.items():
+            del keys[bisect_left(keys, sort_key(sort, task, times))]
+
+    def matches(self, task_name, statuses, lo, hi):
+        if statuses is not None and self.tasks[task_name]['task_status'] not in statuses:
+            return False
+        if lo is None and hi is None:
+            return True
+        # Same rules as the interval index: unplaced tasks never match and
+        # zero-length tasks occupy their instant
+        start, end = self.times[task_name]
+        if start is None or end is None:
+            return False
+        return (hi is None or start < hi) and (lo is None or max(end, start + 1) > lo)
+
+    def bounds(self, sort, keys, statuses, hi):
+        # The slice of the order that can hold matches at all
+        if sort == "start" and hi is not None:
+            return 0, bisect_left(keys, (0, hi))
+        if sort == "status" and statuses is not None and len(statuses) == 1:
+            status = next(iter(statuses))
+            rank = TASK_STATUSES.index(status) if status in TASK_STATUSES else len(TASK_STATUSES)
+            return bisect_left(keys, (rank,)), bisect_left(keys, (rank + 1,))
+        return 0, len(keys)
+
+    def page(self, sort, descending, statuses, lo, hi, after, limit):
+        # Keys of up to limit + 1 matching tasks following key `after`; the
+        # extra one tells the caller whether there is another page
+        keys = self.order(sort)
+        first, last = self.bounds(sort, keys, statuses, hi)
+        if descending:
+            end = min(last, bisect_left(keys, after)) if after is not None else last
+            positions = range(end - 1, first - 1, -1)
+        else:
+            start = max(first, bisect_right(keys, after)) if after is not None else first
+            positions = range(start, last)
+        found = []
+        for position in positions:
+            key = keys[position]
+            if self.matches(key[-1], statuses, lo, hi):
+                found.append(key)
+                if len(found) > limit:
+                    break
+        return found
+
+
+class TaskQuery:
+    # Sorted, filtered and paged task listings. A user's orders are built on
+    # their first query and kept up to date from the task store's change
+    # feed, so later pages and later queries never sort the user's tasks
+    def __init__(self, task_store):
+        self.task_store = task_store
+        self.users = {}
+        task_store.subscribe(self.on_task_change)
+
+    def user_orders(self, user_email):
+        orders = self.users.get(user_email)
+        if orders is None:
+            orders = self.users[user_email] = UserTaskOrders(self.task_store.user_tasks(user_email))
+        return orders
+
+    def page(self, user_email, sort="start", descending=False, statuses=None, start=None, end=None,
+             cursor=None, limit=PAGE_SIZE):
+        # One page of the user's tasks as a typed frame, and the cursor of the
+        # next page (None on the last one). statuses keeps only those
+        # statuses; start/end keep tasks running at some point in [start, end)
+        keys, next_cursor = self.page_keys(user_email, sort, descending, statuses, start, end, cursor, limit)
+        return self.tasks(user_email, keys), next_cursor
+
+    def page_keys(self, user_email, sort="start", descending=False, statuses=None, start=None, end=None,
+                  cursor=None, limit=PAGE_SIZE):
+        # The same page as the sort keys of its tasks, for callers that
+        # place later changes on the page themselves
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Cannot sort by {sort}; use one of {', '.join(SORT_KEYS)}")
+        if limit < 1:
+            raise ValueError("The page size must be at least 1")
+        after = decode_cursor(cursor, sort, descending) if cursor else None
+        statuses = set(statuses) if statuses else None
+        lo = to_us(start) if start is not None else None
+        hi = to_us(end) if end is not None else None
+        keys = self.user_orders(user_email).page(sort, descending, statuses, lo, hi, after, limit)
+        next_cursor = encode_cursor(sort, descending, keys[limit - 1]) if len(keys) > limit else None
+        return keys[:limit], next_cursor
+
+    def tasks(self, user_email, keys):
+        # Typed frame of the tasks with these sort keys, in the same order
+        orders = self.user_orders(user_email)
+        return tasks_frame([orders.tasks[key[-1]] for key in keys])
+
+    def key(self, sort, task):
+        # Where a typed task, e.g. from the change feed, falls in an order
+        return sort_key(sort, task, task_times(task))
+
+    def on_task_change(self, op, user_email, task_name, task):
+        if op == "reload":
+            # Rebuilt on the next query
+            self.users = {}
+            return
+        orders = self.users.get(user_email)
+        if orders is None:
+            return
+        orders.remove(task_name)
+        if op != "delete":
+            orders.add(task)
+
+    def forget(self, user_email):
+        self.users.pop(user_email, None)
+
+    def close(self):
+        self.task_store.unsubscribe(self.on_task_change)
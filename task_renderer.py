@@ -0,0 +1,121 @@
+import html
+from string import Formatter
+import pandas as pd
+from task_schema import format_date, format_tasks, format_time
+
+SEPARATOR = "------------------------------------------------------------------------------\n"
+
+# Chunk size used when streaming very large task lists
+CHUNK_SIZE = 5000
+
+
+def compile_template(template):
+    # Splits a str.format style template once into literals and field names.
+    # The returned function fills it for a whole frame of string columns at
+    # once, so no Python-level loop or += runs per task
+    parts = list(Formatter().parse(template))
+
+    def render(fields):
+        result = pd.Series("", index=fields.index, dtype=object)
+        for literal, field, _, _ in parts:
+            if literal:
+                result = result + literal
+            if field is not None:
+                result = result + fields[field]
+        return result
+    return render
+
+
+TASK_TEXT = compile_template(SEPARATOR + """
+Task Name : {task_name}
+Task Start Date : {start_date}
+Task Start Time : {start_time}
+Task End Date : {end_date}
+Task End Time : {end_time}
+Task Status : {task_status}
+""")
+
+TASK_HTML = compile_template("<tr><td>{task_name}</td><td>{start_date} {start_time}</td>"
+                             "<td>{end_date} {end_time}</td><td>{task_status}</td></tr>\n")
+
+HTML_HEADER = ("<table>\n<tr><th>Task Name</th><th>Start</th><th>End</th><th>Status</th></tr>\n")
+HTML_FOOTER = "</table>\n"
+
+
+def task_fields(df):
+    # All display strings for a frame of typed tasks, formatted column-wise
+    return pd.DataFrame({
+        "task_name": df['task_name'].astype(object).fillna("").astype(str),
+        "start_date": df['task_start'].dt.strftime("%Y-%m-%d").fillna(""),
+        "start_time": df['task_start'].dt.strftime("%H:%M").fillna(""),
+        "end_date": df['task_end'].dt.strftime("%Y-%m-%d").fillna(""),
+        "end_time": df['task_end'].dt.strftime("%H:%M").fillna(""),
+        "task_status": df['task_status'].astype(object).fillna("").astype(str)
+    }, index=df.index)
+
+
+def task_rows(df):
+    # (name, start, end, status) display tuples for the GUI task list
+    fields = task_fields(df)
+    start = (fields['start_date'] + " " + fields['start_time']).str.strip()
+    end = (fields['end_date'] + " " + fields['end_time']).str.strip()
+    return list(zip(fields['task_name'], start, end, fields['task_status']))
+
+
+def task_row(task):
+    # Same tuple for a single task dict from the change feed
+    return (task['task_name'],
+            f"{format_date(task['task_start'])} {format_time(task['task_start'])}".strip(),
+            f"{format_date(task['task_end'])} {format_time(task['task_end'])}".strip(),
+            str(task['task_status']))
+
+
+def iter_chunks(df, chunk_size=CHUNK_SIZE):
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+def iter_text(df, trailer="\n", chunk_size=CHUNK_SIZE):
+    # Yields the plain text task blocks a chunk at a time
+    for chunk in iter_chunks(df, chunk_size):
+        yield "".join(TASK_TEXT(task_fields(chunk)) + trailer)
+
+
+def render_text(df, trailer="\n"):
+    return "".join(iter_text(df, trailer))
+
+
+def email_header(user_name):
+    return f"""Subject : Task reminder\n\n
+Dear {user_name},\n
+Please find below the list of tasks created by you\n"""
+
+
+def render_email(user_name, df):
+    return email_header(user_name) + render_text(df, trailer="\n\n")
+
+
+def iter_html(df, chunk_size=CHUNK_SIZE):
+    yield HTML_HEADER
+    for chunk in iter_chunks(df, chunk_size):
+        fields = task_fields(chunk).apply(lambda column: column.map(html.escape))
+        yield "".join(TASK_HTML(fields))
+    yield HTML_FOOTER
+
+
+def render_html(df):
+    return "".join(iter_html(df))
+
+
+def iter_csv(df, chunk_size=CHUNK_SIZE):
+    # Same layout as task_manager.csv
+    header = True
+    for chunk in iter_chunks(df, chunk_size):
+        yield format_tasks(chunk).to_csv(index=False, header=header, lineterminator="\n")
+        header = False
+    if header:
+        yield format_tasks(df).to_csv(index=False, lineterminator="\n")
+
+
+def render_csv(df):
+    return "".join(iter_csv(df))
@@ -0,0 +1,221 @@
+import argparse
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+import pandas as pd
+from mail_transport import MailTransport
+from repository import open_repositories
+from task_schema import format_time
+
+# A reminder fires this long before a task starts
+REMINDER_LEAD = timedelta(minutes=15)
+
+# Cancelled heap entries are dropped in one heapify once they outnumber live ones
+COMPACT_RATIO = 2
+
+# The background thread checks for other programs' changes this often
+REFRESH_SECONDS = 5
+
+
+class TaskScheduler:
+    # Keeps the next start/end instant of every task in a heap, so only the
+    # tasks that are due are looked at. Start moves a task Upcoming->Ongoing,
+    # end moves it to Overdue unless it was Completed; reminders are passed
+    # to on_reminder(user_email, task_name, task_start).
+    # Tasks added or edited through the store are rescheduled from its change
+    # feed. Entries are cancelled lazily: they are flagged and skipped when
+    # they reach the top of the heap, so add/cancel stay O(log n)
+    def __init__(self, task_store, user_email=None, on_reminder=None, reminder_lead=REMINDER_LEAD):
+        self.task_store = task_store
+        # When set, only this user's tasks are scheduled (the GUI session)
+        self.user_email = user_email
+        self.on_reminder = on_reminder
+        self.reminder_lead = reminder_lead
+        self._heap = []
+        self._entries = {}
+        self._cancelled = 0
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def load(self, now=None):
+        self._load_tasks(now or datetime.now())
+        self.task_store.subscribe(self.on_task_change)
+        return self
+
+    def _load_tasks(self, now):
+        if self.user_email is not None:
+            df_tasks = self.task_store.user_tasks(self.user_email)
+        else:
+            df_tasks = self.task_store.all_tasks()
+        with self._cond:
+            self._heap = []
+            self._entries = {}
+            self._cancelled = 0
+            for user_email, task_name, task_start, task_end, task_status in zip(
+                    df_tasks['user_email'], df_tasks['task_name'], df_tasks['task_start'],
+                    df_tasks['task_end'], df_tasks['task_status']):
+                self._schedule(user_email, task_name, task_start, task_end, task_status, now)
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def _push(self, instant, kind, key, heapify=False):
+        entry = [instant, next(self._counter), kind, key, True]
+        self._entries.setdefault(key, []).append(entry)
+        if heapify:
+            self._heap.append(entry)
+        else:
+            heapq.heappush(self._heap, entry)
+
+    def _schedule(self, user_email, task_name, task_start, task_end, task_status, now, heapify=True):
+        key = (user_email, task_name)
+        if task_status == "Upcoming" and pd.notna(task_start):
+            if task_start - self.reminder_lead > now:
+                self._push(task_start - self.reminder_lead, "reminder", key, heapify)
+            self._push(task_start, "start", key, heapify)
+        if task_status in ("Upcoming", "Ongoing") and pd.notna(task_end):
+            self._push(task_end, "end", key, heapify)
+
+    def _cancel(self, key):
+        for entry in self._entries.pop(key, []):
+            entry[-1] = False
+            self._cancelled += 1
+        if self._cancelled * COMPACT_RATIO > len(self._heap):
+            self._heap = [entry for entry in self._heap if entry[-1]]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def on_task_change(self, op, user_email, task_name, task):
+        if op == "reload":
+            # The store was rebuilt from disk; start over from its tasks
+            self._load_tasks(datetime.now())
+            return
+        if self.user_email is not None and user_email != self.user_email:
+            return
+        with self._cond:
+            self._cancel((user_email, task_name))
+            if task is not None:
+                self._cancel((user_email, task['task_name']))
+                self._schedule(user_email, task['task_name'], task['task_start'], task['task_end'],
+                               task['task_status'], datetime.now(), heapify=False)
+            self._cond.notify()
+
+    def next_instant(self):
+        with self._cond:
+            while self._heap and not self._heap[0][-1]:
+                heapq.heappop(self._heap)
+                self._cancelled -= 1
+            return self._heap[0][0] if self._heap else None
+
+    def _pop_due(self, now):
+        due = []
+        with self._cond:
+            while self._heap and (not self._heap[0][-1] or self._heap[0][0] <= now):
+                entry = heapq.heappop(self._heap)
+                if not entry[-1]:
+                    self._cancelled -= 1
+                    continue
+                entries = self._entries.get(entry[3])
+                entries.remove(entry)
+                if not entries:
+                    del self._entries[entry[3]]
+                due.append(entry)
+        return due
+
+    def run_pending(self, now=None):
+        # Applies every event due by `now`. The store is written outside the
+        # heap lock because its change feed calls back into on_task_change
+        now = now or datetime.now()
+        fired = []
+        for instant, _, kind, (user_email, task_name), _ in self._pop_due(now):
+            task = self.task_store.get_task(user_email, task_name)
+            if task is None:
+                continue
+            if kind == "reminder":
+                if self.on_reminder is not None:
+                    self.on_reminder(user_email, task_name, task['task_start'])
+            elif kind == "start" and task['task_status'] == "Upcoming":
+                self.task_store.modify_task(user_email, task_name, 'task_status', "Ongoing")
+            elif kind == "end" and task['task_status'] in ("Upcoming", "Ongoing"):
+                self.task_store.modify_task(user_email, task_name, 'task_status', "Overdue")
+            else:
+                continue
+            fired.append((kind, user_email, task_name))
+        return fired
+
+    def seconds_until_next(self, now=None):
+        instant = self.next_instant()
+        if instant is None:
+            return None
+        return max((instant - (now or datetime.now())).total_seconds(), 0)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                seconds = self.seconds_until_next()
+                self._cond.wait(REFRESH_SECONDS if seconds is None else min(seconds, REFRESH_SECONDS))
+                if self._stopping:
+                    return
+            # Tasks edited by other programs are rescheduled from the change feed
+            self.task_store.refresh()
+            self.run_pending()
+
+    def start(self):
+        # Runs events on a background thread; the GUI calls run_pending from
+        # the Tk event loop instead
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="task-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.task_store.unsubscribe(self.on_task_change)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update task statuses and send reminders as tasks start and end")
+    parser.add_argument("--email", action="store_true", help="email reminders instead of printing them")
+    parser.add_argument("--reminder-minutes", type=int, default=15, help="minutes before a task starts to remind")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], help="storage backend (default: TASK_MANAGER_BACKEND)")
+    args = parser.parse_args(argv)
+
+    user_registry, task_store = open_repositories(args.backend)
+    mail_transport = MailTransport() if args.email else None
+
+    def remind(user_email, task_name, task_start):
+        message = f"Subject : Task reminder\n\nYour task '{task_name}' starts at {format_time(task_start)}\n"
+        if mail_transport is not None:
+            mail_transport.send(user_email, message)
+        else:
+            print(f"Reminder for {user_email}: '{task_name}' starts at {format_time(task_start)}")
+
+    # Catch up on everything that started or ended while nothing was running
+    # in one batch, so the heap only holds future events
+    task_store.refresh_statuses()
+    scheduler = TaskScheduler(task_store, on_reminder=remind,
+                              reminder_lead=timedelta(minutes=args.reminder_minutes)).load()
+    try:
+        scheduler.start()._thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
+        task_store.close()
+        user_registry.close()
+        if mail_transport is not None:
+            mail_transport.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,275 @@
+import re
+from datetime import date, datetime, time
+import numpy as np
+import pandas as pd
+
+# Columns of task_manager.csv, which keeps dates and times as separate strings
+TASK_COLUMNS = ["user_email", "task_name", "task_start_date", "task_start_time",
+                "task_end_date", "task_end_time", "task_status"]
+
+# Columns held in memory: one datetime per start/end and categorical text
+TYPED_COLUMNS = ["user_email", "task_name", "task_start", "task_end", "task_status"]
+
+TASK_STATUSES = ["Upcoming", "Ongoing", "Completed", "Overdue"]
+STATUS_DTYPE = pd.CategoricalDtype(TASK_STATUSES)
+
+TIME_REGEX = r'(\d{1,2}):(\d{2})(?::(\d{2}))?\s*$'
+
+# Dates and times typed into the CLI, GUI and API, stricter than what the CSV may hold
+INPUT_DATE_REGEX = r'^(\d{4})-(0[1-9]|1[0-2]|[1-9])-([1-9]|0[1-9]|[1-2]\d|3[0-1])$'
+INPUT_TIME_REGEX = r'^([0-9]|0[0-9]|1[0-9]|2[0-3]):[0-5][0-9]$'
+
+
+def parse_dates(values):
+    values = pd.Series(values, dtype=object)
+    dates = pd.to_datetime(values, format="ISO8601", errors="coerce")
+    # Files edited in spreadsheet tools may hold DD-MM-YYYY dates
+    retry = dates.isna() & values.notna()
+    if retry.any():
+        dates[retry] = pd.to_datetime(values[retry], format="mixed", dayfirst=True, errors="coerce")
+    return dates.dt.normalize()
+
+
+def parse_times(values):
+    # Only the trailing HH:MM[:SS] matters; the 1900-01-01 date is discarded
+    parts = pd.Series(values, dtype=object).astype("string").str.extract(TIME_REGEX).astype(float)
+    seconds = parts[0] * 3600 + parts[1] * 60 + parts[2].fillna(0)
+    return pd.to_timedelta(seconds.fillna(0), unit="s")
+
+
+def combine_columns(dates, times):
+    return (parse_dates(dates).reset_index(drop=True) +
+            parse_times(times).reset_index(drop=True))
+
+
+def empty_tasks():
+    return pd.DataFrame({
+        "user_email": pd.Series(dtype="category"),
+        "task_name": pd.Series(dtype=object),
+        "task_start": pd.Series(dtype="datetime64[ns]"),
+        "task_end": pd.Series(dtype="datetime64[ns]"),
+        "task_status": pd.Series(dtype=STATUS_DTYPE)
+    })
+
+
+def tasks_frame(tasks):
+    # Typed frame from a list of typed task dicts, e.g. from get_task. Built
+    # column by column, which for a page of tasks is several times faster
+    # than DataFrame(tasks).astype(...)
+    if not tasks:
+        return empty_tasks()
+    column = lambda name: [task[name] for task in tasks]
+    return pd.DataFrame({
+        "user_email": pd.Categorical(column("user_email")),
+        "task_name": np.array(column("task_name"), dtype=object),
+        "task_start": pd.array(column("task_start"), dtype="datetime64[us]"),
+        "task_end": pd.array(column("task_end"), dtype="datetime64[us]"),
+        "task_status": pd.Categorical(column("task_status"), dtype=STATUS_DTYPE)
+    })
+
+
+def parse_tasks(df):
+    # Convert a frame in the CSV layout to the typed in-memory layout
+    df = df[df['user_email'].notna()]
+    if len(df) == 0:
+        return empty_tasks()
+    return pd.DataFrame({
+        "user_email": pd.Categorical(df['user_email'].astype(object)),
+        "task_name": df['task_name'].astype(object).to_numpy(),
+        "task_start": combine_columns(df['task_start_date'], df['task_start_time']),
+        "task_end": combine_columns(df['task_end_date'], df['task_end_time']),
+        "task_status": pd.Categorical(df['task_status'].astype(object), dtype=STATUS_DTYPE)
+    })
+
+
+def format_tasks(df):
+    # Convert typed tasks back to the CSV layout
+    return pd.DataFrame({
+        "user_email": df['user_email'].astype(object),
+        "task_name": df['task_name'],
+        "task_start_date": df['task_start'].dt.strftime("%Y-%m-%d"),
+        "task_start_time": df['task_start'].dt.strftime("%H:%M"),
+        "task_end_date": df['task_end'].dt.strftime("%Y-%m-%d"),
+        "task_end_time": df['task_end'].dt.strftime("%H:%M"),
+        "task_status": df['task_status'].astype(object)
+    }, index=df.index)
+
+
+def concat_tasks(df, new_rows):
+    # Plain pd.concat turns categoricals with different categories into
+    # object columns, so extend the email categories first
+    emails = df['user_email'].cat.categories
+    new_emails = pd.Index(new_rows['user_email'].astype(object).unique()).difference(emails)
+    if len(new_emails) > 0:
+        df = df.assign(user_email=df['user_email'].cat.add_categories(new_emails))
+    new_rows = new_rows.astype({"user_email": df['user_email'].dtype, "task_status": STATUS_DTYPE})
+    return pd.concat([df, new_rows])
+
+
+def due_statuses(df, now):
+    # The status every task should have at `now`, computed for the whole frame
+    # at once on the category codes. Completed is only ever set by the user,
+    # and tasks without a start time keep whatever status they have
+    codes = df['task_status'].cat.codes.to_numpy()
+    start = df['task_start'].to_numpy()
+    end = df['task_end'].to_numpy()
+    now = np.datetime64(pd.Timestamp(now), "ns")
+    keep = (codes == TASK_STATUSES.index("Completed")) | np.isnat(start)
+    new_codes = np.select(
+        [keep, now < start, ~np.isnat(end) & (end <= now)],
+        [codes, TASK_STATUSES.index("Upcoming"), TASK_STATUSES.index("Overdue")],
+        default=TASK_STATUSES.index("Ongoing")).astype(codes.dtype)
+    return pd.Categorical.from_codes(new_codes, dtype=STATUS_DTYPE)
+
+
+def is_blank(value):
+    # A missing date or time: None, NaT or an empty field
+    return value is None or value is pd.NaT or (isinstance(value, str) and not value.strip())
+
+
+def to_date(value):
+    if is_blank(value):
+        raise ValueError("A date is required")
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        # A single ISO date is parsed directly; anything else goes through
+        # the same rules as a whole column
+        try:
+            return date.fromisoformat(value.strip())
+        except ValueError:
+            pass
+    parsed = parse_dates([value]).iloc[0]
+    if pd.isna(parsed):
+        raise ValueError(f"Invalid date: {value}")
+    return parsed.date()
+
+
+def to_time(value):
+    # A missing time is midnight, as when a whole column is parsed
+    if is_blank(value):
+        return time(0, 0)
+    if isinstance(value, datetime):
+        return value.time()
+    if isinstance(value, time):
+        return value
+    if isinstance(value, str):
+        match = re.search(TIME_REGEX, value)
+        if match is None:
+            raise ValueError(f"Invalid time: {value}")
+        hours, minutes, seconds = (int(part or 0) for part in match.groups())
+        if hours > 23 or minutes > 59 or seconds > 59:
+            raise ValueError(f"Invalid time: {value}")
+        return time(hours, minutes, seconds)
+    seconds = parse_times([value]).iloc[0].total_seconds()
+    return time(int(seconds // 3600), int(seconds % 3600 // 60), int(seconds % 60))
+
+
+def read_date(value):
+    # The date, or None unless value is a real date in YYYY-MM-DD format
+    if re.match(INPUT_DATE_REGEX, value) is None:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        # The pattern lets through days the month does not have, e.g. 2023-02-31
+        return None
+
+
+def read_time(value):
+    if re.match(INPUT_TIME_REGEX, value) is None:
+        return None
+    try:
+        return datetime.strptime(value, '%H:%M')
+    except ValueError:
+        return None
+
+
+def combine(date_value, time_value):
+    # A task without a date has no time either
+    if is_blank(date_value):
+        return pd.NaT
+    return pd.Timestamp(datetime.combine(to_date(date_value), to_time(time_value)))
+
+
+def check_status(value):
+    if value not in TASK_STATUSES:
+        raise ValueError(f"Task status must be one of {', '.join(TASK_STATUSES)}")
+    return value
+
+
+def to_timestamp(value):
+    if value is None or (isinstance(value, str) and value in ("", "NaT")):
+        return pd.NaT
+    return pd.Timestamp(value)
+
+
+def typed_task(task_dict):
+    # Accepts either layout, e.g. a GUI form or a journal record
+    if "task_start" in task_dict:
+        task_start = to_timestamp(task_dict["task_start"])
+        task_end = to_timestamp(task_dict["task_end"])
+    else:
+        task_start = combine(task_dict["task_start_date"], task_dict["task_start_time"])
+        task_end = combine(task_dict["task_end_date"], task_dict["task_end_time"])
+    return {
+        "user_email": task_dict["user_email"],
+        "task_name": task_dict["task_name"],
+        "task_start": task_start,
+        "task_end": task_end,
+        "task_status": check_status(task_dict["task_status"])
+    }
+
+
+def stored_task(task_dict):
+    # A single task in the CSV layout with normalized date and time strings
+    task = typed_task(task_dict)
+    return {
+        "user_email": task["user_email"],
+        "task_name": task["task_name"],
+        "task_start_date": format_date(task["task_start"]),
+        "task_start_time": format_time(task["task_start"]),
+        "task_end_date": format_date(task["task_end"]),
+        "task_end_time": format_time(task["task_end"]),
+        "task_status": task["task_status"]
+    }
+
+
+def typed_changes(task, field, value):
+    # Maps an edit of one CSV field onto the typed columns of an existing task
+    if field == "task_start_date":
+        return {"task_start": combine(value, task["task_start"])}
+    if field == "task_start_time":
+        return {"task_start": combine(task["task_start"], value)}
+    if field == "task_end_date":
+        return {"task_end": combine(value, task["task_end"])}
+    if field == "task_end_time":
+        return {"task_end": combine(task["task_end"], value)}
+    if field in ("task_start", "task_end"):
+        return {field: to_timestamp(value)}
+    if field == "task_status":
+        return {field: check_status(value)}
+    if field == "task_name":
+        return {field: value}
+    raise ValueError(f"Unknown task field: {field}")
+
+
+def stored_value(field, value):
+    # Normalizes a single field for backends that keep the CSV layout
+    if field in ("task_start_date", "task_end_date"):
+        return "" if is_blank(value) else to_date(value).strftime("%Y-%m-%d")
+    if field in ("task_start_time", "task_end_time"):
+        return to_time(value).strftime("%H:%M")
+    if field == "task_status":
+        return check_status(value)
+    return value
+
+
+def format_date(value):
+    return "" if pd.isna(value) else value.strftime("%Y-%m-%d")
+
+
+def format_time(value):
+    return "" if pd.isna(value) else value.strftime("%H:%M")
@@ -0,0 +1,113 @@
+import re
+from bisect import bisect_left, insort
+
+WORD_REGEX = re.compile(r"\w+")
+
+
+def name_words(text):
+    return set(WORD_REGEX.findall(text.lower()))
+
+
+class UserNameIndex:
+    # Inverted index over one user's task names: word -> names containing it,
+    # plus the words in sorted order so every word starting with a prefix is
+    # one contiguous slice found by bisect
+    def __init__(self, task_names=()):
+        self.names = set()
+        self.postings = {}
+        for task_name in task_names:
+            self.names.add(task_name)
+            for word in name_words(task_name):
+                self.postings.setdefault(word, set()).add(task_name)
+        self.words = sorted(self.postings)
+
+    def add(self, task_name):
+        if task_name in self.names:
+            return
+        self.names.add(task_name)
+        for word in name_words(task_name):
+            names = self.postings.get(word)
+            if names is None:
+                names = self.postings[word] = set()
+                insort(self.words, word)
+            names.add(task_name)
+
+    def remove(self, task_name):
+        if task_name not in self.names:
+            return
+        self.names.discard(task_name)
+        for word in name_words(task_name):
+            names = self.postings[word]
+            names.discard(task_name)
+            if not names:
+                del self.postings[word]
+                del self.words[bisect_left(self.words, word)]
+
+    def prefix_matches(self, prefix):
+        start = bisect_left(self.words, prefix)
+        # \uffff sorts after every character that can follow the prefix
+        end = bisect_left(self.words, prefix + "\uffff", start)
+        if end - start == 1:
+            return self.postings[self.words[start]]
+        matches = set()
+        for word in self.words[start:end]:
+            matches |= self.postings[word]
+        return matches
+
+    def search(self, query):
+        # Names where every query word starts some word of the name, so
+        # "rep q" finds "Quarterly report". Rarest query word first keeps the
+        # intersections small
+        prefixes = sorted(name_words(query))
+        if not prefixes:
+            return set(self.names)
+        candidates = sorted((self.prefix_matches(prefix) for prefix in prefixes), key=len)
+        matches = set(candidates[0])
+        for names in candidates[1:]:
+            if not matches:
+                break
+            matches &= names
+        return matches
+
+
+class TaskNameIndex:
+    # Per-user name indexes built on a user's first search and then kept up
+    # to date from the task store's change feed, so a search never scans the
+    # user's tasks
+    def __init__(self, task_store):
+        self.task_store = task_store
+        self.users = {}
+        task_store.subscribe(self.on_task_change)
+
+    def user_index(self, user_email):
+        index = self.users.get(user_email)
+        if index is None:
+            index = self.users[user_email] = UserNameIndex(self.task_store.task_names(user_email))
+        return index
+
+    def search(self, user_email, query, limit=None):
+        # Matching names in alphabetical order
+        matches = sorted(self.user_index(user_email).search(query), key=str.lower)
+        return matches[:limit] if limit is not None else matches
+
+    def on_task_change(self, op, user_email, task_name, task):
+        if op == "reload":
+            # Rebuilt on the next search
+            self.users = {}
+            return
+        index = self.users.get(user_email)
+        if index is None:
+            return
+        if op == "delete":
+            index.remove(task_name)
+        elif op == "add":
+            index.add(task['task_name'])
+        elif task['task_name'] != task_name:
+            index.remove(task_name)
+            index.add(task['task_name'])
+
+    def forget(self, user_email):
+        self.users.pop(user_email, None)
+
+    def close(self):
+        self.task_store.unsubscribe(self.on_task_change)
@@ -0,0 +1,762 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from file_lock import FileLock, file_identity
+from repository import ConflictError, TaskRepository
+from task_offset_index import TaskOffsetIndex
+from task_schema import (TASK_COLUMNS, TYPED_COLUMNS, concat_tasks, due_statuses, empty_tasks, format_tasks,
+                         parse_tasks, typed_changes, typed_task)
+
+
+# Added rows wait in a list and are merged into the frame in one concat when
+# something needs the frame, or once they outnumber its rows
+MERGE_ROWS = 1000
+
+
+def journal_path(path):
+    return os.path.splitext(path)[0] + ".journal"
+
+
+class TaskJournal:
+    # Append-only log of task mutations, one JSON record per line
+    def __init__(self, path, autoflush=True):
+        self.path = path
+        self.compacting_path = path + ".compacting"
+        self.record_count = 0
+        # Without autoflush records are buffered until flush() is called
+        self.autoflush = autoflush
+        self.pending = []
+
+    def append(self, record):
+        self.pending.append(record)
+        self.record_count += 1
+        if self.autoflush:
+            self.flush()
+
+    def extend(self, records):
+        # Many records written with one open/write
+        self.pending.extend(records)
+        self.record_count += len(records)
+        if self.autoflush:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in self.pending)
+        self.pending = []
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def read_from(self, offset):
+        # Complete records after byte `offset` of the live journal, and the
+        # offset just past the last of them
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        end = data.rfind(b"\n") + 1
+        records = [json.loads(line) for line in data[:end].decode("utf-8").splitlines() if line.strip()]
+        return records, offset + end
+
+    def read(self, path=None):
+        path = path or self.path
+        if not os.path.exists(path):
+            return []
+        records = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A torn last line from a crash mid-write is ignored
+                    break
+        return records
+
+    def rotate(self):
+        # Move the live journal aside so new appends start a fresh file
+        if not os.path.exists(self.path):
+            return os.path.exists(self.compacting_path)
+        if os.path.exists(self.compacting_path):
+            # An earlier compaction never finished, keep its records on disk
+            with open(self.path, encoding="utf-8") as src, open(self.compacting_path, "a", encoding="utf-8") as dst:
+                dst.write(src.read())
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.compacting_path)
+        self.record_count = 0
+        return True
+
+
+def record_user(record):
+    if record["op"] == "add":
+        return record["task"]["user_email"]
+    return record["user_email"]
+
+
+def record_keys(record):
+    # The (user_email, task_name) pairs a record touches
+    user_email = record_user(record)
+    if record["op"] == "add":
+        return {(user_email, record["task"]["task_name"])}
+    if record["op"] == "update":
+        return {(user_email, record["task_name"]),
+                (user_email, record["changes"].get("task_name", record["task_name"]))}
+    if record["op"] == "statuses":
+        return {(user_email, task_name) for task_name in record["statuses"]}
+    return {(user_email, record["task_name"])}
+
+
+def same_task(task, other):
+    # Typed rows compared by value, with missing dates equal to each other
+    if task is None or other is None:
+        return task is other
+    return all(task[field] == other[field] or (pd.isna(task[field]) and pd.isna(other[field]))
+               for field in TYPED_COLUMNS)
+
+
+class TaskStore(TaskRepository):
+    def __init__(self, path="./task_manager.csv", compact_threshold=1000, lazy=False, autoflush=True):
+        super().__init__()
+        self.path = path
+        self.compact_threshold = compact_threshold
+        self.journal = TaskJournal(journal_path(path), autoflush=autoflush)
+        self._lock = threading.RLock()
+        self._compactor = None
+        self._frame = None
+        # Typed rows added since the last merge, at positions len(_frame) on
+        self._new_rows = []
+        # user_email -> {task_name: row position}, maintained on every mutation
+        self._user_index = {}
+        # Positions of deleted rows, purged from the frame in bulk
+        self._deleted = set()
+        # In lazy mode only users in _loaded_users have their rows in memory;
+        # journal records are kept per user until the next compaction
+        self.lazy = lazy
+        self._loaded_users = set()
+        self._journal_by_user = {}
+        self._offsets = None
+        # Other processes may use the same files. Appends, compaction and
+        # catching up with their writes happen under an advisory file lock
+        self.file_lock = FileLock(path + ".lock")
+        self._compact_lock = FileLock(path + ".compact.lock", reentrant=False)
+        self._snapshot_id = None
+        self._journal_id = None
+        self._journal_offset = 0
+        # user_email -> {task_name: sequence number of the row's last change};
+        # rows untouched since the last reload have version _reload_sequence
+        self._versions = {}
+        self._sequence = 0
+        self._reload_sequence = 0
+        # Changes made by other processes, delivered to listeners by refresh()
+        self._missed = []
+        # Buffered writes only: each pending key's row as it was before the
+        # first buffered record touching it, and the pending keys another
+        # process has changed since. Records on those keys are dropped by flush()
+        self._pending_base = {}
+        self._stale_keys = set()
+        with self.file_lock:
+            self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            pd.DataFrame(columns=TASK_COLUMNS).to_csv(self.path, index=False)
+
+        self._new_rows = []
+        # Replay an interrupted compaction first, then the live journal
+        self._snapshot_id = file_identity(self.path)
+        self._journal_id = file_identity(self.journal.path)
+        live_records, self._journal_offset = self.journal.read_from(0)
+        records = self.journal.read(self.journal.compacting_path) + live_records
+        self.journal.record_count = len(live_records)
+
+        if self.lazy:
+            # Nothing is read from the CSV until a user's tasks are needed
+            self._df = empty_tasks()
+            self._rebuild_index()
+            for record in records:
+                self._journal_by_user.setdefault(record_user(record), []).append(record)
+            return
+
+        self._df = parse_tasks(pd.read_csv(self.path, dtype=object))
+        self._rebuild_index()
+        for record in records:
+            self._apply(record)
+
+    def _reload(self):
+        # Another process compacted, so rebuild from the files. Records this
+        # store has not flushed yet are applied again on top, and every row's
+        # version moves past any version handed out before
+        loaded_users = set(self._loaded_users)
+        self._journal_by_user = {}
+        self._loaded_users = set()
+        self._offsets = None
+        self._versions = {}
+        self._load()
+        for user_email in loaded_users:
+            self._ensure_user(user_email)
+        # The new snapshot may have folded in other processes' changes to
+        # tasks with buffered writes; the reloaded rows show which
+        for key, task in self._pending_base.items():
+            if not same_task(self.get_task(*key), task):
+                self._stale_keys.add(key)
+        for record in self.journal.pending:
+            self._replay(record)
+        self._sequence += 1
+        self._reload_sequence = self._sequence
+        self._missed.append(("reload", None, None, None))
+
+    def _replay(self, record):
+        user_email = record_user(record)
+        if self.lazy:
+            self._journal_by_user.setdefault(user_email, []).append(record)
+            if user_email not in self._loaded_users:
+                return False
+        self._apply(record)
+        return True
+
+    def _catch_up(self):
+        # Applies what other processes appended to the journal since this
+        # store last read it. Returns the keys they touched, or None when a
+        # replaced snapshot or rotated journal forced a full reload
+        snapshot_id = file_identity(self.path)
+        journal_id = file_identity(self.journal.path)
+        with self._lock:
+            if snapshot_id != self._snapshot_id:
+                self._reload()
+                return None
+            if journal_id is None:
+                if self._journal_offset > 0:
+                    self._reload()
+                    return None
+                return set()
+            if self._journal_offset > 0 and (journal_id[0] != self._journal_id[0] or journal_id[1] < self._journal_offset):
+                self._reload()
+                return None
+            self._journal_id = journal_id
+            if journal_id[1] == self._journal_offset:
+                return set()
+            records, self._journal_offset = self.journal.read_from(self._journal_offset)
+            keys = set()
+            for record in records:
+                self.journal.record_count += 1
+                keys |= record_keys(record)
+                if self._replay(record):
+                    self._missed.extend(self._changes(record))
+            self._stale_keys |= keys & self._pending_base.keys()
+            return keys
+
+    def _track_journal(self):
+        # Called under file_lock right after our own append, when the journal
+        # ends with our records
+        self._journal_id = file_identity(self.journal.path)
+        if self._journal_id is not None:
+            self._journal_offset = self._journal_id[1]
+
+    def refresh(self):
+        # Picks up writes made by other processes and tells listeners about
+        # them. Cheap when nothing changed: two stat calls
+        with self.file_lock:
+            self._catch_up()
+        missed, self._missed = self._missed, []
+        for op, user_email, task_name, task in missed:
+            self.notify(op, user_email, task_name, task)
+
+    @contextmanager
+    def _writing(self):
+        # With autoflush every write is appended at once, so the file lock is
+        # held from catching up to appending. Buffered writes take it in flush()
+        if self.journal.autoflush:
+            with self.file_lock:
+                self.refresh()
+                yield
+        else:
+            self.refresh()
+            yield
+
+    def _bump(self, user_email, task_name):
+        self._sequence += 1
+        self._versions.setdefault(user_email, {})[task_name] = self._sequence
+
+    def task_version(self, user_email, task_name):
+        self._ensure_user(user_email)
+        with self._lock:
+            if not self.has_task(user_email, task_name):
+                return None
+            return max(self._versions.get(user_email, {}).get(task_name, 0), self._reload_sequence)
+
+    def _check_version(self, user_email, task_name, version):
+        if version is not None and self.task_version(user_email, task_name) != version:
+            raise ConflictError(f"'{task_name}' was changed by someone else; reload it and try again")
+
+    def _ensure_user(self, user_email):
+        if not self.lazy or user_email in self._loaded_users:
+            return
+        # The file lock keeps another process from replacing the snapshot
+        # while this user's byte range is read from it
+        with self.file_lock, self._lock:
+            if user_email in self._loaded_users:
+                return
+            if file_identity(self.path) != self._snapshot_id:
+                # Another process compacted, so the offsets are stale
+                self._reload()
+                if user_email in self._loaded_users:
+                    return
+            if self._offsets is None:
+                self._offsets = TaskOffsetIndex(self.path).load_or_build()
+            rows = self._offsets.read_user(user_email)
+            if rows is not None:
+                rows = parse_tasks(rows)
+            if rows is not None and len(rows) > 0:
+                start = len(self._df)
+                rows.index = range(start, start + len(rows))
+                self._df = concat_tasks(self._df, rows)
+                user_tasks = self._user_index.setdefault(user_email, {})
+                for position, task_name in enumerate(rows['task_name'], start):
+                    user_tasks[task_name] = position
+            self._loaded_users.add(user_email)
+            for record in self._journal_by_user.get(user_email, []):
+                self._apply(record)
+
+    def unload_user(self, user_email):
+        # Drop a user's rows from memory; their journal records stay, so a
+        # later load rebuilds the same state
+        if not self.lazy or user_email not in self._loaded_users:
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            self._compactor.join()
+        with self._lock:
+            self._deleted.update(self._user_index.pop(user_email, {}).values())
+            self._versions.pop(user_email, None)
+            self._loaded_users.discard(user_email)
+            if len(self._deleted) > max(self.compact_threshold, self._row_count() // 2):
+                self._purge_deleted()
+
+    @property
+    def _df(self):
+        # The whole table, with any buffered rows merged in
+        if self._new_rows:
+            self._merge_rows()
+        return self._frame
+
+    @_df.setter
+    def _df(self, df):
+        self._frame = df
+
+    def _merge_rows(self):
+        with self._lock:
+            if not self._new_rows:
+                return
+            start = len(self._frame)
+            new_rows = pd.DataFrame(self._new_rows, index=range(start, start + len(self._new_rows)))
+            self._frame = concat_tasks(self._frame, new_rows)
+            self._new_rows = []
+
+    def _row_count(self):
+        return len(self._frame) + len(self._new_rows)
+
+    def _new_row(self, position):
+        # The buffered row at `position`, or None if it is in the frame
+        if position >= len(self._frame):
+            return self._new_rows[position - len(self._frame)]
+        return None
+
+    def _task_at(self, position):
+        # The row at `position`, read without merging the buffered rows, which
+        # would copy the whole table after every add
+        new_row = self._new_row(position)
+        return new_row if new_row is not None else self._frame.loc[position]
+
+    def _rebuild_index(self):
+        self._user_index = {}
+        self._deleted = set()
+        emails = self._df['user_email'].tolist()
+        names = self._df['task_name'].tolist()
+        for position, (user_email, task_name) in enumerate(zip(emails, names)):
+            if pd.isna(user_email):
+                continue
+            self._user_index.setdefault(user_email, {})[task_name] = position
+
+    def _purge_deleted(self):
+        # Dropping rows shifts positions, so do it rarely and reindex once
+        self._df = self._df.drop(index=list(self._deleted)).reset_index(drop=True)
+        self._rebuild_index()
+
+    def _apply(self, record):
+        # Replay must be idempotent: a crash between writing the snapshot and
+        # removing the compacted journal replays records already in the snapshot
+        op = record["op"]
+        if op == "add":
+            task = typed_task(record["task"])
+            user_tasks = self._user_index.setdefault(task["user_email"], {})
+            position = user_tasks.get(task["task_name"])
+            if position is not None:
+                if self._new_row(position) is not None:
+                    self._new_row(position).update(task)
+                else:
+                    for field, value in task.items():
+                        self._frame.at[position, field] = value
+            else:
+                position = self._row_count()
+                self._new_rows.append(task)
+                user_tasks[task["task_name"]] = position
+                if len(self._new_rows) >= max(MERGE_ROWS, len(self._frame)):
+                    self._merge_rows()
+            self._bump(task["user_email"], task["task_name"])
+        elif op == "update":
+            user_tasks = self._user_index.get(record["user_email"], {})
+            position = user_tasks.get(record["task_name"])
+            if position is None:
+                return
+            new_row = self._new_row(position)
+            for field, value in record["changes"].items():
+                if new_row is not None:
+                    new_row.update(typed_changes(new_row, field, value))
+                    continue
+                for typed_field, typed_value in typed_changes(self._frame.loc[position], field, value).items():
+                    self._frame.at[position, typed_field] = typed_value
+            new_name = record["changes"].get("task_name", record["task_name"])
+            if new_name != record["task_name"]:
+                del user_tasks[record["task_name"]]
+                user_tasks[new_name] = position
+                self._versions.get(record["user_email"], {}).pop(record["task_name"], None)
+            self._bump(record["user_email"], new_name)
+        elif op == "statuses":
+            user_tasks = self._user_index.get(record["user_email"], {})
+            changes = [(user_tasks[task_name], status) for task_name, status in record["statuses"].items()
+                       if task_name in user_tasks]
+            frame_changes = []
+            for position, status in changes:
+                new_row = self._new_row(position)
+                if new_row is not None:
+                    new_row["task_status"] = status
+                else:
+                    frame_changes.append((position, status))
+            if frame_changes:
+                positions, statuses = zip(*frame_changes)
+                self._frame.loc[list(positions), "task_status"] = list(statuses)
+            for task_name in record["statuses"]:
+                if task_name in user_tasks:
+                    self._bump(record["user_email"], task_name)
+        elif op == "delete":
+            user_tasks = self._user_index.get(record["user_email"], {})
+            position = user_tasks.pop(record["task_name"], None)
+            if position is None:
+                return
+            self._versions.get(record["user_email"], {}).pop(record["task_name"], None)
+            self._deleted.add(position)
+            if len(self._deleted) > max(self.compact_threshold, self._row_count() // 2):
+                self._purge_deleted()
+        else:
+            raise ValueError(f"Unknown journal operation: {op}")
+
+    def _commit(self, record):
+        # Called inside _writing()
+        user_email = record_user(record)
+        self._ensure_user(user_email)
+        with self._lock:
+            if not self.journal.autoflush:
+                for key in record_keys(record) - self._pending_base.keys():
+                    self._pending_base[key] = self.get_task(*key)
+            self._apply(record)
+            self.journal.append(record)
+            if self.journal.autoflush:
+                self._track_journal()
+            if self.lazy:
+                self._journal_by_user.setdefault(user_email, []).append(record)
+        if self.journal.record_count >= self.compact_threshold:
+            self.compact()
+
+        for op, user_email, task_name, task in self._changes(record):
+            self.notify(op, user_email, task_name, task)
+
+    def _changes(self, record):
+        # Listener calls describing an applied record
+        user_email = record_user(record)
+        if record["op"] == "add":
+            task_name = record["task"]["task_name"]
+            return [("add", user_email, task_name, self.get_task(user_email, task_name))]
+        if record["op"] == "update":
+            new_name = record["changes"].get("task_name", record["task_name"])
+            task = self.get_task(user_email, new_name)
+            return [("update", user_email, record["task_name"], task)] if task is not None else []
+        if record["op"] == "statuses":
+            return [("update", user_email, task_name, self.get_task(user_email, task_name))
+                    for task_name in record["statuses"] if self.has_task(user_email, task_name)]
+        return [("delete", user_email, record["task_name"], None)]
+
+    def _offset_index(self):
+        if self._offsets is None:
+            self._offsets = TaskOffsetIndex(self.path).load_or_build()
+        return self._offsets
+
+    # Readers may run on another thread than flush(), which can swap in a
+    # reloaded frame and index, so they read under _lock. _ensure_user takes
+    # the file lock first and is called before _lock to keep that order
+    def has_task(self, user_email, task_name):
+        self._ensure_user(user_email)
+        with self._lock:
+            return task_name in self._user_index.get(user_email, {})
+
+    def get_task(self, user_email, task_name):
+        self._ensure_user(user_email)
+        with self._lock:
+            position = self._user_index.get(user_email, {}).get(task_name)
+            if position is None:
+                return None
+            new_row = self._new_row(position)
+            if new_row is not None:
+                return dict(new_row)
+            return self._frame.loc[position].to_dict()
+
+    def task_names(self, user_email):
+        self._ensure_user(user_email)
+        with self._lock:
+            return list(self._user_index.get(user_email, {}))
+
+    def user_tasks(self, user_email):
+        # Cost is proportional to the user's own tasks, not the whole table
+        self._ensure_user(user_email)
+        with self._lock:
+            positions = list(self._user_index.get(user_email, {}).values())
+            buffered = [position for position in positions if position >= len(self._frame)]
+            if not buffered:
+                return self._frame.take(positions)
+            # The user's buffered rows are framed on their own and the rows put
+            # back in index order
+            new_rows = pd.DataFrame([self._new_row(position) for position in buffered], index=buffered)
+            frame_rows = self._frame.take([position for position in positions if position < len(self._frame)])
+            return concat_tasks(frame_rows, new_rows).loc[positions]
+
+    def all_tasks(self):
+        if self.lazy:
+            for user_email in list(self._offset_index().users) + list(self._journal_by_user):
+                self._ensure_user(user_email)
+        with self._lock:
+            if not self._deleted:
+                return self._df
+            return self._df.drop(index=list(self._deleted))
+
+    def add_task(self, task_dict):
+        with self._writing():
+            if self.has_task(task_dict["user_email"], task_dict["task_name"]):
+                raise ValueError(f"A task named '{task_dict['task_name']}' already exists")
+            self._commit({"op": "add", "task": typed_task(task_dict)})
+
+    def delete_task(self, user_email, task_name, version=None):
+        with self._writing():
+            if not self.has_task(user_email, task_name):
+                return
+            self._check_version(user_email, task_name, version)
+            self._commit({"op": "delete", "user_email": user_email, "task_name": task_name})
+
+    def modify_task(self, user_email, task_name, field, value, version=None):
+        with self._writing():
+            if not self.has_task(user_email, task_name):
+                return
+            self._check_version(user_email, task_name, version)
+            if field == "task_name" and value != task_name and self.has_task(user_email, value):
+                raise ValueError(f"A task named '{value}' already exists")
+            # The journal records the resulting typed values, not the raw input
+            task = self._task_at(self._user_index[user_email][task_name])
+            self._commit({"op": "update", "user_email": user_email, "task_name": task_name,
+                          "changes": typed_changes(task, field, value)})
+
+    def refresh_statuses(self, now=None):
+        # Moves every task to the status it should have at `now` in one pass
+        # over the whole table. The changes are journaled as one record per
+        # user in a single write, instead of a record and flush per task
+        now = now or datetime.now()
+        with self._writing():
+            return self._refresh_statuses(now)
+
+    def _refresh_statuses(self, now):
+        self.all_tasks()
+        with self._lock:
+            statuses = due_statuses(self._df, now)
+            changed = np.flatnonzero(statuses.codes != self._df['task_status'].cat.codes.to_numpy())
+            if self._deleted:
+                changed = changed[~np.isin(changed, list(self._deleted))]
+            if len(changed) == 0:
+                return 0
+            if not self.journal.autoflush:
+                for task in self._df.take(changed).to_dict("records"):
+                    self._pending_base.setdefault((task['user_email'], task['task_name']), task)
+            self._df['task_status'] = statuses
+            self._sequence += 1
+            emails = self._df['user_email'].to_numpy()[changed]
+            names = self._df['task_name'].to_numpy()[changed]
+            new_statuses = np.asarray(statuses)[changed]
+            records = {}
+            for user_email, task_name, status in zip(emails, names, new_statuses):
+                self._versions.setdefault(user_email, {})[task_name] = self._sequence
+                record = records.get(user_email)
+                if record is None:
+                    record = records[user_email] = {"op": "statuses", "user_email": user_email, "statuses": {}}
+                record["statuses"][task_name] = status
+            self.journal.extend(list(records.values()))
+            if self.journal.autoflush:
+                self._track_journal()
+            if self.lazy:
+                for user_email, record in records.items():
+                    self._journal_by_user.setdefault(user_email, []).append(record)
+        if self.journal.record_count >= self.compact_threshold:
+            self.compact()
+
+        if self.listeners:
+            for user_email, task_name in zip(emails, names):
+                self.notify("update", user_email, task_name, self.get_task(user_email, task_name))
+        return len(changed)
+
+    def import_tasks(self, df):
+        # Bulk merge: the typed tasks in df replace any with the same user and
+        # name, and the result is written straight to a new snapshot. Both
+        # locks are held from catching up to removing the folded journals, so
+        # no other process compacts or appends in between; they see the new
+        # snapshot and reload
+        if self._compactor is not None and self._compactor.is_alive():
+            self._compactor.join()
+        self._compact_lock.acquire()
+        try:
+            with self.file_lock:
+                self._flush_pending()
+                with self._lock:
+                    merged = concat_tasks(self.all_tasks(), df).drop_duplicates(
+                        subset=["user_email", "task_name"], keep="last")
+                    tmp_path = self.path + ".tmp"
+                    format_tasks(merged).to_csv(tmp_path, index=False)
+                    os.replace(tmp_path, self.path)
+                    for path in (self.journal.path, self.journal.compacting_path):
+                        if os.path.exists(path):
+                            os.remove(path)
+                    self._reload()
+        finally:
+            self._compact_lock.release()
+        self.refresh()
+
+    def compact(self, wait=False):
+        # Fold the journal into a fresh CSV snapshot on a background thread.
+        # Only one process compacts at a time; the others skip it
+        if self._compactor is not None and self._compactor.is_alive():
+            if not wait:
+                return
+            self._compactor.join()
+        if not self._compact_lock.acquire(blocking=False):
+            return
+        try:
+            with self.file_lock:
+                target, args = self._rotate()
+        except BaseException:
+            self._compact_lock.release()
+            raise
+        if target is None:
+            self._compact_lock.release()
+            return
+        self._compactor = threading.Thread(target=self._run_compaction, args=(target, args), daemon=True)
+        self._compactor.start()
+        if wait:
+            self._compactor.join()
+
+    def _run_compaction(self, target, args):
+        try:
+            target(*args)
+        finally:
+            self._compact_lock.release()
+
+    def _rotate(self):
+        # The snapshot must hold every record in the rotated journal, including
+        # other processes' records, so catch up and flush first
+        self._flush_pending()
+        with self._lock:
+            if not self.journal.rotate():
+                return None, None
+            self._journal_id = None
+            self._journal_offset = 0
+            if self.lazy:
+                # Only users touched by the journal are rewritten from memory,
+                # everyone else is copied byte for byte from the old snapshot
+                user_frames = {}
+                for user_email in list(self._journal_by_user):
+                    user_frames[user_email] = self.user_tasks(user_email).copy()
+                self._journal_by_user = {}
+                return self._write_grouped_snapshot, (user_frames, self._offset_index())
+            return self._write_snapshot, (self.all_tasks().copy(),)
+
+    def _write_snapshot(self, snapshot):
+        tmp_path = self.path + ".tmp"
+        format_tasks(snapshot).to_csv(tmp_path, index=False)
+        with self.file_lock, self._lock:
+            os.replace(tmp_path, self.path)
+            self._snapshot_id = file_identity(self.path)
+            os.remove(self.journal.compacting_path)
+
+    def _write_grouped_snapshot(self, user_frames, offsets):
+        # Rows are written grouped by user so each user is one byte range
+        tmp_path = self.path + ".tmp"
+        new_offsets = TaskOffsetIndex(self.path)
+        new_offsets.header = offsets.header
+        with open(self.path, "rb") as src, open(tmp_path, "wb") as dst:
+            dst.write(offsets.header)
+            for user_email in offsets.users:
+                if user_email in user_frames:
+                    continue
+                start = dst.tell()
+                dst.write(offsets.read_bytes(src, user_email))
+                new_offsets.add_range(user_email, start, dst.tell())
+            for user_email, frame in user_frames.items():
+                if len(frame) == 0:
+                    continue
+                start = dst.tell()
+                rows = format_tasks(frame)[TASK_COLUMNS].to_csv(index=False, header=False, lineterminator="\n")
+                dst.write(rows.encode("utf-8"))
+                new_offsets.add_range(user_email, start, dst.tell())
+        with self.file_lock, self._lock:
+            os.replace(tmp_path, self.path)
+            self._snapshot_id = file_identity(self.path)
+            new_offsets.save()
+            self._offsets = new_offsets
+            os.remove(self.journal.compacting_path)
+
+    def _flush_pending(self):
+        # Called under file_lock. A buffered record whose task another process
+        # changed in the meantime, whether seen in the journal or in a snapshot
+        # it compacted, is dropped, and the store reloads so memory matches
+        # what is on disk
+        with self._lock:
+            self._catch_up()
+            conflicts = [record for record in self.journal.pending if record_keys(record) & self._stale_keys]
+            if conflicts:
+                self.journal.pending = [record for record in self.journal.pending if record not in conflicts]
+            self.journal.flush()
+            self._track_journal()
+            self._pending_base = {}
+            self._stale_keys = set()
+            if conflicts:
+                self._reload()
+        if conflicts:
+            names = sorted({task_name for record in conflicts for _, task_name in record_keys(record)})
+            raise ConflictError(f"Changes to {', '.join(names)} were discarded because another program changed them first")
+
+    def flush(self):
+        # Writes buffered journal records; safe to call from a worker thread.
+        # Listeners hear about other processes' changes at the next refresh()
+        with self.file_lock:
+            self._flush_pending()
+
+    def close(self):
+        # Only a journal past its threshold is folded in, so a short scripted
+        # command appends a few records instead of rewriting the whole CSV
+        self.flush()
+        if self.journal.record_count >= self.compact_threshold:
+            self.compact(wait=True)
+        elif self._compactor is not None:
+            self._compactor.join()
@@ -0,0 +1,62 @@
+import os
+from collections import OrderedDict
+from task_renderer import email_header, render_text
+
+# Rendered views kept at most, over all users and kinds
+VIEW_CACHE_SIZE = int(os.environ.get("TASK_MANAGER_VIEW_CACHE_SIZE", 256))
+
+
+class TaskViewCache:
+    # Read-through LRU cache of each user's rendered task list, keyed by
+    # (user, kind). Every change on the store's change feed bumps that user's
+    # version and a reload bumps everyone's, so an entry built at an older
+    # version is rebuilt on its next read instead of being searched for and
+    # dropped on every change
+    def __init__(self, task_store, max_entries=VIEW_CACHE_SIZE):
+        self.task_store = task_store
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        task_store.subscribe(self.on_task_change)
+
+    def version(self, user_email):
+        return (self.generation, self.versions.get(user_email, 0))
+
+    def get(self, user_email, kind, build):
+        # build() renders the view; its result is shared between callers and
+        # must not be modified
+        key = (user_email, kind)
+        version = self.version(user_email)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        value = build()
+        self.entries[key] = (version, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return value
+
+    def email(self, user_email, user_name):
+        # Only the task blocks are cached; the greeting is per name
+        return email_header(user_name) + self.get(
+            user_email, "email", lambda: render_text(self.task_store.user_tasks(user_email), trailer="\n\n"))
+
+    def on_task_change(self, op, user_email, task_name, task):
+        if op == "reload":
+            self.generation += 1
+        else:
+            self.versions[user_email] = self.versions.get(user_email, 0) + 1
+
+    def forget(self, user_email):
+        for key in [key for key in self.entries if key[0] == user_email]:
+            del self.entries[key]
+
+    def close(self):
+        self.task_store.unsubscribe(self.on_task_change)
@@ -1,11 +1,260 @@
-import pandas as pd
 import re
-from datetime import datetime
-import smtplib
+from calendar import monthrange
+from datetime import date, datetime, timedelta
 import tkinter as tk
 from tkinter import ttk, messagebox
-from tkcalendar import DateEntry
-import os
+from tkcalendar import Calendar, DateEntry
+import instrumentation
+from io_worker import IOWorker
+from mail_transport import MailTransport
+from repository import open_repositories
+from task_intervals import TaskIntervalIndex
+from task_query import TaskQuery
+from task_renderer import task_row, task_rows
+from task_scheduler import TaskScheduler
+from task_search import TaskNameIndex
+from task_views import TaskViewCache
+from task_schema import TASK_STATUSES, format_time
+
+# Row colors in the task list
+STATUS_COLORS = {
+    "Upcoming": "#FFF3CD",  # Yellow
+    "Ongoing": "#D6EAF8",   # Blue
+    "Completed": "#DFF0D8", # Green
+    "Overdue": "#F8D7DA"    # Red
+}
+
+# Rows inserted into the task list per event loop iteration
+TREE_BATCH_SIZE = 200
+
+# Tasks per page of the task list
+TREE_PAGE_SIZE = 100
+
+# Task list column -> task_query sort key
+TREE_SORT_KEYS = {"task_name": "name", "start": "start", "end": "end", "task_status": "status"}
+
+# Edits made within this many milliseconds of each other are saved together
+SAVE_DELAY_MS = 500
+
+# How often changes made by other programs sharing the data files are picked up
+REFRESH_INTERVAL_MS = 1000
+
+def send_task_email(mail_transport, user_email, message, progress):
+    # Email sending process; the transport reuses its SMTP session
+    progress("Sending email...")
+    mail_transport.send(user_email, message)
+
+class TaskListView:
+    # One page of the user's tasks at a time, sorted by the clicked heading
+    # and filtered by status. fetch(sort, descending, statuses, cursor)
+    # returns the page's rows, their sort keys and the next page's cursor;
+    # sort_key(sort, task) places a changed task so its row can be patched
+    # in place while it stays on the page
+    def __init__(self, parent, root, fetch, sort_key):
+        self.root = root
+        self.fetch = fetch
+        self.sort_key = sort_key
+        self.frame = tk.Frame(parent, bg="white")
+        
+        # Title
+        tk.Label(self.frame, text="Your Tasks", font=("Arial", 16, "bold"), bg="white").pack(pady=20)
+        
+        # Status filter and paging
+        controls = tk.Frame(self.frame, bg="white")
+        controls.pack(fill="x", padx=10)
+        tk.Label(controls, text="Status:", font=("Arial", 12), bg="white").pack(side="left")
+        self.status_var = tk.StringVar(value="All")
+        status_box = ttk.Combobox(controls, textvariable=self.status_var, values=["All"] + TASK_STATUSES,
+                                  state="readonly", width=12)
+        status_box.pack(side="left", padx=5)
+        status_box.bind("<<ComboboxSelected>>", lambda event: self.first_page())
+        self.next_button = tk.Button(controls, text="Next ▶", font=("Arial", 11), command=self.next_page)
+        self.next_button.pack(side="right")
+        self.previous_button = tk.Button(controls, text="◀ Previous", font=("Arial", 11), command=self.previous_page)
+        self.previous_button.pack(side="right", padx=5)
+        self.page_label = tk.Label(controls, font=("Arial", 11), bg="white")
+        self.page_label.pack(side="right", padx=10)
+        
+        self.empty_label = tk.Label(self.frame, text="You don't have any tasks yet", 
+                                    font=("Arial", 14), bg="white")
+        
+        # A Treeview only draws the visible rows, so the widget count does not
+        # grow with the number of tasks
+        self.tree_frame = tk.Frame(self.frame, bg="white")
+        
+        columns = ("task_name", "start", "end", "task_status")
+        self.tree = ttk.Treeview(self.tree_frame, columns=columns, show="headings", selectmode="browse")
+        scrollbar = ttk.Scrollbar(self.tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        
+        self.headings = {}
+        for column, heading, width in [("task_name", "Task Name", 220), ("start", "Start", 130),
+                                       ("end", "End", 130), ("task_status", "Status", 90)]:
+            self.headings[column] = heading
+            self.tree.heading(column, text=heading, command=lambda column=column: self.sort_by(column))
+            self.tree.column(column, width=width, anchor="w")
+        
+        # Status colors
+        for status, color in STATUS_COLORS.items():
+            self.tree.tag_configure(status, background=color)
+        
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        # task_name -> row values, the source of truth for queued rows
+        self.rows = {}
+        # Sort keys of the rows, in display order
+        self.keys = []
+        self.sort = "start"
+        self.descending = False
+        # Cursor of every page up to the current one, for Previous, and the
+        # key each of them resumes after
+        self.cursors = [None]
+        self.after_keys = [None]
+        self.next_cursor = None
+        # Key of the last row when more pages follow; the page holds every
+        # matching task between after_keys[-1] and it
+        self.last_key = None
+        self.refresh_pending = False
+        self.update_headings()
+    
+    def statuses(self):
+        status = self.status_var.get()
+        return None if status == "All" else [status]
+    
+    def show_page(self):
+        rows, keys, self.next_cursor = self.fetch(self.sort, self.descending, self.statuses(), self.cursors[-1])
+        if not rows and len(self.cursors) > 1:
+            # The page emptied out (its tasks were deleted), so go back one
+            self.cursors.pop()
+            self.after_keys.pop()
+            self.show_page()
+            return
+        self.keys = list(keys)
+        self.last_key = self.keys[-1] if self.next_cursor is not None else None
+        self.load(rows)
+        self.page_label.config(text=f"Page {len(self.cursors)}")
+        self.previous_button.config(state="normal" if len(self.cursors) > 1 else "disabled")
+        self.next_button.config(state="normal" if self.next_cursor is not None else "disabled")
+    
+    def first_page(self):
+        self.cursors = [None]
+        self.after_keys = [None]
+        self.show_page()
+    
+    def next_page(self):
+        if self.next_cursor is not None:
+            self.cursors.append(self.next_cursor)
+            self.after_keys.append(self.last_key)
+            self.show_page()
+    
+    def previous_page(self):
+        if len(self.cursors) > 1:
+            self.cursors.pop()
+            self.after_keys.pop()
+            self.show_page()
+    
+    def sort_by(self, column):
+        # Clicking the sorted column again reverses it
+        sort = TREE_SORT_KEYS[column]
+        self.descending = not self.descending if sort == self.sort else False
+        self.sort = sort
+        self.update_headings()
+        self.first_page()
+    
+    def update_headings(self):
+        for column, heading in self.headings.items():
+            if TREE_SORT_KEYS[column] == self.sort:
+                heading += " ▼" if self.descending else " ▲"
+            self.tree.heading(column, text=heading)
+    
+    def on_page(self, key):
+        # Whether a task with this key belongs between the page's bounds
+        after = self.after_keys[-1]
+        if self.descending:
+            return (after is None or key < after) and (self.last_key is None or key >= self.last_key)
+        return (after is None or key > after) and (self.last_key is None or key <= self.last_key)
+    
+    def apply_change(self, op, task_name, task):
+        # A task that stays on the page has its row patched in place. One
+        # that moves onto or off a full page changes which tasks the page
+        # holds, so the page is fetched again; so is a last page that would
+        # overflow or empty out
+        if self.refresh_pending:
+            return
+        key = None
+        statuses = self.statuses()
+        if op != "delete" and (statuses is None or task['task_status'] in statuses):
+            key = self.sort_key(self.sort, task)
+            if not self.on_page(key):
+                key = None
+        was_shown = task_name in self.rows
+        if not was_shown and key is None:
+            return
+        if was_shown != (key is not None) and (self.next_cursor is not None or
+                                               (not was_shown and len(self.keys) >= TREE_PAGE_SIZE) or
+                                               (was_shown and len(self.keys) == 1 and len(self.cursors) > 1)):
+            self.schedule_refresh()
+            return
+        if was_shown:
+            self.keys = [row_key for row_key in self.keys if row_key[-1] != task_name]
+            self.rows.pop(task_name)
+        if key is None:
+            if self.tree.exists(task_name):
+                self.tree.delete(task_name)
+        else:
+            row = task_row(task)
+            index = sum(1 for row_key in self.keys if (row_key > key if self.descending else row_key < key))
+            self.keys.insert(index, key)
+            self.rows[row[0]] = row
+            if row[0] == task_name and self.tree.exists(task_name):
+                # The same row, moved if its sort key did; the selection stays
+                self.tree.item(task_name, values=row, tags=(row[3],))
+                self.tree.move(task_name, "", index)
+            else:
+                if self.tree.exists(task_name):
+                    self.tree.delete(task_name)
+                self.tree.insert("", index, iid=row[0], values=row, tags=(row[3],))
+        self.update_empty_state()
+    
+    def schedule_refresh(self):
+        # A burst of changes, e.g. a status refresh, fetches the page once
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.root.after_idle(self.refresh_page)
+    
+    def refresh_page(self):
+        self.refresh_pending = False
+        if self.tree.winfo_exists():
+            self.show_page()
+    
+    def load(self, rows):
+        # Rows are formatted up front, then inserted in batches so the first
+        # rows appear immediately however long the page is
+        self.rows = {row[0]: row for row in rows}
+        self.tree.delete(*self.tree.get_children())
+        self.update_empty_state()
+        self.insert_batch(list(self.rows), 0)
+    
+    def insert_batch(self, names, start):
+        if not self.tree.winfo_exists():
+            return
+        for name in names[start:start + TREE_BATCH_SIZE]:
+            row = self.rows.get(name)
+            if row is not None and not self.tree.exists(name):
+                self.tree.insert("", tk.END, iid=name, values=row, tags=(row[3],))
+        if start + TREE_BATCH_SIZE < len(names):
+            self.root.after(1, self.insert_batch, names, start + TREE_BATCH_SIZE)
+    
+    def update_empty_state(self):
+        if self.rows:
+            self.empty_label.pack_forget()
+            self.tree_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        else:
+            self.tree_frame.pack_forget()
+            filtered = self.statuses() is not None
+            self.empty_label.config(text="No tasks with this status" if filtered else "You don't have any tasks yet")
+            self.empty_label.pack(pady=50)
 
 class TaskManagerApp:
     def __init__(self, root):
@@ -14,23 +263,43 @@ class TaskManagerApp:
         self.root.geometry("800x600")
         self.root.configure(bg="#f0f0f0")
         
-        # Initialize dataframes
-        if os.path.exists("./users.csv"):
-            self.df_users = pd.read_csv("./users.csv")
-        else:
-            self.df_users = pd.DataFrame(columns=["user_email", "user_password", "user_name"])
-            self.df_users.to_csv("./users.csv", index=False)
-            
-        if os.path.exists("./task_manager.csv"):
-            self.df_task_manager = pd.read_csv("./task_manager.csv")
-        else:
-            self.df_task_manager = pd.DataFrame(columns=["user_email", "task_name", "task_start_date", 
-                                                        "task_start_time", "task_end_date", "task_end_time", 
-                                                        "task_status"])
-            self.df_task_manager.to_csv("./task_manager.csv", index=False)
+        # Storage backend is chosen by TASK_MANAGER_BACKEND (csv or sqlite)
+        self.user_registry, self.task_store = open_repositories(autoflush=False)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Task name search; subscribed first so it is current when the views
+        # are patched
+        self.task_search = TaskNameIndex(self.task_store)
+        self.task_intervals = TaskIntervalIndex(self.task_store)
+        # Sorted pages of the task list, and their formatted rows so
+        # returning to the dashboard does not format them again
+        self.task_query = TaskQuery(self.task_store)
+        self.task_views = TaskViewCache(self.task_store)
+        
+        # Open views are patched from the store's change feed
+        self.task_store.subscribe(self.on_task_change)
+        
+        # Disk writes and email run on background threads
+        self.io_worker = IOWorker(self.root)
+        self.mail_transport = MailTransport()
+        self.progress_var = tk.StringVar()
         
         self.current_user_email = None
         self.current_user_name = None
+        self.task_view = None
+        self.task_listbox = None
+        self.task_listbox_names = None
+        self.task_search_var = None
+        self.selected_task = None
+        self.calendar = None
+        self.calendar_day_list = None
+        self.scheduler = None
+        self.scheduler_after_id = None
+        self.refresh_after_id = None
+        
+        # TASK_MANAGER_INSTRUMENT=1 times the views and counts their widgets
+        if instrumentation.enabled():
+            instrumentation.instrument_gui(self)
         
         # Create login frame
         self.create_login_frame()
@@ -77,7 +346,7 @@ class TaskManagerApp:
             return
         
         # Check if user exists
-        if len(self.df_users) == 0 or email not in list(self.df_users['user_email']):
+        if email not in self.user_registry:
             # New user - show name field if not already showing
             if not self.name_label.winfo_ismapped():
                 self.name_label.pack(anchor="w", pady=(10, 0))
@@ -92,13 +361,7 @@ class TaskManagerApp:
                 return
                 
             # Add new user
-            user_dict = {
-                "user_email": email,
-                "user_password": password,
-                "user_name": name
-            }
-            self.df_users = pd.concat([self.df_users, pd.DataFrame([user_dict])], ignore_index=True)
-            self.df_users.to_csv("./users.csv", index=False)
+            self.user_registry.register(email, password, name)
             messagebox.showinfo("Success", "Registration successful!")
             
             self.current_user_email = email
@@ -106,11 +369,9 @@ class TaskManagerApp:
             self.show_task_dashboard()
         else:
             # Existing user - authenticate password
-            user_data = self.df_users[self.df_users['user_email'] == email]
-            stored_password = user_data['user_password'].iloc[0]
-            stored_name = user_data['user_name'].iloc[0]
+            stored_name = self.user_registry.authenticate(email, password)
             
-            if password != stored_password:
+            if stored_name is None:
                 messagebox.showerror("Error", "Incorrect password. Please try again.")
                 return
                 
@@ -124,6 +385,11 @@ class TaskManagerApp:
         for widget in self.root.winfo_children():
             widget.destroy()
         
+        self.task_view = None
+        self.task_listbox = None
+        self.task_listbox_names = None
+        self.task_search_var = None
+        
         # Create main dashboard
         self.dashboard_frame = tk.Frame(self.root, bg="#f0f0f0")
         self.dashboard_frame.pack(fill="both", expand=True)
@@ -136,9 +402,13 @@ class TaskManagerApp:
                 font=("Arial", 16, "bold"), bg="#4CAF50", fg="white").pack(side="left", padx=20, pady=10)
         
         logout_btn = tk.Button(header_frame, text="Logout", font=("Arial", 12), 
-                              command=self.create_login_frame)
+                              command=self.logout)
         logout_btn.pack(side="right", padx=20, pady=10)
         
+        # Progress of background saves and emails
+        tk.Label(header_frame, textvariable=self.progress_var, font=("Arial", 10),
+                bg="#4CAF50", fg="white").pack(side="right", padx=10)
+        
         # Create sidebar for actions
         sidebar_frame = tk.Frame(self.dashboard_frame, width=200, bg="#dcdcdc")
         sidebar_frame.pack(side="left", fill="y", padx=(0, 20))
@@ -152,6 +422,7 @@ class TaskManagerApp:
             ("Delete Task", self.show_delete_task),
             ("Modify Task", self.show_modify_task),
             ("View Tasks", self.show_view_tasks),
+            ("Calendar", self.show_calendar),
             ("Email Tasks", self.email_tasks)
         ]
         
@@ -166,11 +437,129 @@ class TaskManagerApp:
         
         # Show tasks by default
         self.show_view_tasks()
+        self.start_scheduler()
+        self.refresh_store()
+    
+    def logout(self):
+        self.stop_refresh()
+        self.stop_scheduler()
+        # Release the user's tasks so memory only holds the active user
+        self.task_store.unload_user(self.current_user_email)
+        self.task_search.forget(self.current_user_email)
+        self.task_intervals.forget(self.current_user_email)
+        self.task_query.forget(self.current_user_email)
+        self.task_views.forget(self.current_user_email)
+        self.current_user_email = None
+        self.current_user_name = None
+        self.task_view = None
+        self.task_listbox = None
+        self.task_listbox_names = None
+        self.task_search_var = None
+        self.create_login_frame()
     
     def clear_content_frame(self):
-        # Clear the content frame for new content
+        # Clear the content frame for new content; the task list is kept
+        # so it does not have to be rebuilt next time
+        self.task_listbox = None
+        self.task_listbox_names = None
+        self.task_search_var = None
+        self.selected_task = None
+        self.calendar = None
+        self.calendar_day_list = None
         for widget in self.content_frame.winfo_children():
-            widget.destroy()
+            if self.task_view is not None and widget is self.task_view.frame:
+                widget.pack_forget()
+            else:
+                widget.destroy()
+    
+    def on_task_change(self, op, user_email, task_name, task):
+        if op == "reload":
+            self.reload_views()
+            return
+        self.schedule_save()
+        if user_email != self.current_user_email:
+            return
+        # Runs once every listener, including the scheduler, has seen the change
+        self.root.after_idle(self.schedule_tick)
+        if self.task_view is not None:
+            self.task_view.apply_change(op, task_name, task)
+        if self.calendar is not None:
+            self.load_calendar_month()
+        if self.task_listbox is not None and self.task_search_var.get().strip():
+            # A filtered list is simply searched again
+            self.filter_task_listbox()
+        elif self.task_listbox is not None:
+            # Patch the delete/modify list in place
+            if op == "add":
+                self.task_listbox_names.append(task['task_name'])
+                self.task_listbox.insert(tk.END, task['task_name'])
+            elif task_name in self.task_listbox_names:
+                index = self.task_listbox_names.index(task_name)
+                self.task_listbox.delete(index)
+                if op == "delete":
+                    del self.task_listbox_names[index]
+                else:
+                    self.task_listbox_names[index] = task['task_name']
+                    self.task_listbox.insert(index, task['task_name'])
+    
+    def reload_views(self):
+        # The store was reloaded from disk, so the open views are rebuilt
+        # rather than patched
+        if self.current_user_email is None:
+            return
+        if self.task_view is not None:
+            self.task_view.show_page()
+        if self.task_listbox is not None:
+            self.filter_task_listbox()
+        if self.calendar is not None:
+            self.load_calendar_month()
+        self.root.after_idle(self.schedule_tick)
+    
+    def create_task_picker(self, parent, task_names, height):
+        # Search box over a listbox of the user's task names. Typing narrows
+        # the list to names with words starting with what was typed
+        search_frame = tk.Frame(parent, bg="white")
+        search_frame.pack(fill="x", pady=5)
+        tk.Label(search_frame, text="Search:", font=("Arial", 12), bg="white").pack(side="left")
+        self.task_search_var = tk.StringVar()
+        tk.Entry(search_frame, textvariable=self.task_search_var, font=("Arial", 12), width=30).pack(side="left", padx=5)
+        
+        task_listbox = tk.Listbox(parent, font=("Arial", 12), width=50, height=height)
+        task_listbox.pack(fill="both", expand=True, pady=5)
+        
+        # Populate listbox
+        for name in task_names:
+            task_listbox.insert(tk.END, name)
+        self.task_listbox = task_listbox
+        self.task_listbox_names = task_names
+        task_listbox.bind("<<ListboxSelect>>", lambda event: self.remember_selection(task_listbox, task_names))
+        self.task_search_var.trace("w", lambda *args: self.filter_task_listbox())
+        return task_listbox
+    
+    def filter_task_listbox(self):
+        query = self.task_search_var.get()
+        if query.strip():
+            names = self.task_search.search(self.current_user_email, query)
+        else:
+            names = self.task_store.task_names(self.current_user_email)
+        # The list is updated in place; the buttons' callbacks hold it
+        self.task_listbox_names[:] = names
+        self.task_listbox.delete(0, tk.END)
+        for name in names:
+            self.task_listbox.insert(tk.END, name)
+    
+    def remember_selection(self, listbox, task_names):
+        # The version of the task when it was picked; saving fails with a
+        # ConflictError if another program changes it in the meantime
+        selected_indices = listbox.curselection()
+        if selected_indices:
+            task_name = task_names[selected_indices[0]]
+            self.selected_task = (task_name, self.task_store.task_version(self.current_user_email, task_name))
+    
+    def selected_version(self, task_name):
+        if self.selected_task is not None and self.selected_task[0] == task_name:
+            return self.selected_task[1]
+        return None
     
     def show_add_task(self):
         self.clear_content_frame()
@@ -242,9 +631,12 @@ class TaskManagerApp:
             "task_status": "Upcoming"
         }
         
-        # Add to dataframe and save
-        self.df_task_manager = pd.concat([self.df_task_manager, pd.DataFrame([task_dict])], ignore_index=True)
-        self.df_task_manager.to_csv("./task_manager.csv", index=False)
+        # Add to the task store (appends one journal record)
+        try:
+            self.task_store.add_task(task_dict)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
         
         messagebox.showinfo("Success", "Task added successfully")
         self.show_view_tasks()
@@ -252,26 +644,22 @@ class TaskManagerApp:
     def show_delete_task(self):
         self.clear_content_frame()
         
-        # Filter tasks for current user
-        user_tasks = self.df_task_manager[self.df_task_manager['user_email'] == self.current_user_email]
+        # Look up the current user's tasks in the store index
+        task_names = self.task_store.task_names(self.current_user_email)
         
-        if len(user_tasks) == 0:
+        if len(task_names) == 0:
             tk.Label(self.content_frame, text="You don't have any tasks to delete", 
                     font=("Arial", 14), bg="white").pack(pady=50)
             return
             
         tk.Label(self.content_frame, text="Delete Task", font=("Arial", 16, "bold"), bg="white").pack(pady=20)
         
-        # Create a listbox of tasks
+        # Create a searchable listbox of tasks
         tk.Label(self.content_frame, text="Select a task to delete:", font=("Arial", 12), bg="white").pack(anchor="w", padx=20, pady=(20, 10))
         
-        task_listbox = tk.Listbox(self.content_frame, font=("Arial", 12), width=50, height=10)
-        task_listbox.pack(fill="both", expand=True, padx=20, pady=10)
-        
-        # Populate listbox
-        task_names = user_tasks['task_name'].tolist()
-        for name in task_names:
-            task_listbox.insert(tk.END, name)
+        picker_frame = tk.Frame(self.content_frame, bg="white")
+        picker_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        task_listbox = self.create_task_picker(picker_frame, task_names, 10)
             
         # Delete button
         delete_btn = tk.Button(self.content_frame, text="Delete Selected Task", 
@@ -288,6 +676,7 @@ class TaskManagerApp:
             
         selected_index = selected_indices[0]
         task_to_delete = task_names[selected_index]
+        version = self.selected_version(task_to_delete)
         
         # Confirm deletion
         confirm = messagebox.askyesno("Confirm Deletion", f"Are you sure you want to delete '{task_to_delete}'?")
@@ -295,24 +684,24 @@ class TaskManagerApp:
             return
             
         # Delete the task
-        self.df_task_manager = self.df_task_manager[
-            ~((self.df_task_manager['user_email'] == self.current_user_email) & 
-              (self.df_task_manager['task_name'] == task_to_delete))
-        ]
-        
-        # Save changes
-        self.df_task_manager.to_csv("./task_manager.csv", index=False)
+        try:
+            self.task_store.delete_task(self.current_user_email, task_to_delete, version)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
         
         messagebox.showinfo("Success", "Task deleted successfully")
-        self.show_delete_task()  # Refresh the delete task view
+        # The list was already patched by on_task_change
+        if not self.task_store.task_names(self.current_user_email):
+            self.show_delete_task()
     
     def show_modify_task(self):
         self.clear_content_frame()
         
-        # Filter tasks for current user
-        user_tasks = self.df_task_manager[self.df_task_manager['user_email'] == self.current_user_email]
+        # Look up the current user's tasks in the store index
+        task_names = self.task_store.task_names(self.current_user_email)
         
-        if len(user_tasks) == 0:
+        if len(task_names) == 0:
             tk.Label(self.content_frame, text="You don't have any tasks to modify", 
                     font=("Arial", 14), bg="white").pack(pady=50)
             return
@@ -325,13 +714,7 @@ class TaskManagerApp:
         
         tk.Label(frame1, text="Step 1: Select a task to modify:", font=("Arial", 12), bg="white").pack(anchor="w", pady=(10, 5))
         
-        task_listbox = tk.Listbox(frame1, font=("Arial", 12), width=50, height=6)
-        task_listbox.pack(fill="both", expand=True, pady=5)
-        
-        # Populate listbox
-        task_names = user_tasks['task_name'].tolist()
-        for name in task_names:
-            task_listbox.insert(tk.END, name)
+        task_listbox = self.create_task_picker(frame1, task_names, 6)
         
         # Step 2: Select what to modify
         frame2 = tk.Frame(self.content_frame, bg="white")
@@ -440,16 +823,13 @@ class TaskManagerApp:
             messagebox.showerror("Error", "Task name cannot be empty")
             return
         
-        # Update the dataframe
-        task_index = self.df_task_manager[
-            (self.df_task_manager['user_email'] == self.current_user_email) & 
-            (self.df_task_manager['task_name'] == task_to_modify)
-        ].index
-        
-        self.df_task_manager.loc[task_index, modification_field] = new_value
-        
-        # Save changes
-        self.df_task_manager.to_csv("./task_manager.csv", index=False)
+        # Update the task
+        try:
+            self.task_store.modify_task(self.current_user_email, task_to_modify, modification_field, new_value,
+                                        self.selected_version(task_to_modify))
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
         
         messagebox.showinfo("Success", "Task modified successfully")
         self.show_view_tasks()
@@ -457,122 +837,161 @@ class TaskManagerApp:
     def show_view_tasks(self):
         self.clear_content_frame()
         
-        # Filter tasks for current user
-        user_tasks = self.df_task_manager[self.df_task_manager['user_email'] == self.current_user_email]
-        
-        # Create a canvas with scrollbar for the tasks
-        canvas_frame = tk.Frame(self.content_frame)
-        canvas_frame.pack(fill="both", expand=True, padx=10, pady=10)
-        
-        canvas = tk.Canvas(canvas_frame, bg="white")
-        scrollbar = ttk.Scrollbar(canvas_frame, orient="vertical", command=canvas.yview)
-        
-        # Configure scrollbar
-        scrollable_frame = tk.Frame(canvas, bg="white")
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
+        # The task list is built once per dashboard and kept up to date by
+        # on_task_change, so showing it again costs nothing
+        if self.task_view is None:
+            self.task_view = TaskListView(self.content_frame, self.root, self.fetch_task_page, self.task_query.key)
+            if instrumentation.enabled():
+                instrumentation.instrument_task_list(self.task_view)
+            self.task_view.first_page()
+        self.task_view.frame.pack(fill="both", expand=True)
+    
+    def fetch_task_page(self, sort, descending, statuses, cursor):
+        # A page of formatted rows, their sort keys and the next page's
+        # cursor, cached until the user's tasks change
+        user_email = self.current_user_email
+        
+        def build():
+            keys, next_cursor = self.task_query.page_keys(user_email, sort, descending, statuses,
+                                                          cursor=cursor, limit=TREE_PAGE_SIZE)
+            return task_rows(self.task_query.tasks(user_email, keys)), keys, next_cursor
+        key = ("page", sort, descending, tuple(statuses or ()), cursor)
+        return self.task_views.get(user_email, key, build)
+    
+    def show_calendar(self):
+        self.clear_content_frame()
         
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        tk.Label(self.content_frame, text="Calendar", font=("Arial", 16, "bold"), bg="white").pack(pady=20)
         
-        # Pack canvas and scrollbar
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        # Days with tasks are highlighted; hovering shows their names
+        calendar = Calendar(self.content_frame, selectmode="day", date_pattern="yyyy-mm-dd",
+                            font=("Arial", 11))
+        calendar.tag_config("task", background=STATUS_COLORS["Ongoing"], foreground="black")
+        calendar.pack(padx=20, pady=10)
+        self.calendar = calendar
         
-        # Title
-        tk.Label(scrollable_frame, text="Your Tasks", font=("Arial", 16, "bold"), bg="white").pack(pady=20)
+        tk.Label(self.content_frame, text="Tasks on the selected day:", font=("Arial", 12), bg="white").pack(anchor="w", padx=20, pady=(10, 5))
+        self.calendar_day_list = tk.Listbox(self.content_frame, font=("Arial", 12), width=60, height=8)
+        self.calendar_day_list.pack(fill="both", expand=True, padx=20, pady=(0, 20))
         
-        if len(user_tasks) == 0:
-            tk.Label(scrollable_frame, text="You don't have any tasks yet", 
-                    font=("Arial", 14), bg="white").pack(pady=50)
+        # Each month shown is one query against the interval index
+        calendar.bind("<<CalendarMonthChanged>>", lambda event: self.load_calendar_month())
+        calendar.bind("<<CalendarSelected>>", lambda event: self.show_calendar_day())
+        self.load_calendar_month()
+    
+    def load_calendar_month(self):
+        month, year = self.calendar.get_displayed_month()
+        first_day = date(year, month, 1)
+        last_day = date(year, month, monthrange(year, month)[1])
+        self.calendar.calevent_remove("all")
+        for day, names in self.task_intervals.tasks_by_day(self.current_user_email, first_day, last_day).items():
+            self.calendar.calevent_create(day, "\n".join(names), "task")
+        self.show_calendar_day()
+    
+    def show_calendar_day(self):
+        self.calendar_day_list.delete(0, tk.END)
+        day = self.calendar.selection_get()
+        if day is None:
             return
-        
-        # Create task cards for each task
-        for _, task in user_tasks.iterrows():
-            task_frame = tk.Frame(scrollable_frame, bg="white", bd=1, relief=tk.SOLID)
-            task_frame.pack(fill="x", pady=10, padx=20)
-            
-            # Status color indicator
-            status_colors = {
-                "Upcoming": "#FFC107",  # Yellow
-                "Ongoing": "#2196F3",   # Blue
-                "Completed": "#4CAF50"  # Green
-            }
-            
-            status_color = status_colors.get(task['task_status'], "#FFC107")
-            
-            status_indicator = tk.Frame(task_frame, bg=status_color, width=5)
-            status_indicator.pack(side="left", fill="y")
-            
-            # Task details
-            details_frame = tk.Frame(task_frame, bg="white")
-            details_frame.pack(side="left", fill="both", expand=True, padx=10, pady=10)
-            
-            # Task name (bold)
-            tk.Label(details_frame, text=task['task_name'], font=("Arial", 14, "bold"), 
-                    bg="white", anchor="w").pack(fill="x")
-            
-            # Format dates and times
-            try:
-                start_date = str(task['task_start_date']).split()[0] if isinstance(task['task_start_date'], str) else task['task_start_date']
-                start_time = str(task['task_start_time']).split()[1] if isinstance(task['task_start_time'], str) and " " in str(task['task_start_time']) else task['task_start_time']
-                end_date = str(task['task_end_date']).split()[0] if isinstance(task['task_end_date'], str) else task['task_end_date']
-                end_time = str(task['task_end_time']).split()[1] if isinstance(task['task_end_time'], str) and " " in str(task['task_end_time']) else task['task_end_time']
-            except:
-                # Fallback if date parsing fails
-                start_date = task['task_start_date']
-                start_time = task['task_start_time']
-                end_date = task['task_end_date']
-                end_time = task['task_end_time']
-            
-            # Create info text
-            info_text = f"Start: {start_date} {start_time} | End: {end_date} {end_time} | Status: {task['task_status']}"
-            tk.Label(details_frame, text=info_text, font=("Arial", 10), 
-                    bg="white", anchor="w").pack(fill="x")
+        start = datetime.combine(day, datetime.min.time())
+        df_tasks = self.task_intervals.overlapping(self.current_user_email, start, start + timedelta(days=1))
+        for name, task_start, task_end, status in task_rows(df_tasks):
+            self.calendar_day_list.insert(tk.END, f"{task_start} - {task_end}   {name} ({status})")
     
     def email_tasks(self):
         # Check if user has tasks
-        user_tasks = self.df_task_manager[self.df_task_manager['user_email'] == self.current_user_email]
-        
-        if len(user_tasks) == 0:
+        if len(self.task_store.task_names(self.current_user_email)) == 0:
             messagebox.showinfo("No Tasks", "You don't have any tasks to email.")
             return
             
+        message = self.task_views.email(self.current_user_email, self.current_user_name)
+        
+        # The SMTP session runs on the I/O worker so the window stays responsive
+        self.set_status("Sending email...")
+        self.io_worker.submit(send_task_email, self.mail_transport, self.current_user_email, message,
+                              on_progress=self.set_status,
+                              on_done=self.on_email_sent,
+                              on_error=self.on_email_failed)
+    
+    def on_email_sent(self, result):
+        self.set_status("")
+        messagebox.showinfo("Success", "Tasks successfully emailed to you!")
+    
+    def on_email_failed(self, error):
+        self.set_status("")
+        messagebox.showerror("Error", f"Failed to send email: {str(error)}")
+    
+    def schedule_save(self):
+        # Rapid successive edits are written to disk in a single flush
+        self.set_status("Saving...")
+        self.io_worker.coalesce("save", self.task_store.flush, delay=SAVE_DELAY_MS,
+                                on_done=lambda result: self.set_status("All changes saved"),
+                                on_error=lambda error: messagebox.showerror("Error", f"Failed to save tasks: {error}"))
+    
+    def set_status(self, text):
+        self.progress_var.set(text)
+
+    def refresh_store(self):
+        # Other programs may be editing the same data files; their changes
+        # arrive through on_task_change like local ones
+        self.refresh_after_id = None
         try:
-            # Email sending process
-            task_manager_email = "gmail id"
-            task_manager_password = "password"
-            
-            s = smtplib.SMTP('smtp.gmail.com', 587)
-            s.starttls()
-            s.login(task_manager_email, task_manager_password)
-            
-            message = f"""Subject : Task reminder\n\n
-Dear {self.current_user_name},\n
-Please find below the list of tasks created by you\n"""
-            
-            for _, task in user_tasks.iterrows():
-                message += "------------------------------------------------------------------------------\n"
-                message += f"""
-Task Name : {task['task_name']}
-Task Start Date : {str(task['task_start_date']).split(" ")[0] if isinstance(task['task_start_date'], str) else task['task_start_date']}
-Task Start Time : {str(task['task_start_time']).split(" ")[1] if isinstance(task['task_start_time'], str) and " " in str(task['task_start_time']) else task['task_start_time']}
-Task End Date : {str(task['task_end_date']).split(" ")[0] if isinstance(task['task_end_date'], str) else task['task_end_date']}
-Task End Time : {str(task['task_end_time']).split(" ")[1] if isinstance(task['task_end_time'], str) and " " in str(task['task_end_time']) else task['task_end_time']}
-Task Status : {task['task_status']}
-\n\n"""
-            
-            s.sendmail(task_manager_email, self.current_user_email, message)
-            s.quit()
-            
-            messagebox.showinfo("Success", "Tasks successfully emailed to you!")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to send email: {str(e)}")
+            self.task_store.refresh()
+        finally:
+            self.refresh_after_id = self.root.after(REFRESH_INTERVAL_MS, self.refresh_store)
+    
+    def stop_refresh(self):
+        if self.refresh_after_id is not None:
+            self.root.after_cancel(self.refresh_after_id)
+            self.refresh_after_id = None
+
+    def start_scheduler(self):
+        # Status changes and reminders for the logged-in user run on the Tk
+        # thread, woken by root.after when the next task starts or ends
+        self.scheduler = TaskScheduler(self.task_store, self.current_user_email,
+                                       on_reminder=self.on_task_reminder).load()
+        self.schedule_tick()
+    
+    def schedule_tick(self):
+        if self.scheduler_after_id is not None:
+            self.root.after_cancel(self.scheduler_after_id)
+            self.scheduler_after_id = None
+        if self.scheduler is None:
+            return
+        seconds = self.scheduler.seconds_until_next()
+        if seconds is not None:
+            # Events more than a day away are simply re-checked tomorrow
+            self.scheduler_after_id = self.root.after(int(min(seconds, 86400) * 1000), self.run_scheduler)
+    
+    def run_scheduler(self):
+        self.scheduler_after_id = None
+        self.scheduler.run_pending()
+        self.schedule_tick()
+    
+    def stop_scheduler(self):
+        if self.scheduler_after_id is not None:
+            self.root.after_cancel(self.scheduler_after_id)
+            self.scheduler_after_id = None
+        if self.scheduler is not None:
+            self.scheduler.stop()
+            self.scheduler = None
+    
+    def on_task_reminder(self, user_email, task_name, task_start):
+        messagebox.showinfo("Reminder", f"'{task_name}' starts at {format_time(task_start)}")
+    
+    def on_close(self):
+        self.stop_refresh()
+        self.stop_scheduler()
+        # Finish background work and flush pending task changes before exiting
+        self.io_worker.shutdown()
+        self.mail_transport.close()
+        self.task_store.close()
+        self.user_registry.close()
+        self.root.destroy()
 
 # Main application runner
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = TaskManagerApp(root)
-    root.mainloop()
\ No newline at end of file
+    with instrumentation.session():
+        root = tk.Tk()
+        app = TaskManagerApp(root)
+        root.mainloop()
\ No newline at end of file
@@ -0,0 +1,33 @@
+import pytest
+from task_store import TaskStore
+
+USER = "ada@example.com"
+
+
+def make_task(task_name, start_date="2024-03-01", start_time="09:00", end_date="2024-03-01", end_time="10:00",
+              status="Upcoming", user_email=USER):
+    # A task in the form the CLI and GUI pass to add_task
+    return {"user_email": user_email, "task_name": task_name,
+            "task_start_date": start_date, "task_start_time": start_time,
+            "task_end_date": end_date, "task_end_time": end_time, "task_status": status}
+
+
+@pytest.fixture
+def tasks_path(tmp_path):
+    return str(tmp_path / "task_manager.csv")
+
+
+@pytest.fixture
+def open_store(tasks_path):
+    # Opens stores on the same files, as separate programs would, and waits
+    # for their background compactions before the files are removed
+    stores = []
+
+    def open_store(**kwargs):
+        task_store = TaskStore(tasks_path, **kwargs)
+        stores.append(task_store)
+        return task_store
+    yield open_store
+    for task_store in stores:
+        if task_store._compactor is not None:
+            task_store._compactor.join()
@@ -0,0 +1,23 @@
+import pandas as pd
+from sqlite_repository import SqliteDatabase, import_csv
+from task_schema import TASK_COLUMNS
+from conftest import USER, make_task
+
+
+def write_csv(tmp_path, tasks):
+    pd.DataFrame([[USER, "secret", "Ada"]], columns=["user_email", "user_password", "user_name"]).to_csv(
+        tmp_path / "users.csv", index=False)
+    pd.DataFrame(tasks, columns=TASK_COLUMNS).to_csv(tmp_path / "task_manager.csv", index=False)
+
+
+def test_reimport_updates_tasks_in_place(tmp_path):
+    database = SqliteDatabase(str(tmp_path / "task_manager.db"))
+    write_csv(tmp_path, [make_task("Write report"), make_task("Read mail")])
+    import_csv(database, str(tmp_path / "users.csv"), str(tmp_path / "task_manager.csv"))
+    write_csv(tmp_path, [make_task("Write report", status="Completed")])
+    import_csv(database, str(tmp_path / "users.csv"), str(tmp_path / "task_manager.csv"))
+
+    # The changed task keeps its id and moves to a new version
+    rows = database.conn.execute("SELECT task_id, task_name, task_status, version FROM tasks ORDER BY task_id")
+    assert rows.fetchall() == [(1, "Write report", "Completed", 1), (2, "Read mail", "Upcoming", 0)]
+    database.close()
@@ -0,0 +1,67 @@
+from datetime import date
+import pandas as pd
+import pytest
+from task_intervals import TaskIntervalIndex
+from conftest import USER, make_task
+
+
+@pytest.fixture
+def task_store(open_store):
+    task_store = open_store()
+    task_store.add_task(make_task("Standup", "2024-03-04", "09:00", "2024-03-04", "09:15"))
+    task_store.add_task(make_task("Workshop", "2024-03-04", "10:00", "2024-03-06", "12:00"))
+    task_store.add_task(make_task("Lunch", "2024-03-05", "12:00", "2024-03-05", "13:00"))
+    task_store.add_task(make_task("Deadline", "2024-03-05", "17:00", "2024-03-05", "17:00"))
+    task_store.add_task(make_task("Night shift", "2024-03-06", "22:00", "2024-03-07", "00:00"))
+    task_store.add_task(make_task("Someday", "", "", "", ""))
+    return task_store
+
+
+def names(df_tasks):
+    return list(df_tasks['task_name'])
+
+
+def test_overlapping_is_half_open(task_store):
+    intervals = TaskIntervalIndex(task_store)
+    at = pd.Timestamp
+    assert names(intervals.overlapping(USER, at("2024-03-04 09:15"), at("2024-03-04 10:00"))) == []
+    assert names(intervals.overlapping(USER, at("2024-03-04 09:10"), at("2024-03-04 10:01"))) == ["Standup", "Workshop"]
+    assert names(intervals.overlapping(USER, at("2024-03-05"), at("2024-03-06"))) == ["Workshop", "Lunch", "Deadline"]
+    # A long task that started long before the window is still found
+    assert names(intervals.overlapping(USER, at("2024-03-06 11:00"), at("2024-03-06 11:30"))) == ["Workshop"]
+    # Tasks without dates are never placed
+    assert "Someday" not in names(intervals.overlapping(USER, at("2000-01-01"), at("2100-01-01")))
+
+
+def test_running_at_includes_zero_length_tasks(task_store):
+    intervals = TaskIntervalIndex(task_store)
+    assert names(intervals.running_at(USER, pd.Timestamp("2024-03-05 17:00"))) == ["Workshop", "Deadline"]
+    assert names(intervals.running_at(USER, pd.Timestamp("2024-03-05 12:00"))) == ["Workshop", "Lunch"]
+    assert names(intervals.running_at(USER, pd.Timestamp("2024-03-05 13:00"))) == ["Workshop"]
+
+
+def test_conflicts_leave_out_the_task_itself(task_store):
+    intervals = TaskIntervalIndex(task_store)
+    assert names(intervals.task_conflicts(USER, "Lunch")) == ["Workshop"]
+    assert names(intervals.task_conflicts(USER, "Deadline")) == ["Workshop"]
+    assert names(intervals.task_conflicts(USER, "Standup")) == []
+    assert names(intervals.task_conflicts(USER, "Someday")) == []
+
+
+def test_tasks_by_day(task_store):
+    intervals = TaskIntervalIndex(task_store)
+    days = intervals.tasks_by_day(USER, date(2024, 3, 4), date(2024, 3, 7))
+    assert days == {date(2024, 3, 4): ["Standup", "Workshop"],
+                    date(2024, 3, 5): ["Workshop", "Lunch", "Deadline"],
+                    # Ending exactly at midnight does not occupy the next day
+                    date(2024, 3, 6): ["Workshop", "Night shift"]}
+
+
+def test_index_is_rebuilt_after_changes(task_store):
+    intervals = TaskIntervalIndex(task_store)
+    window = (pd.Timestamp("2024-03-05 12:30"), pd.Timestamp("2024-03-05 12:45"))
+    assert names(intervals.overlapping(USER, *window)) == ["Workshop", "Lunch"]
+    task_store.modify_task(USER, "Lunch", "task_start_date", "2024-03-08")
+    task_store.add_task(make_task("Call", "2024-03-05", "12:40", "2024-03-05", "12:50"))
+    task_store.delete_task(USER, "Workshop")
+    assert names(intervals.overlapping(USER, *window)) == ["Call"]
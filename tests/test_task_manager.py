@@ -0,0 +1,37 @@
+import os
+import pandas as pd
+import pytest
+import task_manager
+from task_store import TaskStore, journal_path
+from conftest import USER
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    # The CLI keeps its files in the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("TASK_MANAGER_BACKEND", raising=False)
+    monkeypatch.delenv("TASK_MANAGER_LAZY_LOAD", raising=False)
+    return tmp_path
+
+
+def test_batch_applies_the_good_lines_and_fails(data_dir, capsys):
+    batch = data_dir / "changes.txt"
+    batch.write_text(
+        f"add {USER} 'Write report' --start-date 2024-03-01 --start-time 09:00 --end-date 2024-03-01 --end-time 10:00\n"
+        f"add {USER} 'Read mail' --start-date 2024-02-31 --start-time 09:00 --end-date 2024-03-01 --end-time 10:00\n"
+        "# comments and blank lines are skipped\n"
+        "\n"
+        f"modify {USER} 'Write report' task_status Ongoing\n", encoding="utf-8")
+
+    assert task_manager.main(["batch", str(batch)]) == 1
+    out, err = capsys.readouterr()
+    assert "Applied 2 operations, 1 failed" in out
+    assert err.startswith("line 2:")
+
+    task_store = TaskStore(str(data_dir / "task_manager.csv"))
+    assert task_store.task_names(USER) == ["Write report"]
+    assert task_store.get_task(USER, "Write report")['task_status'] == "Ongoing"
+    # A short batch is appended to the journal, not compacted into the CSV
+    assert pd.read_csv(data_dir / "task_manager.csv").empty
+    assert os.path.exists(journal_path(str(data_dir / "task_manager.csv")))
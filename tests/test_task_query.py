@@ -0,0 +1,147 @@
+import random
+import pandas as pd
+import pytest
+from task_query import SORT_KEYS, TaskQuery
+from task_schema import TASK_STATUSES
+from conftest import USER, make_task
+
+
+def random_task(rng, task_name):
+    # Several tasks share each start so the name has to break ties; a few
+    # have no dates at all
+    day = rng.randint(1, 5)
+    if rng.random() < 0.1:
+        return make_task(task_name, "", "", "", "", rng.choice(TASK_STATUSES))
+    return make_task(task_name, f"2024-03-{day:02d}", f"{rng.choice([9, 12])}:00",
+                     f"2024-03-{day + rng.randint(0, 3):02d}", "17:00", rng.choice(TASK_STATUSES))
+
+
+def expected_order(task_store, sort, descending, statuses=None):
+    # Brute force: every matching task, sorted by the listing's documented rules
+    df_tasks = task_store.user_tasks(USER)
+    if statuses:
+        df_tasks = df_tasks[df_tasks['task_status'].isin(statuses)]
+    rows = list(zip(df_tasks['task_name'], df_tasks['task_start'], df_tasks['task_end'], df_tasks['task_status']))
+
+    def when(value):
+        return (1, pd.Timestamp.min) if pd.isna(value) else (0, value)
+
+    def key(row):
+        task_name, task_start, task_end, task_status = row
+        tie = (task_name.lower(), task_name)
+        return {"name": tie, "start": when(task_start) + tie, "end": when(task_end) + tie,
+                "status": (TASK_STATUSES.index(task_status),) + when(task_start) + tie}[sort]
+    return [row[0] for row in sorted(rows, key=key, reverse=descending)]
+
+
+def all_pages(task_query, limit, **kwargs):
+    names = []
+    cursor = None
+    while True:
+        df_tasks, cursor = task_query.page(USER, cursor=cursor, limit=limit, **kwargs)
+        names.extend(df_tasks['task_name'])
+        if cursor is None:
+            return names
+
+
+def all_pages_from(task_query, cursor):
+    names = []
+    while cursor is not None:
+        df_tasks, cursor = task_query.page(USER, sort="start", cursor=cursor, limit=3)
+        names.extend(df_tasks['task_name'])
+    return names
+
+
+@pytest.fixture
+def task_store(open_store):
+    task_store = open_store()
+    rng = random.Random(7)
+    for i in range(40):
+        task_store.add_task(random_task(rng, f"Task {i}"))
+    return task_store
+
+
+@pytest.mark.parametrize("sort", SORT_KEYS)
+@pytest.mark.parametrize("descending", [False, True])
+def test_pages_follow_the_sort_order(task_store, sort, descending):
+    task_query = TaskQuery(task_store)
+    expected = expected_order(task_store, sort, descending)
+    for limit in (1, 3, 7, 100):
+        assert all_pages(task_query, limit, sort=sort, descending=descending) == expected
+
+
+def test_status_filter(task_store):
+    task_query = TaskQuery(task_store)
+    for sort in SORT_KEYS:
+        assert all_pages(task_query, 4, sort=sort, statuses=["Ongoing", "Overdue"]) == \
+            expected_order(task_store, sort, False, ["Ongoing", "Overdue"])
+        assert all_pages(task_query, 4, sort=sort, statuses=["Completed"]) == \
+            expected_order(task_store, sort, False, ["Completed"])
+
+
+def test_date_range_keeps_tasks_running_in_it(open_store):
+    task_store = open_store()
+    task_store.add_task(make_task("Before", "2024-03-01", "09:00", "2024-03-01", "10:00"))
+    task_store.add_task(make_task("Ends at start", "2024-03-01", "10:00", "2024-03-02", "00:00"))
+    task_store.add_task(make_task("Spans", "2024-03-01", "12:00", "2024-03-04", "12:00"))
+    task_store.add_task(make_task("Inside", "2024-03-02", "09:00", "2024-03-02", "09:00"))
+    task_store.add_task(make_task("Starts at end", "2024-03-03", "00:00", "2024-03-03", "10:00"))
+    task_store.add_task(make_task("Undated", "", "", "", ""))
+    task_query = TaskQuery(task_store)
+    df_tasks, _ = task_query.page(USER, start=pd.Timestamp("2024-03-02"), end=pd.Timestamp("2024-03-03"))
+    assert list(df_tasks['task_name']) == ["Spans", "Inside"]
+
+
+def test_cursor_resumes_after_inserts_and_deletes(task_store):
+    task_query = TaskQuery(task_store)
+    first_page, cursor = task_query.page(USER, sort="start", limit=10)
+    seen = list(first_page['task_name'])
+    following = expected_order(task_store, "start", False)[10:]
+
+    # Between pages: a task sorting before the cursor, one after it, one
+    # deleted from the next page and one moved from before the cursor to after
+    task_store.add_task(make_task("Aaa early", "2024-02-01"))
+    task_store.add_task(make_task("Zzz late", "2024-04-01"))
+    task_store.delete_task(USER, following[0])
+    task_store.modify_task(USER, seen[0], "task_start_date", "2024-03-30")
+
+    names = list(task_query.page(USER, sort="start", cursor=cursor, limit=10)[0]['task_name'])
+    rest = all_pages_from(task_query, cursor)
+    assert names == rest[:10]
+    assert "Aaa early" not in rest and following[0] not in rest
+    assert "Zzz late" in rest and seen[0] in rest
+    # Everything now sorting after the first page's last task, once each
+    order = expected_order(task_store, "start", False)
+    assert rest == order[order.index(seen[-1]) + 1:]
+
+
+def test_orders_follow_the_change_feed(task_store):
+    task_query = TaskQuery(task_store)
+    all_pages(task_query, 5, sort="end")
+    rng = random.Random(11)
+    for i in range(60):
+        names = task_store.task_names(USER)
+        action = rng.random()
+        if action < 0.3:
+            task_store.add_task(random_task(rng, f"New {i}"))
+        elif action < 0.5:
+            task_store.delete_task(USER, rng.choice(names))
+        elif action < 0.7:
+            task_store.modify_task(USER, rng.choice(names), "task_status", rng.choice(TASK_STATUSES))
+        else:
+            task_store.modify_task(USER, rng.choice(names), "task_end_date", f"2024-03-{rng.randint(1, 9):02d}")
+    for sort in SORT_KEYS:
+        assert all_pages(task_query, 6, sort=sort) == expected_order(task_store, sort, False)
+
+
+def test_bad_cursors_are_rejected(task_store):
+    task_query = TaskQuery(task_store)
+    _, cursor = task_query.page(USER, sort="start", limit=5)
+    with pytest.raises(ValueError):
+        task_query.page(USER, sort="end", cursor=cursor)
+    with pytest.raises(ValueError):
+        task_query.page(USER, sort="start", descending=True, cursor=cursor)
+    with pytest.raises(ValueError):
+        task_query.page(USER, sort="start", cursor="not a cursor")
+    with pytest.raises(ValueError):
+        task_query.page(USER, sort="priority")
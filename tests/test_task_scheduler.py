@@ -0,0 +1,66 @@
+from datetime import datetime
+import pandas as pd
+import pytest
+from task_scheduler import TaskScheduler
+from conftest import USER, make_task
+
+
+@pytest.fixture
+def task_store(open_store):
+    task_store = open_store()
+    task_store.add_task(make_task("Write report", "2024-03-01", "09:00", "2024-03-01", "10:00"))
+    task_store.add_task(make_task("Read mail", "2024-03-01", "11:00", "2024-03-01", "12:00"))
+    return task_store
+
+
+def status(task_store, task_name):
+    return task_store.get_task(USER, task_name)['task_status']
+
+
+def test_tasks_move_from_upcoming_to_ongoing_to_overdue(task_store):
+    reminders = []
+    scheduler = TaskScheduler(task_store, on_reminder=lambda *args: reminders.append(args))
+    scheduler.load(now=datetime(2024, 3, 1, 8, 0))
+    assert scheduler.next_instant() == pd.Timestamp("2024-03-01 08:45")
+
+    assert scheduler.run_pending(now=datetime(2024, 3, 1, 8, 50)) == [("reminder", USER, "Write report")]
+    assert reminders == [(USER, "Write report", pd.Timestamp("2024-03-01 09:00"))]
+    assert status(task_store, "Write report") == "Upcoming"
+    assert scheduler.run_pending(now=datetime(2024, 3, 1, 9, 0)) == [("start", USER, "Write report")]
+    assert status(task_store, "Write report") == "Ongoing"
+    assert scheduler.run_pending(now=datetime(2024, 3, 1, 9, 30)) == []
+    assert scheduler.run_pending(now=datetime(2024, 3, 1, 10, 0)) == [("end", USER, "Write report")]
+    assert status(task_store, "Write report") == "Overdue"
+    assert status(task_store, "Read mail") == "Upcoming"
+
+    # Everything due while nothing ran fires in one call
+    assert [kind for kind, _, _ in scheduler.run_pending(now=datetime(2024, 3, 2))] == ["reminder", "start", "end"]
+    assert status(task_store, "Read mail") == "Overdue"
+    assert scheduler.next_instant() is None
+
+
+def test_completed_tasks_are_never_changed(task_store):
+    task_store.add_task(make_task("Pay bills", "2024-03-01", "09:00", "2024-03-01", "10:00", status="Completed"))
+    scheduler = TaskScheduler(task_store).load(now=datetime(2024, 3, 1, 8, 0))
+    task_store.modify_task(USER, "Read mail", "task_status", "Completed")
+
+    fired = scheduler.run_pending(now=datetime(2024, 3, 2))
+    assert fired == [("reminder", USER, "Write report"), ("start", USER, "Write report"),
+                     ("end", USER, "Write report")]
+    assert status(task_store, "Pay bills") == "Completed"
+    assert status(task_store, "Read mail") == "Completed"
+
+
+def test_schedule_follows_modifies_and_deletes(task_store):
+    scheduler = TaskScheduler(task_store, reminder_lead=pd.Timedelta(0)).load(now=datetime(2024, 3, 1, 8, 0))
+    task_store.modify_task(USER, "Write report", "task_start_date", "2024-03-05")
+    task_store.modify_task(USER, "Write report", "task_end_date", "2024-03-05")
+    task_store.modify_task(USER, "Write report", "task_name", "Write summary")
+    task_store.delete_task(USER, "Read mail")
+
+    # The old instants no longer fire
+    assert scheduler.run_pending(now=datetime(2024, 3, 2)) == []
+    assert scheduler.next_instant() == pd.Timestamp("2024-03-05 09:00")
+    assert scheduler.run_pending(now=datetime(2024, 3, 5, 9, 0)) == [("start", USER, "Write summary")]
+    assert status(task_store, "Write summary") == "Ongoing"
+    assert scheduler.next_instant() == pd.Timestamp("2024-03-05 10:00")
@@ -0,0 +1,98 @@
+from datetime import date, datetime, time
+import pandas as pd
+import pytest
+from task_schema import (TASK_COLUMNS, combine, format_tasks, parse_tasks, read_date, read_time, stored_value,
+                         to_date, to_time, typed_changes, typed_task)
+from conftest import make_task
+
+
+def test_to_date_accepts_iso_and_day_first_dates():
+    assert to_date("2024-03-01") == date(2024, 3, 1)
+    assert to_date(" 2024-03-01 ") == date(2024, 3, 1)
+    assert to_date("01-03-2024") == date(2024, 3, 1)
+    assert to_date(datetime(2024, 3, 1, 9, 30)) == date(2024, 3, 1)
+
+
+@pytest.mark.parametrize("value", ["hello", "2023-02-31", "31-02-2023", "", None, pd.NaT])
+def test_to_date_rejects_invalid_dates(value):
+    with pytest.raises(ValueError):
+        to_date(value)
+
+
+def test_to_time_parses_the_trailing_time():
+    assert to_time("09:05") == time(9, 5)
+    assert to_time("1900-01-01 09:05:30") == time(9, 5, 30)
+    assert to_time(datetime(1900, 1, 1, 23, 59)) == time(23, 59)
+    # A missing time is midnight, as when the CSV is loaded
+    assert to_time("") == time(0, 0)
+    assert to_time(None) == time(0, 0)
+
+
+@pytest.mark.parametrize("value", ["25:99", "24:00", "09:60", "noon", "9"])
+def test_to_time_rejects_invalid_times(value):
+    with pytest.raises(ValueError):
+        to_time(value)
+
+
+def test_typed_input_must_be_iso_dates_and_hh_mm_times():
+    assert read_date("2024-03-01") == datetime(2024, 3, 1)
+    assert read_time("9:05") == datetime(1900, 1, 1, 9, 5)
+    for value in ["2023-02-31", "01-03-2024", "2024-3-1 ", ""]:
+        assert read_date(value) is None
+    for value in ["24:00", "09:60", "09:05:30", ""]:
+        assert read_time(value) is None
+
+
+def test_combine():
+    assert combine("2024-03-01", "09:30") == pd.Timestamp("2024-03-01 09:30")
+    assert combine("2024-03-01", "") == pd.Timestamp("2024-03-01")
+    # A task without a date has no time either
+    assert combine("", "09:30") is pd.NaT
+    assert combine(None, "09:30") is pd.NaT
+
+
+@pytest.mark.parametrize("date_value, time_value", [("2023-02-31", "09:00"), ("hello", "09:00"),
+                                                     ("2024-03-01", "25:99"), ("2024-03-01", "later")])
+def test_combine_rejects_invalid_input(date_value, time_value):
+    with pytest.raises(ValueError):
+        combine(date_value, time_value)
+
+
+def test_typed_task_and_changes():
+    task = typed_task(make_task("Write report"))
+    assert task["task_start"] == pd.Timestamp("2024-03-01 09:00")
+    assert typed_changes(task, "task_start_time", "11:15") == {"task_start": pd.Timestamp("2024-03-01 11:15")}
+    assert typed_changes(task, "task_end_date", "2024-03-04") == {"task_end": pd.Timestamp("2024-03-04 10:00")}
+    assert typed_changes(task, "task_start_date", "") == {"task_start": pd.NaT}
+    assert typed_changes(task, "task_status", "Completed") == {"task_status": "Completed"}
+
+
+def test_unknown_statuses_and_fields_are_rejected():
+    task = typed_task(make_task("Write report"))
+    with pytest.raises(ValueError):
+        typed_task(make_task("Write report", status="Someday"))
+    with pytest.raises(ValueError):
+        typed_changes(task, "task_status", "Saving...")
+    with pytest.raises(ValueError):
+        typed_changes(task, "task_colour", "red")
+    with pytest.raises(ValueError):
+        stored_value("task_status", "Someday")
+
+
+def test_stored_value_normalizes_dates_and_times():
+    assert stored_value("task_start_date", "01-03-2024") == "2024-03-01"
+    assert stored_value("task_start_date", "") == ""
+    assert stored_value("task_end_time", "9:05") == "09:05"
+    with pytest.raises(ValueError):
+        stored_value("task_end_date", "2023-02-31")
+
+
+def test_parse_and_format_round_trip():
+    rows = pd.DataFrame([make_task("Write report"),
+                         make_task("Read mail", start_date="", start_time="", end_date="", end_time="",
+                                   status="Ongoing")], columns=TASK_COLUMNS)
+    df_tasks = parse_tasks(rows)
+    assert df_tasks['task_start'].iloc[0] == pd.Timestamp("2024-03-01 09:00")
+    assert df_tasks['task_start'].isna().iloc[1]
+    assert list(df_tasks['task_status']) == ["Upcoming", "Ongoing"]
+    assert format_tasks(df_tasks).fillna("").to_dict("records") == rows.to_dict("records")
@@ -0,0 +1,66 @@
+import pytest
+from task_search import TaskNameIndex
+from conftest import USER, make_task
+
+OTHER = "bob@example.com"
+
+
+@pytest.fixture
+def task_store(open_store):
+    task_store = open_store()
+    for task_name in ["Quarterly report", "Report bug in reports page", "Read mail", "Call the bank", "REPLY to Quinn"]:
+        task_store.add_task(make_task(task_name))
+    task_store.add_task(make_task("Quarterly review", user_email=OTHER))
+    return task_store
+
+
+def test_every_query_word_must_start_a_word_of_the_name(task_store):
+    task_names = TaskNameIndex(task_store)
+    assert task_names.search(USER, "rep") == ["Quarterly report", "REPLY to Quinn", "Report bug in reports page"]
+    assert task_names.search(USER, "rep q") == ["Quarterly report", "REPLY to Quinn"]
+    assert task_names.search(USER, "q rep report") == ["Quarterly report"]
+    # Prefixes only: "port" is inside "report" but starts no word
+    assert task_names.search(USER, "port") == []
+    assert task_names.search(USER, "rep xyz") == []
+    assert task_names.search(USER, "rep", limit=2) == ["Quarterly report", "REPLY to Quinn"]
+    # Other users' tasks are never searched
+    assert task_names.search(USER, "review") == []
+    assert task_names.search(OTHER, "q") == ["Quarterly review"]
+
+
+def test_search_ignores_case_and_punctuation(task_store):
+    task_names = TaskNameIndex(task_store)
+    assert task_names.search(USER, "QUARTERLY Rep") == ["Quarterly report"]
+    assert task_names.search(USER, "reply") == ["REPLY to Quinn"]
+    assert task_names.search(USER, "bank!") == ["Call the bank"]
+    # A query without words matches everything
+    assert len(task_names.search(USER, " - ")) == 5
+
+
+def test_index_follows_the_change_feed(task_store):
+    task_names = TaskNameIndex(task_store)
+    assert task_names.search(USER, "rep") == ["Quarterly report", "REPLY to Quinn", "Report bug in reports page"]
+    task_store.modify_task(USER, "Quarterly report", "task_name", "Yearly summary")
+    task_store.delete_task(USER, "REPLY to Quinn")
+    task_store.add_task(make_task("Repaint the fence"))
+    # A change that keeps the name leaves the index alone
+    task_store.modify_task(USER, "Read mail", "task_status", "Completed")
+
+    assert task_names.search(USER, "rep") == ["Repaint the fence", "Report bug in reports page"]
+    assert task_names.search(USER, "q") == []
+    assert task_names.search(USER, "year sum") == ["Yearly summary"]
+    assert task_names.search(USER, "read") == ["Read mail"]
+    # Words shared with a removed name stay for the names still using them
+    task_store.delete_task(USER, "Report bug in reports page")
+    assert task_names.search(USER, "rep") == ["Repaint the fence"]
+
+
+def test_index_is_rebuilt_after_a_reload(open_store, task_store):
+    task_names = TaskNameIndex(task_store)
+    assert task_names.search(USER, "call") == ["Call the bank"]
+    other = open_store()
+    other.modify_task(USER, "Call the bank", "task_name", "Visit the bank")
+    other.compact(wait=True)
+    task_store.refresh()
+    assert task_names.search(USER, "call") == []
+    assert task_names.search(USER, "bank") == ["Visit the bank"]
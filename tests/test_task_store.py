@@ -0,0 +1,272 @@
+import os
+import subprocess
+import sys
+import pandas as pd
+import pytest
+from repository import ConflictError
+from task_arrow import import_tasks
+from task_schema import TASK_COLUMNS, parse_tasks
+from task_store import journal_path
+from conftest import USER, make_task
+
+OTHER = "bob@example.com"
+
+
+def snapshot(task_store, user_email=USER):
+    # A user's tasks as plain values, in name order
+    df_tasks = task_store.user_tasks(user_email).sort_values('task_name')
+    return [(task_name, task_start, task_end, str(task_status)) for task_name, task_start, task_end, task_status
+            in zip(df_tasks['task_name'], df_tasks['task_start'], df_tasks['task_end'], df_tasks['task_status'])]
+
+
+def csv_names(tasks_path):
+    return sorted(pd.read_csv(tasks_path, dtype=object)['task_name'])
+
+
+def test_mutations_are_journaled_and_replayed(open_store, tasks_path):
+    task_store = open_store()
+    task_store.add_task(make_task("Write report"))
+    task_store.add_task(make_task("Read mail"))
+    task_store.add_task(make_task("Call home"))
+    task_store.modify_task(USER, "Write report", "task_end_time", "12:00")
+    task_store.modify_task(USER, "Read mail", "task_name", "Answer mail")
+    task_store.delete_task(USER, "Call home")
+
+    # Nothing has been compacted, so the CSV is still empty
+    assert csv_names(tasks_path) == []
+    assert len(task_store.journal.read()) == 6
+    reopened = open_store()
+    assert snapshot(reopened) == snapshot(task_store)
+    assert reopened.task_names(USER) == ["Write report", "Answer mail"]
+    assert reopened.get_task(USER, "Write report")['task_end'] == pd.Timestamp("2024-03-01 12:00")
+
+
+def test_torn_last_journal_line_is_ignored(open_store, tasks_path):
+    task_store = open_store()
+    task_store.add_task(make_task("Write report"))
+    with open(journal_path(tasks_path), "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "task": {"user_em')
+    assert open_store().task_names(USER) == ["Write report"]
+
+
+def test_invalid_changes_are_not_journaled(open_store):
+    task_store = open_store()
+    task_store.add_task(make_task("Write report"))
+    for field, value in [("task_start_date", "hello"), ("task_start_date", "2023-02-31"),
+                         ("task_end_time", "25:99"), ("task_status", "Saving...")]:
+        with pytest.raises(ValueError):
+            task_store.modify_task(USER, "Write report", field, value)
+    assert len(task_store.journal.read()) == 1
+    assert task_store.get_task(USER, "Write report")['task_start'] == pd.Timestamp("2024-03-01 09:00")
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(open_store, tasks_path):
+    task_store = open_store(compact_threshold=5)
+    for i in range(7):
+        task_store.add_task(make_task(f"Task {i}"))
+    task_store.delete_task(USER, "Task 0")
+    task_store.close()
+    # The fifth record started a compaction; closing leaves the three after it
+    # in the journal since they are under the threshold
+    assert csv_names(tasks_path) == [f"Task {i}" for i in range(5)]
+    assert len(task_store.journal.read()) == 3
+
+    task_store.compact(wait=True)
+    assert not os.path.exists(journal_path(tasks_path))
+    assert not os.path.exists(journal_path(tasks_path) + ".compacting")
+    assert csv_names(tasks_path) == [f"Task {i}" for i in range(1, 7)]
+    assert snapshot(open_store()) == snapshot(task_store)
+
+
+def test_interrupted_compaction_is_replayed(open_store, tasks_path):
+    task_store = open_store()
+    task_store.add_task(make_task("Write report"))
+    task_store.add_task(make_task("Read mail"))
+    # A crash after the journal was rotated but before the snapshot was written
+    os.replace(journal_path(tasks_path), journal_path(tasks_path) + ".compacting")
+
+    reopened = open_store()
+    assert sorted(reopened.task_names(USER)) == ["Read mail", "Write report"]
+    reopened.compact(wait=True)
+    assert csv_names(tasks_path) == ["Read mail", "Write report"]
+    assert not os.path.exists(journal_path(tasks_path) + ".compacting")
+
+
+def test_lazy_store_loads_and_compacts_one_user_at_a_time(open_store, tasks_path):
+    task_store = open_store()
+    for i in range(3):
+        task_store.add_task(make_task(f"Task {i}"))
+        task_store.add_task(make_task(f"Other {i}", user_email=OTHER))
+    task_store.compact(wait=True)
+    with open(tasks_path, "rb") as f:
+        before = f.read()
+
+    lazy_store = open_store(lazy=True)
+    assert lazy_store._loaded_users == set()
+    lazy_store.modify_task(USER, "Task 1", "task_status", "Completed")
+    lazy_store.add_task(make_task("Task 3"))
+    assert lazy_store._loaded_users == {USER}
+    lazy_store.compact(wait=True)
+
+    # The untouched user's rows are copied byte for byte
+    with open(tasks_path, "rb") as f:
+        after = f.read()
+    other_rows = [line for line in before.splitlines() if line.startswith(OTHER.encode())]
+    assert all(line in after.splitlines() for line in other_rows)
+
+    reopened = open_store(lazy=True)
+    assert snapshot(reopened, OTHER) == snapshot(task_store, OTHER)
+    assert sorted(reopened.task_names(USER)) == ["Task 0", "Task 1", "Task 2", "Task 3"]
+    assert reopened.get_task(USER, "Task 1")['task_status'] == "Completed"
+
+
+def test_lazy_unload_keeps_journaled_changes(open_store):
+    task_store = open_store(lazy=True)
+    task_store.add_task(make_task("Write report"))
+    task_store.modify_task(USER, "Write report", "task_name", "Write summary")
+    task_store.unload_user(USER)
+    assert task_store.task_names(USER) == ["Write summary"]
+
+
+def test_other_stores_catch_up_on_refresh(open_store):
+    first = open_store()
+    second = open_store()
+    changes = []
+    second.subscribe(lambda op, user_email, task_name, task: changes.append((op, task_name)))
+
+    first.add_task(make_task("Write report"))
+    first.modify_task(USER, "Write report", "task_status", "Ongoing")
+    assert second.task_names(USER) == []
+    second.refresh()
+    assert changes == [("add", "Write report"), ("update", "Write report")]
+    assert second.get_task(USER, "Write report")['task_status'] == "Ongoing"
+
+    # Writes catch up first, so the second store builds on the first's changes
+    second.delete_task(USER, "Write report")
+    first.refresh()
+    assert first.task_names(USER) == []
+
+
+def test_compaction_by_another_store_reloads(open_store):
+    first = open_store()
+    second = open_store()
+    first.add_task(make_task("Write report"))
+    second.refresh()
+    first.compact(wait=True)
+    first.add_task(make_task("Read mail"))
+
+    changes = []
+    second.subscribe(lambda op, user_email, task_name, task: changes.append(op))
+    second.refresh()
+    assert changes == ["reload"]
+    assert sorted(second.task_names(USER)) == ["Read mail", "Write report"]
+
+
+def test_stale_versions_raise_conflict_error(open_store):
+    first = open_store()
+    second = open_store()
+    first.add_task(make_task("Write report"))
+    second.refresh()
+    version = second.task_version(USER, "Write report")
+
+    first.modify_task(USER, "Write report", "task_end_time", "11:00")
+    with pytest.raises(ConflictError):
+        second.modify_task(USER, "Write report", "task_status", "Completed", version)
+    with pytest.raises(ConflictError):
+        second.delete_task(USER, "Write report", version)
+
+    # With the current version the write goes through
+    second.modify_task(USER, "Write report", "task_status", "Completed", second.task_version(USER, "Write report"))
+    first.refresh()
+    assert first.get_task(USER, "Write report")['task_status'] == "Completed"
+    assert first.get_task(USER, "Write report")['task_end'] == pd.Timestamp("2024-03-01 11:00")
+
+
+def test_buffered_write_to_a_task_changed_elsewhere_is_discarded(open_store):
+    buffered = open_store(autoflush=False)
+    other = open_store()
+    buffered.add_task(make_task("Write report"))
+    buffered.flush()
+    other.refresh()
+
+    buffered.modify_task(USER, "Write report", "task_status", "Completed")
+    other.modify_task(USER, "Write report", "task_status", "Ongoing")
+    with pytest.raises(ConflictError):
+        buffered.flush()
+    assert buffered.get_task(USER, "Write report")['task_status'] == "Ongoing"
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_buffered_conflicts_survive_catching_up(open_store, compact):
+    # The other store's change is picked up before the flush, either from the
+    # journal or, after it compacted, from the new snapshot
+    buffered = open_store(autoflush=False)
+    other = open_store()
+    buffered.add_task(make_task("Write report"))
+    buffered.add_task(make_task("Read mail"))
+    buffered.flush()
+    other.refresh()
+
+    buffered.modify_task(USER, "Write report", "task_status", "Completed")
+    other.modify_task(USER, "Write report", "task_end_time", "11:00")
+    if compact:
+        other.compact(wait=True)
+    buffered.refresh()
+    buffered.modify_task(USER, "Read mail", "task_status", "Ongoing")
+    with pytest.raises(ConflictError, match="Write report"):
+        buffered.flush()
+
+    # The other store's change stands and the unrelated write went through
+    reopened = open_store()
+    for task_store in (buffered, reopened):
+        assert task_store.get_task(USER, "Write report")['task_status'] == "Upcoming"
+        assert task_store.get_task(USER, "Write report")['task_end'] == pd.Timestamp("2024-03-01 11:00")
+        assert task_store.get_task(USER, "Read mail")['task_status'] == "Ongoing"
+
+
+def test_buffered_writes_after_a_foreign_compaction_are_kept(open_store):
+    buffered = open_store(autoflush=False)
+    other = open_store()
+    buffered.add_task(make_task("Write report"))
+    buffered.flush()
+    other.add_task(make_task("Read mail"))
+    buffered.modify_task(USER, "Write report", "task_status", "Completed")
+    other.compact(wait=True)
+
+    # The compaction did not touch the buffered task, so nothing conflicts
+    buffered.flush()
+    reopened = open_store()
+    assert sorted(reopened.task_names(USER)) == ["Read mail", "Write report"]
+    assert reopened.get_task(USER, "Write report")['task_status'] == "Completed"
+
+
+def test_catches_up_with_another_process(open_store, tasks_path):
+    task_store = open_store()
+    task_store.add_task(make_task("Write report"))
+    script = ("import sys; from task_store import TaskStore; from conftest import make_task; "
+              "task_store = TaskStore(sys.argv[1]); task_store.add_task(make_task('Read mail')); "
+              "task_store.modify_task('ada@example.com', 'Write report', 'task_status', 'Ongoing')")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.path.join(root, "tests")]))
+    subprocess.run([sys.executable, "-c", script, tasks_path], check=True, env=env)
+
+    task_store.refresh()
+    assert sorted(task_store.task_names(USER)) == ["Read mail", "Write report"]
+    assert task_store.get_task(USER, "Write report")['task_status'] == "Ongoing"
+
+
+def test_import_merges_with_journaled_writes(open_store, tasks_path):
+    task_store = open_store()
+    task_store.add_task(make_task("Write report"))
+    task_store.add_task(make_task("Read mail"))
+
+    rows = pd.DataFrame([make_task("Read mail", status="Completed"), make_task("Call home")], columns=TASK_COLUMNS)
+    import_tasks(parse_tasks(rows), "csv", os.path.dirname(tasks_path))
+    assert not os.path.exists(journal_path(tasks_path))
+    assert csv_names(tasks_path) == ["Call home", "Read mail", "Write report"]
+
+    # The open store sees the new snapshot and keeps working on top of it
+    task_store.add_task(make_task("Pay bills"))
+    assert sorted(task_store.task_names(USER)) == ["Call home", "Pay bills", "Read mail", "Write report"]
+    assert task_store.get_task(USER, "Read mail")['task_status'] == "Completed"
+    assert sorted(open_store().task_names(USER)) == sorted(task_store.task_names(USER))
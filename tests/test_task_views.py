@@ -0,0 +1,85 @@
+import pytest
+from task_views import TaskViewCache
+from conftest import USER, make_task
+
+OTHER = "bob@example.com"
+
+
+@pytest.fixture
+def task_store(open_store):
+    task_store = open_store()
+    task_store.add_task(make_task("Write report"))
+    task_store.add_task(make_task("Read mail", user_email=OTHER))
+    return task_store
+
+
+def cached_names(task_views, user_email, kind="names"):
+    # Every build is recorded, so a hit leaves builds unchanged
+    def build():
+        task_views.builds.append((user_email, kind))
+        return task_views.task_store.task_names(user_email)
+    return task_views.get(user_email, kind, build)
+
+
+def open_views(task_store, **kwargs):
+    task_views = TaskViewCache(task_store, **kwargs)
+    task_views.builds = []
+    return task_views
+
+
+def test_changes_invalidate_only_that_users_views(task_store):
+    task_views = open_views(task_store)
+    assert cached_names(task_views, USER) == ["Write report"]
+    assert cached_names(task_views, OTHER) == ["Read mail"]
+    assert cached_names(task_views, USER) == ["Write report"]
+    assert (task_views.hits, task_views.misses) == (1, 2)
+
+    version = task_views.version(USER)
+    task_store.add_task(make_task("Call home"))
+    assert task_views.version(USER) > version
+    assert cached_names(task_views, USER) == ["Write report", "Call home"]
+    assert cached_names(task_views, OTHER) == ["Read mail"]
+    assert task_views.builds == [(USER, "names"), (OTHER, "names"), (USER, "names")]
+
+
+def test_a_reload_invalidates_every_view(open_store, task_store):
+    task_views = open_views(task_store)
+    cached_names(task_views, USER)
+    cached_names(task_views, OTHER)
+    other = open_store()
+    other.delete_task(OTHER, "Read mail")
+    other.compact(wait=True)
+    task_store.refresh()
+
+    task_views.builds = []
+    assert cached_names(task_views, USER) == ["Write report"]
+    assert cached_names(task_views, OTHER) == []
+    assert task_views.builds == [(USER, "names"), (OTHER, "names")]
+
+
+def test_least_recently_used_views_are_dropped(task_store):
+    task_views = open_views(task_store, max_entries=2)
+    cached_names(task_views, USER, "names")
+    cached_names(task_views, USER, "email")
+    # Reading the first entry again makes "email" the oldest
+    cached_names(task_views, USER, "names")
+    cached_names(task_views, OTHER, "names")
+    assert list(task_views.entries) == [(USER, "names"), (OTHER, "names")]
+
+    task_views.builds = []
+    cached_names(task_views, USER, "names")
+    cached_names(task_views, USER, "email")
+    assert task_views.builds == [(USER, "email")]
+    assert len(task_views.entries) == 2
+
+
+def test_forget_and_close(task_store):
+    task_views = open_views(task_store)
+    cached_names(task_views, USER)
+    cached_names(task_views, OTHER)
+    task_views.forget(USER)
+    assert list(task_views.entries) == [(OTHER, "names")]
+    task_views.close()
+    version = task_views.version(OTHER)
+    task_store.add_task(make_task("Pay bills", user_email=OTHER))
+    assert task_views.version(OTHER) == version
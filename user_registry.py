@@ -0,0 +1,59 @@
+import csv
+import os
+import pandas as pd
+from repository import UserRepository
+
+USER_COLUMNS = ["user_email", "user_password", "user_name"]
+
+
+class UserRegistry(UserRepository):
+    # Users are loaded once into a dict keyed by email; registrations are
+    # appended to the CSV so it never has to be rewritten
+    def __init__(self, path="./users.csv"):
+        self.path = path
+        self._users = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            pd.DataFrame(columns=USER_COLUMNS).to_csv(self.path, index=False)
+            return
+        df_users = pd.read_csv(self.path, dtype=object)
+        for user_email, user_password, user_name in zip(df_users['user_email'],
+                                                        df_users['user_password'],
+                                                        df_users['user_name']):
+            if pd.isna(user_email):
+                continue
+            self._users[user_email] = {"user_password": user_password, "user_name": user_name}
+
+    def __contains__(self, user_email):
+        return user_email in self._users
+
+    def __len__(self):
+        return len(self._users)
+
+    def get_user(self, user_email):
+        return self._users.get(user_email)
+
+    def register(self, user_email, user_password, user_name):
+        if user_email in self._users:
+            raise ValueError(f"User {user_email} is already registered")
+        self._append_row([user_email, user_password, user_name])
+        self._users[user_email] = {"user_password": user_password, "user_name": user_name}
+
+    def authenticate(self, user_email, user_password):
+        # Returns the user's name when the password matches, otherwise None
+        user = self._users.get(user_email)
+        if user is None or user["user_password"] != user_password:
+            return None
+        return user["user_name"]
+
+    def _append_row(self, row):
+        with open(self.path, "a+", newline="", encoding="utf-8") as f:
+            # Files saved by spreadsheet tools may lack a trailing newline
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(f.tell() - 1)
+                if f.read(1) != "\n":
+                    f.write("\n")
+            csv.writer(f, lineterminator="\n").writerow(row)